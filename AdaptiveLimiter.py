@@ -0,0 +1,165 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Adaptive concurrency limit (AIMD).
+The number of requests in flight grows by one every round trip while the
+latency stays flat, and is cut by a factor on 429/5xx responses, errors or
+latency inflation (the recent latency well above the best recent latency),
+at most once per round trip. It finds the concurrency the gateway sustains
+instead of a fixed guess.
+
+    limiter = AdaptiveLimiter(max_limit=64)
+    summary = Bulk(catalog,limiter=limiter).add_products(catalog_name,products)
+    summary['concurrency'] # {'limit':..., 'settled':..., ...}
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["AdaptiveLimiter"]
+
+import time
+import threading
+from collections import deque
+
+class AdaptiveLimiter():
+    """ Adaptive concurrency limit (AIMD).
+    """
+    def __init__(self,
+                 initial=4,
+                 min_limit=1,
+                 max_limit=64,
+                 decrease=0.7,
+                 tolerance=2.0,
+                 window=500):
+        """ Initialization.
+
+        :params:
+            - initial : int, optional (default: 4)
+                The initial concurrency.
+            - min_limit : int, optional (default: 1)
+            - max_limit : int, optional (default: 64)
+            - decrease : float, optional (default: 0.7)
+                The limit is multiplied by this on overload.
+            - tolerance : float, optional (default: 2.0)
+                The latency is inflated when the recent latency (moving
+                average) exceeds tolerance times the best latency of the
+                last window requests.
+            - window : int, optional (default: 500)
+                The number of recent latencies the best latency is taken
+                from.
+        """
+
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease = decrease
+        self.tolerance = tolerance
+
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.recent = None
+        self.last_decrease = 0.0
+        # the limit after every completion, for the settled value
+        self.history = deque(maxlen=window)
+
+        self.stats = {}
+        self.stats['requests'] = 0
+        self.stats['increases'] = 0
+        self.stats['decreases'] = 0
+        self.stats['overloads'] = 0
+        self.stats['inflations'] = 0
+
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        """ Wait until a request can be sent.
+
+        :returns:
+            - start : float
+                the start time, pass it to release
+        """
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+        return time.time()
+
+    def release(self,start,status):
+        """ Report a completed request.
+
+        :params:
+            - start : float
+                returned by acquire
+            - status : int
+                the status code, None for an exception
+        """
+        with self.condition:
+            self.in_flight -= 1
+            self.update(start,time.time()-start,status)
+            self.condition.notify_all()
+
+    def update(self,start,elapsed,status):
+        """ Adjust the limit after a request (sent at start) completed.
+        """
+        with self.condition:
+            self.stats['requests'] += 1
+
+            overload = status is None or status == 429 or status >= 500
+            inflated = False
+            if not overload:
+                self.latencies.append(elapsed)
+                self.recent = elapsed if self.recent is None else 0.8*self.recent+0.2*elapsed
+                inflated = (len(self.latencies) >= 10 and
+                            self.recent > self.tolerance*min(self.latencies))
+
+            if overload or inflated:
+                self.stats['overloads' if overload else 'inflations'] += 1
+                # once per round trip: ignore requests sent before the last cut
+                if start >= self.last_decrease:
+                    self.limit = max(self.min_limit,self.limit*self.decrease)
+                    self.last_decrease = time.time()
+                    self.recent = None
+                    self.stats['decreases'] += 1
+            elif self.limit < self.max_limit:
+                # +1 per round trip (limit completions)
+                self.limit = min(self.max_limit,self.limit+1.0/self.limit)
+                self.stats['increases'] += 1
+
+            self.history.append(self.limit)
+            self.condition.notify_all()
+
+    def settled(self):
+        """ The concurrency the limit settled on (the median limit of the
+        last window requests).
+        """
+        with self.condition:
+            history = sorted(self.history)
+        if not history:
+            return int(self.limit)
+        return int(history[len(history)//2])
+
+    def summary(self):
+        """ The limiter summary.
+
+        :returns:
+            - summary : dict
+                'limit' (current), 'settled', 'best_latency' (seconds) and
+                the counts 'requests', 'increases', 'decreases',
+                'overloads', 'inflations'
+        """
+        summary = {}
+        with self.condition:
+            summary.update(self.stats)
+            summary['limit'] = int(self.limit)
+            summary['best_latency'] = min(self.latencies) if self.latencies else None
+        summary['settled'] = self.settled()
+        return summary
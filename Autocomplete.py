@@ -0,0 +1,422 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" In-process autocomplete.
+A prefix trie of the product names, brands, categories, ... and of the past
+queries, where every node keeps the top-k most popular completions below it,
+so that a completion is a walk down the prefix (no scan, no network round
+trip). The trie is saved to a flat file that is memory-mapped on open, for
+fast startup; later updates are kept in memory on top of it.
+
+    autocomplete = Autocomplete()
+    autocomplete.add_products(mirror.products.values(),fields=['name','brand'])
+    autocomplete.add_queries(query_log)
+    autocomplete.complete('red sn') # [('red sneakers',42.0),...]
+    autocomplete.save('autocomplete.bin')
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["Autocomplete"]
+
+import os
+import re
+import mmap
+import heapq
+import struct
+import threading
+
+# magic, format version, k, number of nodes, edges, top-k entries and terms
+_HEADER = struct.Struct('<4sIIIIII')
+# term id (-1 if none), first edge, number of edges, first top-k, number of top-k
+_NODE = struct.Struct('<iIIII')
+# character (code point), child node
+_EDGE = struct.Struct('<II')
+_MAGIC = b'CFAC'
+_VERSION = 1
+
+_SPACE_RE = re.compile(r'\s+',re.UNICODE)
+_WORD_RE = re.compile(r'\w+',re.UNICODE)
+
+def _normalize(text):
+    return _SPACE_RE.sub(' ',text.lower()).strip()
+
+def _rank(entry):
+    """ Most popular first, then alphabetical.
+    """
+    return (-entry[0],entry[1])
+
+class _Node():
+    __slots__ = ('children','term','topk','dirty')
+
+    def __init__(self):
+        self.children = {}
+        self.term = None
+        # [(weight,term)], the top-k completions below this node
+        self.topk = []
+        self.dirty = False
+
+class Autocomplete():
+    """ In-process autocomplete.
+    """
+    def __init__(self,
+                 k=10,
+                 filename=None,
+                 max_length=64):
+        """ Initialization.
+
+        :params:
+            - k : int, optional (default: 10)
+                The maximum number of completions returned.
+            - filename : str, optional (default: None)
+                The saved trie. If the file exists it is memory-mapped.
+            - max_length : int, optional (default: 64)
+                Longer terms are not indexed.
+        """
+
+        self.k = k
+        self.filename = filename
+        self.max_length = max_length
+
+        # the in-memory terms (all of them, or the updates on top of the
+        # memory-mapped file) -> weight
+        self.weights = {}
+        # terms of the memory-mapped file that were removed
+        self.removed = set()
+        self.root = _Node()
+        self.mmap = None
+        self.lock = threading.RLock()
+
+        if filename is not None and os.path.exists(filename):
+            self.open()
+
+    #--------------------------------------------------------------------------
+    # Updates.
+    #--------------------------------------------------------------------------
+    def _path(self,term,create):
+        node = self.root
+        path = [node]
+        for c in term:
+            child = node.children.get(c)
+            if child is None:
+                if not create:
+                    return path
+                child = node.children[c] = _Node()
+            node = child
+            path.append(node)
+        return path
+
+    def _touch(self,term,create):
+        path = self._path(term,create)
+        for node in path:
+            node.dirty = True
+        if len(path) == len(term)+1:
+            path[-1].term = term
+
+    def weight(self,term):
+        """ The weight of a term (None if unknown).
+        """
+        term = _normalize(term)
+        with self.lock:
+            if term in self.weights:
+                return self.weights[term]
+            if term in self.removed or self.mmap is None:
+                return None
+            return self._file_weight(term)
+
+    def add(self,term,
+            weight=1.0):
+        """ Add a term, or add weight to a known term. A term whose weight
+        drops to 0 (negative weight) is removed.
+        """
+        term = _normalize(term)
+        if not term or len(term) > self.max_length:
+            return
+        with self.lock:
+            weight = (self.weight(term) or 0.0)+weight
+            if weight <= 0:
+                self.remove(term)
+                return
+            self.weights[term] = weight
+            self.removed.discard(term)
+            self._touch(term,True)
+
+    def remove(self,term):
+        """ Remove a term.
+        """
+        term = _normalize(term)
+        with self.lock:
+            if self.weights.pop(term,None) is not None:
+                self._touch(term,False)
+            if self.mmap is not None and self._file_weight(term) is not None:
+                self.removed.add(term)
+
+    def _terms(self,data,fields,words):
+        for field in fields:
+            value = data.get(field)
+            values = [value] if isinstance(value,str) else value if isinstance(value,list) else []
+            for value in values:
+                if not isinstance(value,str):
+                    continue
+                yield value
+                if words:
+                    for word in _WORD_RE.findall(value):
+                        if len(word) > 1 and not word.isdigit():
+                            yield word
+
+    def add_products(self,products,
+                     fields=('name',),
+                     words=True,
+                     weight=1.0):
+        """ Add the terms of products (e.g. CatalogMirror.products.values(),
+        Catalog.get_product()[1]['data'] or the ingestion source).
+
+        :params:
+            - products : iterable of dict
+                the product data
+            - fields : list of str, optional (default: ('name',))
+                The product fields (str or list of str) to add.
+            - words : boolean, optional (default: True)
+                If True the words of the fields are added as terms too.
+            - weight : float, optional (default: 1.0)
+                The weight added per occurrence.
+        """
+        for data in products:
+            for term in self._terms(data,fields,words):
+                self.add(term,weight)
+
+    def remove_products(self,products,
+                        fields=('name',),
+                        words=True,
+                        weight=1.0):
+        """ Take back the terms of deleted (or before update) products, same
+        parameters as add_products.
+        """
+        self.add_products(products,fields=fields,words=words,weight=-weight)
+
+    def add_queries(self,queries,
+                    weight=1.0):
+        """ Add past queries (e.g. a query log), every occurrence adds weight.
+        """
+        for query in queries:
+            self.add(query,weight)
+
+    #--------------------------------------------------------------------------
+    # Completion.
+    #--------------------------------------------------------------------------
+    def _refresh(self,node):
+        """ Recompute the top-k of the dirty nodes (bottom up).
+        """
+        if not node.dirty:
+            return
+        candidates = []
+        if node.term is not None and node.term in self.weights:
+            candidates.append((self.weights[node.term],node.term))
+        for child in node.children.values():
+            self._refresh(child)
+            candidates.extend(child.topk)
+        node.topk = heapq.nsmallest(self.k,candidates,key=_rank)
+        node.dirty = False
+
+    def complete(self,prefix,
+                 k=None):
+        """ The most popular completions of a prefix.
+
+        :params:
+            - prefix : str
+                the text typed so far
+            - k : int, optional (default: None)
+                The number of completions (at most the k the autocomplete
+                was created with).
+
+        :returns:
+            - completions : list of (str,float)
+                (term,weight), most popular first
+        """
+        k = min(k or self.k,self.k)
+        prefix = _SPACE_RE.sub(' ',prefix.lower()).lstrip()
+
+        with self.lock:
+            self._refresh(self.root)
+            candidates = []
+            path = self._path(prefix,False)
+            if len(path) == len(prefix)+1:
+                candidates.extend(path[-1].topk)
+            if self.mmap is not None:
+                for weight,term in self._file_complete(prefix):
+                    if term not in self.weights and term not in self.removed:
+                        candidates.append((weight,term))
+
+        return [(term,weight) for weight,term in heapq.nsmallest(k,candidates,key=_rank)]
+
+    #--------------------------------------------------------------------------
+    # Memory-mapped file.
+    #--------------------------------------------------------------------------
+    def _file_node(self,text):
+        """ The node index of text in the file (None if not found).
+        """
+        node = 0
+        for c in text:
+            _,first,count,_,_ = _NODE.unpack_from(self.mmap,self.nodes_offset+node*_NODE.size)
+            code = ord(c)
+            lo,hi = first,first+count
+            while lo < hi:
+                mid = (lo+hi)//2
+                label,child = _EDGE.unpack_from(self.mmap,self.edges_offset+mid*_EDGE.size)
+                if label < code:
+                    lo = mid+1
+                elif label > code:
+                    hi = mid
+                else:
+                    break
+            else:
+                return None
+            node = child
+        return node
+
+    def _file_term(self,term_id):
+        start,end = struct.unpack_from('<QQ',self.mmap,self.term_offsets_offset+term_id*8)
+        weight, = struct.unpack_from('<d',self.mmap,self.weights_offset+term_id*8)
+        term = self.mmap[self.strings_offset+start:self.strings_offset+end].decode('utf-8')
+        return weight,term
+
+    def _file_weight(self,term):
+        node = self._file_node(term)
+        if node is None:
+            return None
+        term_id = _NODE.unpack_from(self.mmap,self.nodes_offset+node*_NODE.size)[0]
+        return self._file_term(term_id)[0] if term_id >= 0 else None
+
+    def _file_complete(self,prefix):
+        node = self._file_node(prefix)
+        if node is None:
+            return []
+        _,_,_,first,count = _NODE.unpack_from(self.mmap,self.nodes_offset+node*_NODE.size)
+        term_ids = struct.unpack_from('<%dI'%(count),self.mmap,self.topk_offset+first*4)
+        return [self._file_term(term_id) for term_id in term_ids]
+
+    def _all_terms(self):
+        """ All the terms -> weight (file and in-memory).
+        """
+        terms = {}
+        if self.mmap is not None:
+            for term_id in range(self.n_terms):
+                weight,term = self._file_term(term_id)
+                if term not in self.removed:
+                    terms[term] = weight
+        terms.update(self.weights)
+        return terms
+
+    def __len__(self):
+        with self.lock:
+            return len(self._all_terms())
+
+    def open(self,filename=None):
+        """ Memory-map a saved trie (the in-memory terms are dropped).
+        """
+        filename = filename or self.filename
+
+        with open(filename,'rb') as f:
+            mapped = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+
+        magic,version,k,n_nodes,n_edges,n_topk,n_terms = _HEADER.unpack_from(mapped,0)
+        if magic != _MAGIC or version != _VERSION:
+            mapped.close()
+            raise ValueError('%s is not an autocomplete file.'%(filename))
+
+        with self.lock:
+            self.close()
+            self.mmap = mapped
+            self.filename = filename
+            self.k = k
+            self.n_terms = n_terms
+            self.nodes_offset = _HEADER.size
+            self.edges_offset = self.nodes_offset+n_nodes*_NODE.size
+            self.topk_offset = self.edges_offset+n_edges*_EDGE.size
+            self.term_offsets_offset = self.topk_offset+n_topk*4
+            self.weights_offset = self.term_offsets_offset+(n_terms+1)*8
+            self.strings_offset = self.weights_offset+n_terms*8
+
+    def close(self):
+        """ Unmap the file (the in-memory terms are dropped).
+        """
+        with self.lock:
+            if self.mmap is not None:
+                self.mmap.close()
+                self.mmap = None
+            self.weights = {}
+            self.removed = set()
+            self.root = _Node()
+
+    def save(self,filename=None):
+        """ Save the trie (file and in-memory terms) to a flat file. If the
+        trie was opened from this file it is reopened.
+
+        :params:
+            - filename : str, optional (default: None)
+                Defaults to the filename the autocomplete was created with.
+        """
+        filename = filename or self.filename
+
+        with self.lock:
+            terms = self._all_terms()
+
+            if self.mmap is None:
+                trie = self
+            else:
+                # a fresh trie of all the terms
+                trie = Autocomplete(k=self.k,max_length=self.max_length)
+                for term,weight in terms.items():
+                    trie.weights[term] = weight
+                    trie._touch(term,True)
+            trie._refresh(trie.root)
+
+            term_list = sorted(terms)
+            term_ids = dict((term,i) for i,term in enumerate(term_list))
+
+            # breadth first, the children of a node get consecutive edges
+            nodes = [trie.root]
+            edges = []
+            topk = []
+            node_records = []
+            i = 0
+            while i < len(nodes):
+                node = nodes[i]
+                i += 1
+                first_edge = len(edges)
+                for c in sorted(node.children):
+                    edges.append(_EDGE.pack(ord(c),len(nodes)))
+                    nodes.append(node.children[c])
+                first_topk = len(topk)
+                topk.extend(term_ids[term] for _,term in node.topk)
+                node_records.append(_NODE.pack(term_ids[node.term] if node.term in terms else -1,
+                                               first_edge,len(edges)-first_edge,
+                                               first_topk,len(topk)-first_topk))
+
+        strings = [term.encode('utf-8') for term in term_list]
+        offsets = [0]
+        for s in strings:
+            offsets.append(offsets[-1]+len(s))
+
+        tmp_filename = '%s.tmp'%(filename)
+        with open(tmp_filename,'wb') as f:
+            f.write(_HEADER.pack(_MAGIC,_VERSION,self.k,len(nodes),len(edges),len(topk),len(term_list)))
+            f.write(b''.join(node_records))
+            f.write(b''.join(edges))
+            f.write(struct.pack('<%dI'%(len(topk)),*topk))
+            f.write(struct.pack('<%dQ'%(len(offsets)),*offsets))
+            f.write(struct.pack('<%dd'%(len(term_list)),*[terms[term] for term in term_list]))
+            f.write(b''.join(strings))
+        os.replace(tmp_filename,filename)
+
+        if self.mmap is not None and filename == self.filename:
+            self.open(filename)
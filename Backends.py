@@ -0,0 +1,236 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" HTTP backends of the Transport.
+A backend sends one request: request(method,url,**kwargs) with the requests
+keyword arguments (headers, params, json, data, stream, timeout) returns a
+response with status_code, headers, content, text, json(), iter_content()
+and close().
+
+RequestsBackend (the default) uses a requests session, HTTP/1.1 with one
+request in flight per pooled connection. HTTPXBackend uses httpx (pip install
+httpx[http2]) with HTTP/2, which multiplexes the concurrent requests of all
+the threads as streams over a few connections. AsyncHTTPXBackend is the same
+for asyncio code.
+
+    transport = Transport(backend=HTTPXBackend())
+    vs = VisualSearch(api_gateway_url,api_key,transport=transport)
+
+HTTP/2 is negotiated with TLS (https gateways), plain http gateways are
+spoken to with HTTP/1.1 unless http1=False (HTTP/2 prior knowledge).
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["RequestsBackend","HTTPXBackend","AsyncHTTPXBackend"]
+
+import requests
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+class RequestsBackend():
+    """ requests backend (HTTP/1.1).
+    """
+    def __init__(self,
+                 pool_maxsize=32,
+                 pool_connections=4):
+        """ Initialization.
+
+        :params:
+            - pool_maxsize : int, optional (default: 32)
+                The maximum number of pooled connections per host.
+            - pool_connections : int, optional (default: 4)
+                The number of hosts pooled.
+        """
+
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_connections,
+                                                pool_maxsize=pool_maxsize)
+        self.session.mount('http://',adapter)
+        self.session.mount('https://',adapter)
+
+    def request(self,method,url,**kwargs):
+        return self.session.request(method,url,**kwargs)
+
+    def close(self):
+        self.session.close()
+
+class HTTPXResponse():
+    """ A requests style view of an httpx response.
+    """
+    def __init__(self,response):
+        self.response = response
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.url = str(response.url)
+        self.http_version = response.http_version
+
+    @property
+    def content(self):
+        return self.response.content
+
+    @property
+    def text(self):
+        return self.response.text
+
+    def json(self,**kwargs):
+        return self.response.json(**kwargs)
+
+    def iter_content(self,chunk_size=1):
+        return self.response.iter_bytes(chunk_size)
+
+    def close(self):
+        self.response.close()
+
+# requests arguments httpx only takes per client
+_CLIENT_ONLY = ('verify','cert','proxies')
+
+def _httpx_kwargs(method,kwargs):
+    """ The httpx build_request arguments and the send arguments for the
+    requests arguments.
+    """
+    kwargs = dict(kwargs)
+    kwargs.pop('stream',None)
+
+    for name in _CLIENT_ONLY:
+        if kwargs.pop(name,None) is not None:
+            raise TypeError('%s is set per client with the httpx backends, '
+                            'pass it to HTTPXBackend(...)'%(name))
+
+    send_kwargs = {}
+    # requests follows redirects except for HEAD (requests.head)
+    send_kwargs['follow_redirects'] = kwargs.pop('allow_redirects',method.upper() != 'HEAD')
+    if kwargs.get('auth') is not None:
+        send_kwargs['auth'] = kwargs.pop('auth')
+    kwargs.pop('auth',None)
+
+    data = kwargs.get('data')
+    if hasattr(data,'read'):
+        kwargs['content'] = data.read()
+        del kwargs['data']
+    elif isinstance(data,(bytes,bytearray,str)):
+        kwargs['content'] = data
+        del kwargs['data']
+
+    if 'timeout' in kwargs:
+        timeout = kwargs['timeout']
+        if isinstance(timeout,tuple):
+            # requests: (connect,read)
+            kwargs['timeout'] = httpx.Timeout(timeout[1],connect=timeout[0])
+        else:
+            kwargs['timeout'] = httpx.Timeout(timeout)
+
+    return kwargs,send_kwargs
+
+def _translate(e):
+    """ The requests exception for an httpx exception, so that the transport
+    failover and deadlines work the same with every backend.
+    """
+    if isinstance(e,httpx.TimeoutException):
+        return requests.exceptions.Timeout(str(e))
+    return requests.exceptions.ConnectionError(str(e))
+
+def _client_kwargs(http2,http1,max_connections,max_keepalive_connections,kwargs):
+    if httpx is None:
+        raise ImportError('the httpx backends need httpx (pip install httpx[http2]).')
+    kwargs = dict(kwargs)
+    kwargs['http2'] = http2
+    kwargs['http1'] = http1
+    # requests has no timeout by default
+    kwargs.setdefault('timeout',None)
+    kwargs['limits'] = httpx.Limits(max_connections=max_connections,
+                                    max_keepalive_connections=max_keepalive_connections)
+    return kwargs
+
+class HTTPXBackend():
+    """ httpx backend (HTTP/2).
+    """
+    def __init__(self,
+                 http2=True,
+                 http1=True,
+                 max_connections=32,
+                 max_keepalive_connections=8,
+                 **kwargs):
+        """ Initialization.
+
+        :params:
+            - http2 : boolean, optional (default: True)
+                Negotiate HTTP/2 (all the concurrent requests to a host share
+                one connection).
+            - http1 : boolean, optional (default: True)
+                If False HTTP/2 is used without negotiation (needed for plain
+                http gateways).
+            - max_connections : int, optional (default: 32)
+                The maximum number of connections (HTTP/1.1 fallback).
+            - max_keepalive_connections : int, optional (default: 8)
+            - kwargs
+                passed to httpx.Client (verify, cert, proxy, ...)
+        """
+
+        self.client = httpx.Client(**_client_kwargs(http2,http1,
+                                                    max_connections,
+                                                    max_keepalive_connections,
+                                                    kwargs))
+
+    def request(self,method,url,**kwargs):
+        stream = kwargs.get('stream',False)
+        kwargs,send_kwargs = _httpx_kwargs(method,kwargs)
+        try:
+            request = self.client.build_request(method,url,**kwargs)
+            response = self.client.send(request,stream=stream,**send_kwargs)
+        except httpx.TransportError as e:
+            raise _translate(e)
+        return HTTPXResponse(response)
+
+    def close(self):
+        self.client.close()
+
+class AsyncHTTPXBackend():
+    """ httpx backend (HTTP/2) for asyncio.
+
+        backend = AsyncHTTPXBackend()
+        responses = await asyncio.gather(*[backend.request('GET',url,headers=headers)
+                                           for url in urls])
+    """
+    def __init__(self,
+                 http2=True,
+                 http1=True,
+                 max_connections=32,
+                 max_keepalive_connections=8,
+                 **kwargs):
+        """ Initialization, see HTTPXBackend.
+        """
+
+        self.client = httpx.AsyncClient(**_client_kwargs(http2,http1,
+                                                         max_connections,
+                                                         max_keepalive_connections,
+                                                         kwargs))
+
+    async def request(self,method,url,**kwargs):
+        """ Send a request (the body is read, stream is not supported).
+
+        :returns:
+            - response : HTTPXResponse
+        """
+        kwargs,send_kwargs = _httpx_kwargs(method,kwargs)
+        try:
+            request = self.client.build_request(method,url,**kwargs)
+            response = await self.client.send(request,**send_kwargs)
+        except httpx.TransportError as e:
+            raise _translate(e)
+        return HTTPXResponse(response)
+
+    async def close(self):
+        await self.client.aclose()
@@ -0,0 +1,221 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Streaming json lines batch execution of the search APIs.
+Every input line is a request, for example
+
+    {"op":"text_search","catalog_name":"sample_catalog","query_text":"red tees"}
+    {"op":"natural_language_search","catalog_name":"sample_catalog","query_text":"red tees under 1k"}
+    {"op":"parse","query_text":"red tees"}
+    {"op":"spell_correct","query_text":"red tess"}
+    {"op":"browse","catalog_name":"sample_catalog","id":"SKLTS16AMCWSH8SH20","image_id":"1"}
+    {"op":"search","catalog_name":"sample_catalog","image_filename":"test_image.jpeg"}
+
+and every output line is the result
+
+    {"line":1,"op":"text_search","tag":...,"status":200,"response":{...}}
+
+(or "error" instead of "status"/"response"). The other fields of a request
+are passed as arguments to the API method, "tag" is copied to the result.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["Batch"]
+
+import json
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .Transport import Transport
+from .Catalog import Catalog
+from .VisualSearch import VisualSearch
+from .NaturalLanguageSearch import NaturalLanguageSearch
+
+# op -> (client,method)
+OPERATIONS = {
+    'text_search':('catalog','text_search'),
+    'natural_language_search':('nls','natural_language_search'),
+    'parse':('nls','parse'),
+    'spell_correct':('nls','spell_correct'),
+    'browse':('visual_search','browse'),
+    'search':('visual_search','search'),
+}
+
+class Batch():
+    """ Streaming json lines batch execution of the search APIs.
+    """
+    def __init__(self,api_gateway_url,api_key,
+                 version='v1',
+                 data_collection_opt_out=False,
+                 concurrency=8,
+                 rate=None,
+                 ordered=True,
+                 transport=None):
+        """ Initialization.
+
+        :params:
+            - api_gateway_url : str or list of str
+                The api gateway url.
+            - api_key : str
+                The api key.
+            - version : str, optional (default: 'v1')
+                The api version.
+            - data_collection_opt_out : boolean, optional (default: False)
+            - concurrency : int, optional (default: 8)
+                The maximum number of requests in flight.
+            - rate : float, optional (default: None)
+                If specified at most this many requests per second are sent.
+            - ordered : boolean, optional (default: True)
+                If True the results are written in the input order, else as
+                soon as they complete.
+            - transport : Transport, optional (default: None)
+                Shared by all the clients. Defaults to a transport with a
+                connection pool of size concurrency.
+        """
+
+        self.concurrency = concurrency
+        self.rate = rate
+        self.ordered = ordered
+
+        self.transport = transport if transport is not None else Transport(pool_maxsize=concurrency)
+
+        kwargs = dict(version=version,
+                      data_collection_opt_out=data_collection_opt_out,
+                      transport=self.transport)
+        self.clients = {}
+        self.clients['catalog'] = Catalog(api_gateway_url,api_key,**kwargs)
+        self.clients['visual_search'] = VisualSearch(api_gateway_url,api_key,**kwargs)
+        self.clients['nls'] = NaturalLanguageSearch(api_gateway_url,api_key,**kwargs)
+
+        self.lock = threading.Lock()
+        self.next_time = 0.0
+
+    def _pace(self):
+        """ Wait for the next send slot (rate).
+        """
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.time()
+            slot = max(self.next_time,now)
+            self.next_time = slot+1.0/self.rate
+        if slot > now:
+            time.sleep(slot-now)
+
+    def execute(self,request):
+        """ Execute one request.
+
+        :params:
+            - request : dict
+                {'op':..., 'tag':..., arguments...}
+
+        :returns:
+            - result : dict
+                {'op','tag','status','response'} or {'op','tag','error'}
+        """
+        request = dict(request)
+        op = request.pop('op',None)
+        tag = request.pop('tag',None)
+
+        result = {}
+        result['op'] = op
+        if tag is not None:
+            result['tag'] = tag
+
+        if op not in OPERATIONS:
+            result['error'] = 'unknown op %r, expected one of %s'%(op,', '.join(sorted(OPERATIONS)))
+            return result
+
+        client,method = OPERATIONS[op]
+        self._pace()
+        try:
+            status,response = getattr(self.clients[client],method)(**request)
+            result['status'] = status
+            result['response'] = response
+        except Exception as e:
+            result['error'] = '%s: %s'%(type(e).__name__,e)
+        return result
+
+    def _parse(self,number,line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request,dict):
+                raise ValueError('expected a json object')
+            return request,None
+        except ValueError as e:
+            return None,{'line':number,'error':'invalid json: %s'%(e)}
+
+    def run(self,lines,output):
+        """ Execute the requests and stream the results. At most 2*concurrency
+        requests are held in memory.
+
+        :params:
+            - lines : iterable of str
+                json lines (e.g. sys.stdin)
+            - output : file
+                the results are written here as json lines (e.g. sys.stdout)
+
+        :returns:
+            - summary : dict
+                {'requests','errors'}
+        """
+        summary = {'requests':0,'errors':0}
+
+        def write(result):
+            summary['requests'] += 1
+            if 'error' in result or result.get('status',200) >= 400:
+                summary['errors'] += 1
+            output.write(json.dumps(result,separators=(',',':')))
+            output.write('\n')
+            output.flush()
+
+        def call(number,request):
+            result = self.execute(request)
+            result['line'] = number
+            return result
+
+        window = 2*self.concurrency
+        pending = deque()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for number,line in enumerate(lines,1):
+                if not line.strip():
+                    continue
+                request,error = self._parse(number,line)
+                if error is not None:
+                    future = executor.submit(lambda error=error:error)
+                else:
+                    future = executor.submit(call,number,request)
+                pending.append(future)
+
+                if len(pending) >= window:
+                    if self.ordered:
+                        write(pending.popleft().result())
+                    else:
+                        done,_ = wait(pending,return_when=FIRST_COMPLETED)
+                        for future in done:
+                            pending.remove(future)
+                            write(future.result())
+
+            while pending:
+                if self.ordered:
+                    write(pending.popleft().result())
+                else:
+                    done,_ = wait(pending,return_when=FIRST_COMPLETED)
+                    for future in done:
+                        pending.remove(future)
+                        write(future.result())
+
+        return summary
@@ -0,0 +1,296 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Bulk catalog operations.
+Concurrent, resumable versions of the per-product Catalog APIs.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["Bulk"]
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+class Bulk():
+    """ Bulk catalog operations.
+    """
+    def __init__(self,catalog,
+                 max_workers=8,
+                 progress=None,
+                 limiter=None):
+        """ Initialization.
+
+        :params:
+            - catalog : Catalog
+                The catalog client.
+            - max_workers : int, optional (default: 8)
+                The maximum number of concurrent requests.
+            - progress : callable, optional (default: None)
+                Called as progress(summary) after every completed request,
+                see _run for the summary fields.
+            - limiter : AdaptiveLimiter, optional (default: None)
+                If specified the concurrency is adapted to the gateway (up
+                to limiter.max_limit) instead of max_workers.
+        """
+
+        self.catalog = catalog
+        self.max_workers = max_workers
+        self.progress = progress
+        self.limiter = limiter
+
+    #--------------------------------------------------------------------------
+    # Run a function concurrently over keys.
+    #--------------------------------------------------------------------------
+    def _run(self,fn,keys,
+             checkpoint_filename=None,
+             ok_status=(200,201,202,204)):
+        """ Call fn(key) concurrently for every key, at most max_workers (or
+        the adaptive limit) in flight.
+
+        :params:
+            - fn : callable
+                fn(key) returns (status_code,response).
+            - keys : iterable of str
+                The keys. Consumed lazily.
+            - checkpoint_filename : str, optional (default: None)
+                Keys that succeeded are appended to this file. Keys already
+                in the file are skipped, so an interrupted run can be resumed
+                by running it again with the same file.
+            - ok_status : tuple of int
+                The status codes treated as success.
+
+        :returns:
+            - summary : dict
+                summary['succeeded'] - number of keys that succeeded
+                summary['skipped'] - number of keys skipped (checkpoint)
+                summary['failed'] - key -> (status_code,response). An
+                exception is reported as (None,str(exception)).
+                summary['concurrency'] - with a limiter, see
+                AdaptiveLimiter.summary
+        """
+        done = set()
+        if checkpoint_filename is not None and os.path.exists(checkpoint_filename):
+            with open(checkpoint_filename,'r') as f:
+                done = set(line.rstrip('\n') for line in f)
+
+        summary = {}
+        summary['succeeded'] = 0
+        summary['skipped'] = 0
+        summary['failed'] = {}
+
+        checkpoint = None
+        if checkpoint_filename is not None:
+            checkpoint = open(checkpoint_filename,'a')
+
+        limiter = self.limiter
+
+        def call(key):
+            start = time.time()
+            try:
+                result = fn(key)
+            except Exception as e:
+                result = None,str(e)
+            if limiter is not None:
+                limiter.update(start,time.time()-start,result[0])
+            return result
+
+        def collect(futures):
+            for future in futures:
+                key = pending.pop(future)
+                status,response = future.result()
+                if status in ok_status:
+                    summary['succeeded'] += 1
+                    if checkpoint is not None:
+                        checkpoint.write('%s\n'%(key))
+                        checkpoint.flush()
+                else:
+                    summary['failed'][key] = (status,response)
+                if self.progress is not None:
+                    self.progress(summary)
+
+        if limiter is None:
+            max_workers = self.max_workers
+            window = lambda:2*self.max_workers
+        else:
+            max_workers = limiter.max_limit
+            window = lambda:int(limiter.limit)
+
+        pending = {}
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for key in keys:
+                    if key in done:
+                        summary['skipped'] += 1
+                        continue
+                    while len(pending) >= window():
+                        finished,_ = wait(pending,return_when=FIRST_COMPLETED)
+                        collect(finished)
+                    pending[executor.submit(call,key)] = key
+                collect(list(wait(pending)[0]))
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+        if limiter is not None:
+            summary['concurrency'] = limiter.summary()
+
+        return summary
+
+    #--------------------------------------------------------------------------
+    # Bulk delete products from a catalog.
+    # DELETE /v1/catalog/{catalog_name}/products/{id}
+    # params - delete_images
+    #--------------------------------------------------------------------------
+    def delete_products(self,catalog_name,
+                        ids=None,
+                        manifest=None,
+                        predicate=None,
+                        delete_images=False,
+                        checkpoint_filename=None):
+        """ Delete products from a catalog concurrently.
+
+        :params:
+            - catalog_name : str
+                the catalog name
+            - ids : iterable of str, optional (default: None)
+                the product ids to delete
+            - manifest : dict or CatalogMirror, optional (default: None)
+                A local manifest (id -> product data, or a CatalogMirror).
+                Used together with predicate instead of ids.
+            - predicate : callable, optional (default: None)
+                predicate(data) returns True for the products in the manifest
+                to delete. If None all the products in the manifest are
+                deleted.
+            - delete_images : boolean, optional (default: False)
+                Set this to True if you want to delete the images.
+            - checkpoint_filename : str, optional (default: None)
+                Makes the delete resumable, see _run.
+
+        :returns:
+            - summary : dict
+                see _run. Products that are already gone (404) count as
+                succeeded.
+        """
+        products = getattr(manifest,'products',manifest)
+
+        if ids is None:
+            if products is None:
+                raise ValueError('Specify either ids or a manifest.')
+            ids = [id for id,data in list(products.items())
+                   if predicate is None or predicate(data)]
+
+        def delete(id):
+            status,response = self.catalog.delete_product(catalog_name=catalog_name,
+                                                          id=id,
+                                                          delete_images=delete_images)
+            if status in (200,202,204,404) and hasattr(manifest,'delete_product'):
+                manifest.delete_product(id)
+            return status,response
+
+        return self._run(delete,ids,
+                         checkpoint_filename=checkpoint_filename,
+                         ok_status=(200,201,202,204,404))
+
+    #--------------------------------------------------------------------------
+    # Bulk delete product catalogs.
+    # DELETE /v1/catalog/{catalog_name}
+    # params - delete_images
+    #--------------------------------------------------------------------------
+    def delete_catalogs(self,catalog_names,
+                        delete_images=True,
+                        checkpoint_filename=None):
+        """ Delete product catalogs concurrently.
+
+        :params:
+            - catalog_names : iterable of str
+                the catalog names
+            - delete_images : boolean, optional (default: True)
+                By default deletes all the catalog images unless this is set
+                to False.
+            - checkpoint_filename : str, optional (default: None)
+                Makes the delete resumable, see _run.
+
+        :returns:
+            - summary : dict
+                see _run.
+        """
+        def delete(catalog_name):
+            return self.catalog.delete(catalog_name=catalog_name,
+                                       delete_images=delete_images)
+
+        return self._run(delete,catalog_names,
+                         checkpoint_filename=checkpoint_filename,
+                         ok_status=(200,201,202,204,404))
+
+    #--------------------------------------------------------------------------
+    # Bulk add products to a catalog.
+    # POST /v1/catalog/{catalog_name}/products/{id}
+    # params - download_images
+    #--------------------------------------------------------------------------
+    def add_products(self,catalog_name,products,
+                     download_images=True,
+                     preflight=None,
+                     checkpoint_filename=None):
+        """ Add products to a catalog concurrently.
+
+        :params:
+            - catalog_name : str
+                the catalog name
+            - products : iterable of dict
+                the product data (each with an 'id' field)
+            - download_images : boolean, optional(default: True)
+                By default all the images specified in the json will be
+                downloaded. Set this to false if you do not want to
+                download the images.
+            - preflight : Preflight, optional (default: None)
+                If specified the products are validated (and the image urls
+                checked when download_images is True) before the upload.
+                Rejected products are not sent.
+            - checkpoint_filename : str, optional (default: None)
+                Makes the upload resumable, see _run.
+
+        :returns:
+            - summary : dict
+                see _run, and
+                summary['rejected'] - id -> list of errors, for the products
+                rejected by the pre-flight checks.
+        """
+        products = list(products)
+        # the input position of every product (preflight returns the same objects)
+        positions = dict((id(data),i) for i,data in enumerate(products))
+
+        rejected = []
+        if preflight is not None:
+            products,rejected = preflight.run(products,
+                                              check_images=download_images)
+
+        data_by_id = dict((data['id'],data) for data in products)
+
+        def add(id):
+            return self.catalog.add_product(catalog_name=catalog_name,
+                                            id=id,
+                                            data=data_by_id[id],
+                                            download_images=download_images)
+
+        summary = self._run(add,list(data_by_id),
+                            checkpoint_filename=checkpoint_filename)
+        summary['rejected'] = {}
+        for data,errors in rejected:
+            # products without a valid id are reported by input position
+            key = data.get('id') if isinstance(data,dict) else None
+            if not isinstance(key,str):
+                key = '#%d'%(positions[id(data)])
+            summary['rejected'][key] = errors
+
+        return summary
@@ -22,7 +22,9 @@ __all__ = ["Catalog"]
 
 import os
 import json
-import requests
+from .Transport import Transport
+from .LoadBalancer import gateway_url
+from .Stream import iter_results
 
 try:
     from urllib.parse import urljoin
@@ -36,28 +38,49 @@ class Catalog():
                  api_gateway_url,
                  api_key,
                  version='v1',
-                 data_collection_opt_out=False):
+                 data_collection_opt_out=False,
+                 transport=None):
         """ Initialization.
 
         :params:
-            - api_gateway_url : str
-                The api gateway url.
+            - api_gateway_url : str or list of str
+                The api gateway url. If a list is given the requests are
+                balanced across the gateways (see Transport.balance).
             - api_key : str    
                 The api key.    
             - version : str, optional (default: 'v1')
                 The api version.    
             - data_collection_opt_out : boolean, optional (default: False)
                 https://cognitivefashion.github.io/slate/#data-collection
+            - transport : Transport, optional (default: None)
+                The request path (connection pool, rate limits). Pass the
+                same transport to several clients to share it.
         """
 
         self.api_gateway_url = api_gateway_url
         self.version = version
+        self.transport = transport if transport is not None else Transport()
         self.api_key = api_key
 
         self.headers = {}
         self.headers['X-Api-Key'] = self.api_key
         self.headers['X-Data-Collection-Opt-Out'] = str(data_collection_opt_out).lower()
 
+        if isinstance(api_gateway_url,(list,tuple)):
+            self.api_gateway_url = gateway_url(api_gateway_url[0])
+            self.transport.balance(api_gateway_url,
+                                   probe_path='%s/fashion_quote'%(self.version),
+                                   probe_headers=self.headers)
+
+    #--------------------------------------------------------------------------
+    # Close.
+    #--------------------------------------------------------------------------
+    def close(self):
+        """ Close the transport (shared with the other clients using it):
+        stops the load balancer health probes and closes the connections.
+        """
+        self.transport.close()
+
     #--------------------------------------------------------------------------
     # Get a random fashion quote.  
     # GET /v1/fashion_quote
@@ -78,9 +101,9 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)        
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)        
 
         return response.status_code,response.json()
 
@@ -110,10 +133,10 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.post(url,
-                                 headers=self.headers,
-                                 params=params,
-                                 json=data)
+        response = self.transport.post(url,
+                                       headers=self.headers,
+                                       params=params,
+                                       json=data)
 
         return response.status_code,response.json()
 
@@ -130,9 +153,9 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)        
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)        
 
         return response.status_code,response.json()            
 
@@ -155,12 +178,45 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                 headers=self.headers,
-                                 params=params)
+        response = self.transport.get(url,
+                                       headers=self.headers,
+                                       params=params)
 
         return response.status_code,response.json()
     
+    #--------------------------------------------------------------------------
+    # Stream the info about a product catalog.
+    # GET /v1/catalog/{catalog_name}
+    #--------------------------------------------------------------------------
+    def info_iter(self,catalog_name,
+                  key=None,
+                  fields=None):
+        """ Get info about a product catalog, yielding the items of its list
+        one by one as the response is received (see Stream.iter_results).
+
+        :params:
+            - catalog_name : str
+                the catalog name
+            - key : str, optional (default: None)
+                The top level key of the list. By default the first list.
+            - fields : list of str, optional (default: None)
+                If specified only these fields of every item are returned.
+        """
+
+        params={}
+
+        api_endpoint = '%s/catalog/%s'%(self.version,
+                                         catalog_name)
+
+        url = urljoin(self.api_gateway_url,api_endpoint)
+
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params,
+                                      stream=True)
+
+        return iter_results(response,key=key,fields=fields)
+
     #--------------------------------------------------------------------------
     # Delete a product catalog.
     # DELETE /v1/catalog/{catalog_name}
@@ -186,9 +242,9 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.delete(url,
-                                 headers=self.headers,
-                                 params=params)
+        response = self.transport.delete(url,
+                                       headers=self.headers,
+                                       params=params)
 
         return response.status_code,response.json()
 
@@ -220,12 +276,53 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()  
 
+    #--------------------------------------------------------------------------
+    # Basic text search, streamed
+    # GET /v1/catalog/{catalog_name}/text_search
+    # params : query_text, max_number_of_results
+    #--------------------------------------------------------------------------
+    def text_search_iter(self,catalog_name,query_text,
+                         max_number_of_results=12,
+                         fields=None):
+        """ Basic text search, yielding the products one by one as the
+        response is received. Stop iterating to drop the rest of the
+        response.
+
+        :params:
+            - catalog_name : str
+                the catalog name
+            - query_text : string
+                the search query
+            - max_number_of_results : int
+                maximum number of results to return
+                (defaults to 12)
+            - fields : list of str, optional (default: None)
+                If specified only these fields of every product are returned
+                (e.g. ['id','score']).
+        """
+
+        params={}
+        params['query_text'] = query_text
+        params['max_number_of_results'] = max_number_of_results
+
+        api_endpoint = '%s/catalog/%s/text_search'%(self.version,
+                                                    catalog_name)
+
+        url = urljoin(self.api_gateway_url,api_endpoint)
+
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params,
+                                      stream=True)
+
+        return iter_results(response,key='products',fields=fields)
+
     #--------------------------------------------------------------------------
     # Add product to a catalog.    
     # POST /v1/catalog/{catalog_name}/products/{id}
@@ -257,10 +354,10 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.post(url,
-                                 headers=self.headers,
-                                 json=data,
-                                 params=params)
+        response = self.transport.post(url,
+                                       headers=self.headers,
+                                       json=data,
+                                       params=params)
 
         return response.status_code,response.json()
 
@@ -295,10 +392,10 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.put(url,
-                                headers=self.headers,
-                                json=data,
-                                params=params)
+        response = self.transport.put(url,
+                                      headers=self.headers,
+                                      json=data,
+                                      params=params)
 
         return response.status_code,response.json()    
 
@@ -325,9 +422,9 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()   
 
@@ -358,9 +455,9 @@ class Catalog():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.delete(url,
-                                   headers=self.headers,
-                                   params=params)
+        response = self.transport.delete(url,
+                                         headers=self.headers,
+                                         params=params)
 
         return response.status_code,response.json()   
 
@@ -411,7 +508,7 @@ class Catalog():
             image_filename = response_product['data']['images'][image_id]['image_filename']
             
             image_location = '%s/catalog/%s/images/%s'%(self.version,
-                                                        catalog_name,
+                                                        self.transport.resolve_catalog(catalog_name),
                                                         image_filename)
 
             if top_left_x is None: 
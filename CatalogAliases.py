@@ -0,0 +1,214 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Client-side catalog aliases for blue/green reindexing.
+Products are ingested and indexed into a shadow catalog, and once the visual
+search index is ready the alias that all the clients resolve through is
+flipped to it.
+
+    aliases = CatalogAliases('/var/run/cfapisdk/aliases.json')
+    transport = Transport(aliases=aliases)
+    catalog = Catalog(api_gateway_url,api_key,transport=transport)
+    vs = VisualSearch(api_gateway_url,api_key,transport=transport)
+
+    # ingest into and index 'shop_v2' ...
+    vs.index_build(catalog_name='shop_v2')
+    aliases.swap('shop','shop_v2',visual_search=vs,catalog=catalog,cleanup=True)
+
+    # all calls with catalog_name='shop' now go to 'shop_v2'
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["CatalogAliases"]
+
+import os
+import re
+import json
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    from urllib.parse import urlparse, urlunparse
+except ImportError:
+    from urlparse import urlparse, urlunparse
+
+_CATALOG_PATH_RE = re.compile(r'(/catalog/)([^/]+)')
+
+class CatalogAliases():
+    """ Client-side catalog aliases.
+    """
+    def __init__(self,
+                 filename=None,
+                 reload_interval=1.0):
+        """ Initialization.
+
+        :params:
+            - filename : str, optional (default: None)
+                The json file the aliases are kept in, shared by all the
+                processes using it. If None the aliases are kept in memory.
+            - reload_interval : float, optional (default: 1.0)
+                Seconds between checks for changes made by other processes.
+        """
+
+        self.filename = filename
+        self.reload_interval = reload_interval
+
+        self.aliases = {}
+        self.mtime = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+
+        if filename is not None:
+            self._reload(force=True)
+
+    #--------------------------------------------------------------------------
+    # Persistence.
+    #--------------------------------------------------------------------------
+    def _reload(self,force=False):
+        now = time.time()
+        if not force and now-self.checked < self.reload_interval:
+            return
+        self.checked = now
+        try:
+            mtime = os.stat(self.filename).st_mtime
+        except OSError:
+            self.aliases = {}
+            return
+        if force or mtime != self.mtime:
+            with open(self.filename,'r') as f:
+                self.aliases = json.load(f)
+            self.mtime = mtime
+
+    def _update(self,fn):
+        """ Apply fn(aliases) under the lock and write the file atomically.
+        """
+        with self.lock:
+            if self.filename is None:
+                fn(self.aliases)
+                return
+
+            lock_fd = os.open('%s.lock'%(self.filename),os.O_RDWR | os.O_CREAT,0o600)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(lock_fd,fcntl.LOCK_EX)
+                self._reload(force=True)
+                aliases = dict(self.aliases)
+                fn(aliases)
+                tmp_filename = '%s.%d.tmp'%(self.filename,os.getpid())
+                with open(tmp_filename,'w') as f:
+                    json.dump(aliases,f,indent=2,sort_keys=True)
+                os.replace(tmp_filename,self.filename)
+                self._reload(force=True)
+            finally:
+                os.close(lock_fd)
+
+    #--------------------------------------------------------------------------
+    # Aliases.
+    #--------------------------------------------------------------------------
+    def resolve(self,catalog_name):
+        """ The catalog an alias points to (catalog_name if not an alias).
+        """
+        if self.filename is not None:
+            with self.lock:
+                self._reload()
+        return self.aliases.get(catalog_name,catalog_name)
+
+    def resolve_url(self,url):
+        """ Resolve the catalog name in an api url
+        (.../catalog/{catalog_name}/...).
+        """
+        parts = urlparse(url)
+        path = _CATALOG_PATH_RE.sub(lambda m:m.group(1)+self.resolve(m.group(2)),
+                                    parts.path,count=1)
+        if path == parts.path:
+            return url
+        return urlunparse(parts._replace(path=path))
+
+    def set(self,alias,catalog_name):
+        """ Point an alias to a catalog (atomically for all the processes).
+        """
+        def fn(aliases):
+            aliases[alias] = catalog_name
+        self._update(fn)
+
+    def remove(self,alias):
+        """ Remove an alias.
+        """
+        def fn(aliases):
+            aliases.pop(alias,None)
+        self._update(fn)
+
+    #--------------------------------------------------------------------------
+    # Blue/green swap.
+    #--------------------------------------------------------------------------
+    def swap(self,alias,catalog_name,
+             visual_search=None,
+             catalog=None,
+             wait=True,
+             poll_interval=10.0,
+             timeout=3600.0,
+             cleanup=False,
+             delete_images=True):
+        """ Flip an alias to a (shadow) catalog once it is ready.
+
+        :params:
+            - alias : str
+                the alias
+            - catalog_name : str
+                the new (shadow) catalog
+            - visual_search : VisualSearch, optional (default: None)
+                If specified (and wait is True) first waits for the visual
+                search index of the new catalog (VisualSearch.index_wait).
+            - catalog : Catalog, optional (default: None)
+                Needed for cleanup.
+            - wait : boolean, optional (default: True)
+            - poll_interval : float, optional (default: 10.0)
+                Seconds between index_status calls.
+            - timeout : float, optional (default: 3600.0)
+                Passed to VisualSearch.index_wait.
+            - cleanup : boolean, optional (default: False)
+                If True deletes the catalog the alias pointed to before with
+                Catalog.delete.
+            - delete_images : boolean, optional (default: True)
+                Passed to Catalog.delete.
+
+        :returns:
+            - old_catalog_name : str
+                the catalog the alias pointed to before (None if it was not
+                set)
+        """
+        if cleanup and catalog is None:
+            raise ValueError('cleanup needs a catalog client.')
+
+        if wait and visual_search is not None:
+            visual_search.index_wait(catalog_name=catalog_name,
+                                     poll_interval=poll_interval,
+                                     timeout=timeout)
+
+        old = []
+        def fn(aliases):
+            old.append(aliases.get(alias))
+            aliases[alias] = catalog_name
+        self._update(fn)
+
+        old_catalog_name = old[0]
+        if cleanup and old_catalog_name is not None and old_catalog_name != catalog_name:
+            catalog.delete(catalog_name=old_catalog_name,
+                           delete_images=delete_images)
+
+        return old_catalog_name
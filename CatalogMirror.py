@@ -0,0 +1,342 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Local catalog mirror.
+A local copy of a product catalog with an in-process inverted index (BM25)
+that answers Catalog.text_search queries without a network round trip.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["CatalogMirror"]
+
+import os
+import re
+import json
+import gzip
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_TOKEN_RE = re.compile(r'\w+',re.UNICODE)
+
+def _tokenize(text):
+    """ Lowercase word tokens of a string.
+    """
+    return _TOKEN_RE.findall(text.lower())
+
+class CatalogMirror():
+    """ Local catalog mirror.
+    """
+    def __init__(self,catalog,catalog_name,
+                 filename=None,
+                 fields=None,
+                 k1=1.2,
+                 b=0.75):
+        """ Initialization.
+
+        :params:
+            - catalog : Catalog
+                The catalog client used to fetch products.
+            - catalog_name : str
+                the catalog name
+            - filename : str, optional (default: None)
+                The file the mirror is saved to / loaded from (gzipped json
+                lines, one product per line). If the file exists it is loaded.
+            - fields : list of str, optional (default: None)
+                The product fields to index. By default all the string (and
+                list of string) fields of the product except 'images' are
+                indexed.
+            - k1 : float, optional (default: 1.2)
+                BM25 term frequency saturation.
+            - b : float, optional (default: 0.75)
+                BM25 document length normalization.
+        """
+
+        self.catalog = catalog
+        self.catalog_name = catalog_name
+        self.filename = filename
+        self.fields = fields
+        self.k1 = k1
+        self.b = b
+
+        self.products = {}
+        # term -> {id: term frequency}
+        self.postings = {}
+        # id -> number of tokens
+        self.doc_length = {}
+        self.total_length = 0
+
+        self.lock = threading.RLock()
+
+        if filename is not None and os.path.exists(filename):
+            self.load()
+
+    def __len__(self):
+        return len(self.products)
+
+    def __contains__(self,id):
+        return id in self.products
+
+    #--------------------------------------------------------------------------
+    # Indexing.
+    #--------------------------------------------------------------------------
+    def _text(self,data):
+        """ The indexed text of a product.
+        """
+        if self.fields is not None:
+            keys = self.fields
+        else:
+            keys = [key for key in data if key != 'images']
+
+        text = []
+        for key in keys:
+            value = data.get(key)
+            if isinstance(value,str):
+                text.append(value)
+            elif isinstance(value,list):
+                text.extend([v for v in value if isinstance(v,str)])
+        return ' '.join(text)
+
+    def _index(self,id,data):
+        tokens = _tokenize(self._text(data))
+
+        tf = {}
+        for token in tokens:
+            tf[token] = tf.get(token,0)+1
+
+        for term,count in tf.items():
+            self.postings.setdefault(term,{})[id] = count
+
+        self.doc_length[id] = len(tokens)
+        self.total_length += len(tokens)
+
+    def _unindex(self,id):
+        data = self.products.get(id)
+        if data is None:
+            return
+
+        for term in set(_tokenize(self._text(data))):
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(id,None)
+                if not posting:
+                    del self.postings[term]
+
+        self.total_length -= self.doc_length.pop(id,0)
+
+    #--------------------------------------------------------------------------
+    # Local updates (from the ingestion source).
+    #--------------------------------------------------------------------------
+    def add_product(self,id,data):
+        """ Add (or replace) a product in the mirror.
+
+        :params:
+            - id : str
+                the product id
+            - data : dict
+                the product data
+        """
+        with self.lock:
+            self._unindex(id)
+            self.products[id] = data
+            self._index(id,data)
+
+    def update_product(self,id,data):
+        """ Update a product in the mirror (same semantics as
+        Catalog.update_product, the fields in data are merged).
+
+        :params:
+            - id : str
+                the product id
+            - data : dict
+                the product data to merge
+        """
+        with self.lock:
+            merged = dict(self.products.get(id,{}))
+            merged.update(data)
+            self.add_product(id,merged)
+
+    def delete_product(self,id):
+        """ Delete a product from the mirror.
+
+        :params:
+            - id : str
+                the product id
+        """
+        with self.lock:
+            self._unindex(id)
+            self.products.pop(id,None)
+
+    def add_products(self,products):
+        """ Add products from the ingestion source.
+
+        :params:
+            - products : iterable of dict
+                the product data (each with an 'id' field)
+        """
+        with self.lock:
+            for data in products:
+                self.add_product(data['id'],data)
+
+    #--------------------------------------------------------------------------
+    # Remote updates (via Catalog.get_product).
+    #--------------------------------------------------------------------------
+    def populate(self,ids,
+                 max_workers=8):
+        """ Fetch products concurrently with Catalog.get_product and add them
+        to the mirror.
+
+        :params:
+            - ids : iterable of str
+                the product ids
+            - max_workers : int, optional (default: 8)
+                The number of concurrent requests.
+
+        :returns:
+            - failures : dict
+                id -> (status_code,response) for products that could not be
+                fetched.
+        """
+        return self.refresh(updated=ids,max_workers=max_workers)
+
+    def refresh(self,
+                updated=None,
+                deleted=None,
+                max_workers=8):
+        """ Incremental refresh. Re-fetches the added/updated products and
+        drops the deleted ones without rebuilding the index.
+
+        :params:
+            - updated : iterable of str, optional (default: None)
+                ids of products added or updated since the last refresh. A
+                product that no longer exists (404) is removed.
+            - deleted : iterable of str, optional (default: None)
+                ids of products deleted since the last refresh.
+            - max_workers : int, optional (default: 8)
+                The number of concurrent requests.
+
+        :returns:
+            - failures : dict
+                id -> (status_code,response) for products that could not be
+                fetched.
+        """
+        failures = {}
+
+        for id in (deleted or []):
+            self.delete_product(id)
+
+        def fetch(id):
+            return id,self.catalog.get_product(catalog_name=self.catalog_name,
+                                               id=id)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for id,(status,response) in executor.map(fetch,updated or []):
+                if status == 202:
+                    self.add_product(id,response['data'])
+                elif status == 404:
+                    self.delete_product(id)
+                else:
+                    failures[id] = (status,response)
+
+        return failures
+
+    #--------------------------------------------------------------------------
+    # Basic text search (local)
+    #--------------------------------------------------------------------------
+    def text_search(self,catalog_name,query_text,
+                    max_number_of_results=12):
+        """ Basic text search answered from the local index (BM25 ranking).
+        Same signature and response format as Catalog.text_search. Queries
+        for any other catalog are sent to the remote Catalog.text_search.
+
+        :params:
+            - catalog_name : str
+                the catalog name
+            - query_text : string
+                the search query
+            - max_number_of_results : int
+                maximum number of results to return
+                (defaults to 12)
+
+        :returns:
+            - status_code : int
+                200
+            - response : dict
+                response['products'] - list of {'id','score'} sorted by score.
+        """
+        if catalog_name != self.catalog_name:
+            return self.catalog.text_search(catalog_name=catalog_name,
+                                            query_text=query_text,
+                                            max_number_of_results=max_number_of_results)
+
+        with self.lock:
+            n = len(self.products)
+            average_length = float(self.total_length)/n if n else 0.0
+
+            scores = {}
+            for term in set(_tokenize(query_text)):
+                posting = self.postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1.0+(n-df+0.5)/(df+0.5))
+                for id,tf in posting.items():
+                    norm = 1.0-self.b+self.b*self.doc_length[id]/average_length
+                    scores[id] = scores.get(id,0.0)+idf*tf*(self.k1+1.0)/(tf+self.k1*norm)
+
+        ranked = sorted(scores.items(),key=lambda item:(-item[1],item[0]))
+
+        response = {}
+        response['products'] = [{'id':id,'score':score}
+                                for id,score in ranked[:max_number_of_results]]
+
+        return 200,response
+
+    #--------------------------------------------------------------------------
+    # Persistence.
+    #--------------------------------------------------------------------------
+    def save(self,filename=None):
+        """ Save the mirror (gzipped json lines, one product per line).
+
+        :params:
+            - filename : str, optional (default: None)
+                Defaults to the filename the mirror was created with.
+        """
+        filename = filename or self.filename
+
+        tmp_filename = '%s.tmp'%(filename)
+        with self.lock:
+            with gzip.open(tmp_filename,'wt') as f:
+                for id,data in self.products.items():
+                    f.write(json.dumps({'id':id,'data':data},separators=(',',':')))
+                    f.write('\n')
+        os.replace(tmp_filename,filename)
+
+    def load(self,filename=None):
+        """ Load the mirror and rebuild the local index.
+
+        :params:
+            - filename : str, optional (default: None)
+                Defaults to the filename the mirror was created with.
+        """
+        filename = filename or self.filename
+
+        with self.lock:
+            self.products = {}
+            self.postings = {}
+            self.doc_length = {}
+            self.total_length = 0
+            with gzip.open(filename,'rt') as f:
+                for line in f:
+                    record = json.loads(line)
+                    self.add_product(record['id'],record['data'])
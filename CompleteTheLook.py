@@ -1,7 +1,7 @@
 #
 # Licensed Materials - Property of IBM
 #
-# AI For Fashion 
+# AI For Fashion
 #
 # (C) Copyright IBM Corp. 2018 All Rights Reserved
 #
@@ -22,7 +22,14 @@ __all__ = ["CompleteTheLook"]
 
 import os
 import json
-import requests
+import copy
+import time
+import threading
+from collections import OrderedDict
+from .Transport import Transport
+from .LoadBalancer import gateway_url
+from .Hydrator import Hydrator
+
 try:
     from urllib.parse import urljoin
 except ImportError:
@@ -35,35 +42,173 @@ class CompleteTheLook():
                  api_gateway_url,
                  api_key,
                  version='v1',
-                 data_collection_opt_out=False):
+                 data_collection_opt_out=False,
+                 transport=None,
+                 catalog=None,
+                 cache_size=1024,
+                 cache_ttl=None,
+                 product_cache_size=4096,
+                 hydrator=None):
         """ Initialization.
 
         :params:
-            - api_gateway_url : str
-            - api_key : str    
+            - api_gateway_url : str or list of str
+            - api_key : str
             - data_collection_opt_out : boolean, optional (default: False)
+            - transport : Transport, optional (default: None)
+            - catalog : Catalog, optional (default: None)
+                The catalog client used to hydrate the recommended items.
+            - cache_size : int, optional (default: 1024)
+                The number of recommendations cached. Set to 0 to disable
+                the cache.
+            - cache_ttl : float, optional (default: None)
+                If specified cached recommendations (and hydrated products)
+                expire after this many seconds.
+            - product_cache_size : int, optional (default: 4096)
+                The number of hydrated products cached, the products that
+                come back in several outfits are fetched once. Set to 0 to
+                disable the cache.
+            - hydrator : Hydrator, optional (default: None)
+                If specified used to hydrate (to share its product cache with
+                other clients) instead of a hydrator of the catalog.
         """
 
         self.api_gateway_url = api_gateway_url
         self.version = version
+        self.transport = transport if transport is not None else Transport()
+        self.catalog = catalog
+        self.hydrator = hydrator
+        if self.hydrator is None and catalog is not None:
+            self.hydrator = Hydrator(catalog,
+                                     cache_size=product_cache_size,
+                                     cache_ttl=cache_ttl)
 
         self.headers = {}
+        self.headers['X-Api-Key'] = api_key
+        self.headers['X-Data-Collection-Opt-Out'] = str(data_collection_opt_out).lower()
+
+        if isinstance(api_gateway_url,(list,tuple)):
+            self.api_gateway_url = gateway_url(api_gateway_url[0])
+            self.transport.balance(api_gateway_url,
+                                   probe_path='%s/fashion_quote'%(self.version),
+                                   probe_headers=self.headers)
+
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # (gender,normalized query_text,catalog_name) -> (timestamp,response)
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+    #--------------------------------------------------------------------------
+    # Close.
+    #--------------------------------------------------------------------------
+    def close(self):
+        """ Close the transport (shared with the other clients using it):
+        stops the load balancer health probes and closes the connections.
+        """
+        self.transport.close()
+
+    #--------------------------------------------------------------------------
+    # Result cache.
+    #--------------------------------------------------------------------------
+    def _cache_get(self,key):
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry is None:
+                return None
+            if self.cache_ttl is not None and time.time()-entry[0] > self.cache_ttl:
+                del self.cache[key]
+                return None
+            self.cache.move_to_end(key)
+            return copy.deepcopy(entry[1])
+
+    def _cache_put(self,key,response):
+        if self.cache_size <= 0:
+            return
+        with self.cache_lock:
+            self.cache[key] = (time.time(),copy.deepcopy(response))
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def clear_cache(self):
+        """ Clear the result cache and the product cache.
+        """
+        with self.cache_lock:
+            self.cache.clear()
+        if self.hydrator is not None:
+            self.hydrator.clear_cache()
 
     #--------------------------------------------------------------------------
-    # Get a style tip and set of recommended items for the text query.  
+    # Get a style tip and set of recommended items for the text query.
     # GET /v1/complete_the_look/text/
-    # params: 
+    # params: query_text
+    #         gender
     #--------------------------------------------------------------------------
-    def get_recommendation(self,
-			   gender,
-                           query_text)
-                           
-        api_endpoint = 'v1/complete_the_look/text/'
+    def get_recommendation(self,gender,query_text,
+                           catalog_name=None,
+                           hydrate=False,
+                           max_workers=8,
+                           use_cache=True):
+        """ Get a style tip and set of recommended items for the text query.
+
+        :params:
+            - gender : str
+                the gender
+            - query_text : str
+                the text query
+            - catalog_name : str, optional (default: None)
+                The catalog the recommended item ids belong to (needed for
+                hydrate).
+            - hydrate : boolean, optional (default: False)
+                If True every recommended item (the result lists of the
+                response) is filled in concurrently with
+                item['product_info'], item['image_url'] and
+                item['image_url_local'] (see Hydrator). The items that could
+                not be filled in (errors, Deadline) are returned as they are
+                and the response is not cached.
+            - max_workers : int, optional (default: 8)
+                The number of concurrent requests used to hydrate.
+            - use_cache : boolean, optional (default: True)
+                If False the cache is bypassed (and refreshed).
+
+        :returns:
+            - status_code : int
+                the status code of the response
+            - response : json
+                the response
+        """
+        if hydrate and (self.hydrator is None or catalog_name is None):
+            raise ValueError('hydrate needs a catalog client and catalog_name.')
+
+        key = (gender,' '.join(query_text.lower().split()),
+               catalog_name if hydrate else None)
+
+        if use_cache:
+            response = self._cache_get(key)
+            if response is not None:
+                return 200,response
+
+        api_endpoint = '%s/complete_the_look/text/'%(self.version)
+
         url = urljoin(self.api_gateway_url,api_endpoint)
 
         params = {}
         params['query_text'] = query_text
         params['gender'] = gender
 
-        response = requests.get(url,headers=headers,params=params)
-        return response.status_code, response.json()
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
+
+        status,response_json = response.status_code,response.json()
+
+        if status == 200:
+            missing = []
+            if hydrate:
+                missing = self.hydrator.hydrate(catalog_name,response_json,
+                                                max_workers=max_workers)
+            if not missing:
+                self._cache_put(key,response_json)
+
+        return status,response_json
@@ -0,0 +1,117 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" End-to-end deadlines.
+A deadline is a time budget for a group of API calls. While it is active (in
+the current thread) every request sent through a Transport gets the remaining
+budget as its timeout, and once the budget is spent requests fail fast with
+DeadlineExceeded instead of being sent.
+
+    with Deadline(0.3):
+        status,response = nls.natural_language_search(catalog_name,query_text)
+        status,response = catalog.image_url(catalog_name,id)
+
+The helpers that fan out to worker threads (ShardedCatalog, CompleteTheLook)
+carry the caller's deadline over to the workers, use deadline.wrap(fn) to do
+the same in your own code.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["Deadline","DeadlineExceeded"]
+
+import time
+import threading
+
+_local = threading.local()
+
+class DeadlineExceeded(TimeoutError):
+    """ The time budget of a Deadline is spent.
+    """
+    pass
+
+class Deadline():
+    """ A time budget for a group of API calls.
+    """
+    def __init__(self,timeout):
+        """ Initialization.
+
+        :params:
+            - timeout : float
+                The budget in seconds, starting now.
+        """
+
+        self.timeout = timeout
+        self.expires = time.time()+timeout
+
+    def remaining(self):
+        """ The remaining budget in seconds (0.0 once spent).
+        """
+        return max(self.expires-time.time(),0.0)
+
+    def expired(self):
+        return time.time() >= self.expires
+
+    def check(self,what='request'):
+        """ Raise DeadlineExceeded if the budget is spent.
+        """
+        if self.expired():
+            raise DeadlineExceeded('deadline of %.3fs exceeded before %s'%(self.timeout,what))
+
+    def request_timeout(self,timeout=None):
+        """ The timeout of the next request: the remaining budget, or timeout
+        if that is shorter.
+        """
+        # requests does not accept a zero timeout
+        remaining = max(self.remaining(),0.001)
+        if timeout is None:
+            return remaining
+        if isinstance(timeout,tuple):
+            return tuple(remaining if t is None else min(t,remaining) for t in timeout)
+        return min(timeout,remaining)
+
+    @staticmethod
+    def current():
+        """ The innermost active deadline of this thread (or None).
+        """
+        stack = getattr(_local,'stack',None)
+        return stack[-1] if stack else None
+
+    def __enter__(self):
+        if not hasattr(_local,'stack'):
+            _local.stack = []
+        # a nested deadline cannot outlive the enclosing one
+        outer = Deadline.current()
+        if outer is not None and outer.expires < self.expires:
+            self.expires = outer.expires
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self,*args):
+        _local.stack.remove(self)
+
+    def wrap(self,fn):
+        """ fn, made to run under this deadline (in any thread).
+        """
+        def wrapped(*args,**kwargs):
+            with self:
+                return fn(*args,**kwargs)
+        return wrapped
+
+def carry_deadline(fn):
+    """ fn, made to run under the caller's current deadline (if any). Used to
+    hand work over to worker threads.
+    """
+    deadline = Deadline.current()
+    if deadline is None:
+        return fn
+    return deadline.wrap(fn)
@@ -0,0 +1,121 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Latency histogram (HDR style).
+Values are recorded in microseconds into log-linear buckets: powers of two,
+each split into 2**significant_bits linear sub-buckets, so the relative error
+of any reported percentile is below 2**-significant_bits whatever the range.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["Histogram"]
+
+import threading
+
+class Histogram():
+    """ Latency histogram (HDR style).
+    """
+    def __init__(self,significant_bits=7):
+        """ Initialization.
+
+        :params:
+            - significant_bits : int, optional (default: 7)
+                The linear sub-buckets per power of two (2**7=128, below 1%
+                relative error).
+        """
+
+        self.significant_bits = significant_bits
+        self.counts = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.lock = threading.Lock()
+
+    def _index(self,value):
+        v = max(int(value*1e6),0)
+        shift = max(v.bit_length()-self.significant_bits,0)
+        return (shift << self.significant_bits) | (v >> shift)
+
+    def _value(self,index):
+        """ The (middle) value of a bucket in seconds.
+        """
+        shift = index >> self.significant_bits
+        sub = index & ((1 << self.significant_bits)-1)
+        return ((sub << shift)+((1 << shift)-1)/2.0)/1e6
+
+    def record(self,value,
+               count=1):
+        """ Record a latency.
+
+        :params:
+            - value : float
+                the latency in seconds
+            - count : int, optional (default: 1)
+        """
+        index = self._index(value)
+        with self.lock:
+            self.counts[index] = self.counts.get(index,0)+count
+            self.count += count
+            self.total += value*count
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def merge(self,other):
+        """ Add the values of another histogram (same significant_bits).
+        """
+        with other.lock:
+            counts = dict(other.counts)
+            count,total,low,high = other.count,other.total,other.min,other.max
+        with self.lock:
+            for index,n in counts.items():
+                self.counts[index] = self.counts.get(index,0)+n
+            self.count += count
+            self.total += total
+            if low is not None and (self.min is None or low < self.min):
+                self.min = low
+            if high is not None and (self.max is None or high > self.max):
+                self.max = high
+
+    def percentile(self,p):
+        """ The p-th percentile (0-100) in seconds (None if empty).
+        """
+        with self.lock:
+            if self.count == 0:
+                return None
+            rank = max(p/100.0*self.count,1)
+            seen = 0
+            for index in sorted(self.counts):
+                seen += self.counts[index]
+                if seen >= rank:
+                    return min(max(self._value(index),self.min),self.max)
+            return self.max
+
+    def summary(self,percentiles=(50,90,99,99.9)):
+        """ The latency summary.
+
+        :returns:
+            - summary : dict
+                'count', 'mean', 'min', 'max' and 'p50', 'p90', ... in
+                seconds.
+        """
+        summary = {}
+        summary['count'] = self.count
+        summary['mean'] = self.total/self.count if self.count else None
+        summary['min'] = self.min
+        summary['max'] = self.max
+        for p in percentiles:
+            summary['p%s'%(('%g'%(p)).replace('.','_'))] = self.percentile(p)
+        return summary
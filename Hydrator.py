@@ -0,0 +1,245 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Concurrent hydration of search results.
+Fills in the product info and image urls of the results of
+VisualSearch.browse/search, NaturalLanguageSearch.natural_language_search,
+Catalog.text_search or CompleteTheLook, fetching every distinct product once
+(concurrently, through a cache) and within a deadline.
+
+    hydrator = Hydrator(catalog)
+    status,response = vs.browse(catalog_name,id,image_id)
+    missing = hydrator.hydrate(catalog_name,response,timeout=0.2)
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["Hydrator"]
+
+import copy
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from .Results import result_list
+from .Deadline import Deadline, DeadlineExceeded, carry_deadline
+
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+def _items(response):
+    """ The results of a response, in order: the result list (see
+    result_list), or the result lists nested in it (for example the
+    recommended items of every CompleteTheLook category). The fields of the
+    results (product_info, ...) are not searched.
+    """
+    if isinstance(response,dict):
+        key,results = result_list(response)
+        if key is not None:
+            for item in results:
+                yield item
+            return
+        values = response.values()
+    elif isinstance(response,list):
+        values = response
+    else:
+        return
+    for value in values:
+        for item in _items(value):
+            yield item
+
+class Hydrator():
+    """ Concurrent hydration of search results.
+    """
+    def __init__(self,catalog,
+                 max_workers=8,
+                 cache_size=4096,
+                 cache_ttl=None):
+        """ Initialization.
+
+        :params:
+            - catalog : Catalog
+                The catalog client (Catalog.get_product) used to fetch the
+                products.
+            - max_workers : int, optional (default: 8)
+                The number of concurrent requests.
+            - cache_size : int, optional (default: 4096)
+                The number of products cached. Set to 0 to disable
+                the cache.
+            - cache_ttl : float, optional (default: None)
+                If specified cached products expire after this many seconds.
+        """
+
+        self.catalog = catalog
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+
+        # (catalog_name,id) -> (timestamp,(status_code,response))
+        self.cache = OrderedDict()
+        self.cache_lock = threading.Lock()
+
+        self.stats = {}
+        self.stats['hits'] = 0
+        self.stats['misses'] = 0
+
+    #--------------------------------------------------------------------------
+    # Product cache.
+    #--------------------------------------------------------------------------
+    def _cache_get(self,key):
+        with self.cache_lock:
+            entry = self.cache.get(key)
+            if entry is not None and self.cache_ttl is not None and time.time()-entry[0] > self.cache_ttl:
+                del self.cache[key]
+                entry = None
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self.stats['hits'] += 1
+            self.cache.move_to_end(key)
+            return entry[1]
+
+    def _cache_put(self,key,result):
+        if self.cache_size <= 0:
+            return
+        with self.cache_lock:
+            self.cache[key] = (time.time(),result)
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def clear_cache(self):
+        """ Clear the product cache.
+        """
+        with self.cache_lock:
+            self.cache.clear()
+
+    def _fetch(self,key):
+        """ Catalog.get_product of a (catalog_name,id), None if it could not
+        be fetched.
+        """
+        catalog_name,id = key
+        try:
+            result = self.catalog.get_product(catalog_name=catalog_name,
+                                              id=id)
+        except DeadlineExceeded:
+            return None
+        except Exception as e:
+            return ('error','%s: %s'%(type(e).__name__,e))
+
+        if result[0] == 202:
+            self._cache_put(key,result)
+        return result
+
+    def _image(self,catalog_name,product,image_id):
+        """ The image_url and image_url_local of an image of a product (as
+        Catalog.image_url), None if the product has no such image.
+        """
+        images = product.get('images') or {}
+        if image_id is None and images:
+            image_id = list(images.keys())[0]
+        image = images.get(image_id)
+        if image is None:
+            return None
+
+        image_location = '%s/catalog/%s/images/%s'%(self.catalog.version,
+                                                    self.catalog.transport.resolve_catalog(catalog_name),
+                                                    image['image_filename'])
+        image_url_local = '%s?api_key=%s'%(urljoin(self.catalog.api_gateway_url,image_location),
+                                           self.catalog.api_key)
+        return image['image_url'],image_url_local
+
+    #--------------------------------------------------------------------------
+    # Hydrate.
+    #--------------------------------------------------------------------------
+    def hydrate(self,catalog_name,response,
+                timeout=None,
+                max_workers=None):
+        """ Fill in every result (see result_list, the items of nested
+        result lists too) with item['product_info'], item['image_url'] and
+        item['image_url_local'], in place. The image is item['image_id'] if
+        the result has one, else the first image of the product. Results
+        tagged with item['catalog_name'] (ShardedCatalog) are fetched from
+        that catalog.
+
+        :params:
+            - catalog_name : str
+                the catalog the result ids belong to
+            - response : json
+                the response of any search API
+            - timeout : float, optional (default: None)
+                If specified the results that could not be filled in within
+                this many seconds are returned as they are. The current
+                Deadline (if any) always applies.
+            - max_workers : int, optional (default: None)
+                Defaults to the max_workers the hydrator was created with.
+
+        :returns:
+            - missing : list of str
+                the ids of the results that could not be filled in (errors or
+                deadline), products without images are not missing
+        """
+        # (catalog_name,id) -> results, every product is fetched once
+        items = OrderedDict()
+        for item in _items(response):
+            key = (item.get('catalog_name') or catalog_name,item['id'])
+            items.setdefault(key,[]).append(item)
+
+        results = {}
+        keys = []
+        for key in items:
+            result = self._cache_get(key)
+            if result is not None:
+                results[key] = result
+            else:
+                keys.append(key)
+
+        if keys:
+            if timeout is not None:
+                with Deadline(timeout) as deadline:
+                    fetch = carry_deadline(self._fetch)
+            else:
+                deadline = Deadline.current()
+                fetch = carry_deadline(self._fetch)
+
+            # the workers are not waited for once the deadline has passed
+            executor = ThreadPoolExecutor(max_workers=min(max_workers or self.max_workers,len(keys)))
+            try:
+                futures = dict((executor.submit(fetch,key),key) for key in keys)
+                done,not_done = wait(futures,timeout=deadline.remaining() if deadline is not None else None)
+                for future in not_done:
+                    future.cancel()
+                for future in done:
+                    if future.result() is not None:
+                        results[futures[future]] = future.result()
+            finally:
+                executor.shutdown(wait=False)
+
+        missing = []
+        for key,key_items in items.items():
+            status,result = results.get(key,('deadline',None))
+            if status != 202:
+                if key[1] not in missing:
+                    missing.append(key[1])
+                continue
+            for item in key_items:
+                image = self._image(key[0],result['data'],item.get('image_id'))
+                if image is None:
+                    # product without (this) image
+                    continue
+                item['product_info'] = copy.deepcopy(result['data'])
+                item['image_url'],item['image_url_local'] = image
+
+        return missing
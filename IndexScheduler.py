@@ -0,0 +1,317 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Debounced visual search index rebuilds.
+The product writes (add_product, update_product, delete_product) sent
+through a transport are watched, and a burst of changes to a catalog is
+turned into a single VisualSearch.index_build (optionally preceded by
+categories_predict) once the catalog has been quiet for a while or enough
+changes have piled up. A build is never started while index_status shows
+one running, the changes made meanwhile are built next.
+
+    transport = Transport()
+    catalog = Catalog(api_gateway_url,api_key,transport=transport)
+    vs = VisualSearch(api_gateway_url,api_key,transport=transport)
+
+    scheduler = IndexScheduler(vs,quiet_period=300,max_changes=500)
+    scheduler.start()
+    catalog.update_product(...)  # builds 5 minutes after the last change
+    scheduler.stop()
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["IndexScheduler"]
+
+import re
+import time
+import logging
+import threading
+
+from .VisualSearch import INDEX_RUNNING_STATES
+
+try:
+    from urllib.parse import urlparse, unquote
+except ImportError:
+    from urlparse import urlparse
+    from urllib import unquote
+
+logger = logging.getLogger(__name__)
+
+_PRODUCT_PATH = re.compile(r'/catalog/([^/]+)/products/[^/]+/?$')
+
+def _running(status,response):
+    """ True if a status response shows a build (or prediction) in progress.
+    """
+    if status >= 300 or not isinstance(response,dict):
+        return False
+    return response.get('status') in INDEX_RUNNING_STATES
+
+class IndexScheduler():
+    """ Debounced visual search index rebuilds.
+    """
+    def __init__(self,visual_search,
+                 transport=None,
+                 quiet_period=300.0,
+                 max_changes=None,
+                 max_delay=None,
+                 poll_interval=30.0,
+                 categories=False,
+                 categories_params=None,
+                 catalog_names=None,
+                 **build_params):
+        """ Initialization.
+
+        :params:
+            - visual_search : VisualSearch
+                The client the builds are started with.
+            - transport : Transport, optional (default: None)
+                The transport the product writes are sent through. Defaults
+                to the transport of visual_search (share it with the Catalog
+                client).
+            - quiet_period : float, optional (default: 300.0)
+                Build once a catalog had no change for this many seconds.
+            - max_changes : int, optional (default: None)
+                If specified build as soon as this many changes are pending.
+            - max_delay : float, optional (default: None)
+                If specified build at most this many seconds after the first
+                pending change, even if the changes keep coming.
+            - poll_interval : float, optional (default: 30.0)
+                Seconds between index_status checks while a build is
+                running, and the minimum time between two builds.
+            - categories : boolean, optional (default: False)
+                If True categories_predict is run (and waited for) before
+                every build.
+            - categories_params : dict, optional (default: None)
+                passed to VisualSearch.categories_predict.
+            - catalog_names : list of str, optional (default: None)
+                If specified only these catalogs are watched.
+            - build_params
+                per_category_index, full_index, ... passed to
+                VisualSearch.index_build.
+        """
+
+        self.visual_search = visual_search
+        self.transport = transport if transport is not None else visual_search.transport
+        self.quiet_period = quiet_period
+        self.max_changes = max_changes
+        self.max_delay = max_delay
+        self.poll_interval = poll_interval
+        self.categories = categories
+        self.categories_params = categories_params or {}
+        self.catalog_names = set(catalog_names) if catalog_names is not None else None
+        self.build_params = build_params
+
+        # catalog_name -> {'changes','first','last','retry'}
+        self.changes = {}
+        # catalog_name -> time the last build was started
+        self.last_build = {}
+
+        self.stats = {}
+        self.stats['changes'] = 0
+        self.stats['builds'] = 0
+        self.stats['deferred'] = 0
+        self.stats['errors'] = 0
+        self.last_error = None
+
+        self.condition = threading.Condition()
+        self.thread = None
+        self.stopped = False
+
+    #--------------------------------------------------------------------------
+    # Watch the product writes.
+    #--------------------------------------------------------------------------
+    def _listener(self,event):
+        if event['method'].upper() not in ('POST','PUT','DELETE'):
+            return
+        if event['response'] is None or event['response'].status_code >= 300:
+            return
+        match = _PRODUCT_PATH.search(urlparse(event['url']).path)
+        if match is not None:
+            self.notify(unquote(match.group(1)))
+
+    def notify(self,catalog_name,
+               count=1):
+        """ Record changes to a catalog (the watched writes call this, call
+        it for changes made by other means).
+        """
+        if self.catalog_names is not None and catalog_name not in self.catalog_names:
+            return
+        now = time.time()
+        with self.condition:
+            pending = self.changes.setdefault(catalog_name,{'changes':0,'first':now,'retry':None})
+            pending['changes'] += count
+            pending['last'] = now
+            self.stats['changes'] += count
+            self.condition.notify_all()
+
+    def pending(self):
+        """ The pending changes.
+
+        :returns:
+            - pending : dict
+                catalog_name -> {'changes','first','last'} (time.time())
+        """
+        with self.condition:
+            return dict((name,{'changes':p['changes'],'first':p['first'],'last':p['last']})
+                        for name,p in self.changes.items())
+
+    #--------------------------------------------------------------------------
+    # Schedule.
+    #--------------------------------------------------------------------------
+    def _due(self,name,pending):
+        """ The time the build of a catalog is due.
+        """
+        due = pending['last']+self.quiet_period
+        if self.max_changes is not None and pending['changes'] >= self.max_changes:
+            due = pending['last']
+        if self.max_delay is not None:
+            due = min(due,pending['first']+self.max_delay)
+        if name in self.last_build:
+            due = max(due,self.last_build[name]+self.poll_interval)
+        if pending['retry'] is not None:
+            due = max(due,pending['retry'])
+        return due
+
+    def _wait_categories(self,name):
+        while not self.stopped:
+            status,response = self.visual_search.categories_status(catalog_name=name)
+            if not _running(status,response):
+                return
+            time.sleep(self.poll_interval)
+
+    def build(self,catalog_name):
+        """ Build the index of a catalog now, unless a build is running.
+
+        :returns:
+            - started : boolean
+                False if a build is running (the changes stay pending and
+                the build is retried after poll_interval).
+
+        Raises the error of the failed call, index_status included (the
+        changes stay pending and the build is retried after poll_interval,
+        see stats['errors'] and last_error). The scheduler thread logs it.
+        """
+        now = time.time()
+        try:
+            status,response = self.visual_search.index_status(catalog_name=catalog_name)
+        except Exception as e:
+            self._failed(catalog_name,None,e)
+            raise
+        if _running(status,response):
+            with self.condition:
+                pending = self.changes.setdefault(catalog_name,{'changes':0,'first':now,'last':now,'retry':None})
+                pending['retry'] = now+self.poll_interval
+                self.stats['deferred'] += 1
+            return False
+
+        with self.condition:
+            pending = self.changes.pop(catalog_name,None)
+            self.last_build[catalog_name] = now
+
+        try:
+            if self.categories:
+                status,response = self.visual_search.categories_predict(catalog_name=catalog_name,
+                                                                        **self.categories_params)
+                if status >= 300:
+                    raise RuntimeError('categories_predict failed for %s: %d %s'%(catalog_name,
+                                                                                 status,response))
+                self._wait_categories(catalog_name)
+
+            status,response = self.visual_search.index_build(catalog_name=catalog_name,
+                                                             **self.build_params)
+            if status >= 300:
+                raise RuntimeError('index_build failed for %s: %d %s'%(catalog_name,
+                                                                       status,response))
+        except Exception as e:
+            self._failed(catalog_name,pending,e)
+            raise
+
+        with self.condition:
+            self.stats['builds'] += 1
+        return True
+
+    def _failed(self,catalog_name,pending,error):
+        """ Count the error and retry the build after poll_interval, with the
+        changes taken for it (pending) put back.
+        """
+        now = time.time()
+        with self.condition:
+            self.stats['errors'] += 1
+            self.last_error = error
+            current = self.changes.get(catalog_name)
+            if current is None:
+                current = pending or {'changes':0,'first':now,'last':now}
+                self.changes[catalog_name] = current
+            elif pending is not None:
+                # merged with the changes made meanwhile
+                current['changes'] += pending['changes']
+                current['first'] = min(current['first'],pending['first'])
+            current['retry'] = now+self.poll_interval
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while not self.stopped:
+                    now = time.time()
+                    due = [(self._due(name,pending),name) for name,pending in self.changes.items()]
+                    ready = [name for at,name in due if at <= now]
+                    if ready:
+                        break
+                    self.condition.wait(min(at for at,name in due)-now if due else None)
+                if self.stopped:
+                    return
+
+            for name in ready:
+                try:
+                    self.build(name)
+                except Exception:
+                    logger.exception('index build of %s failed, retrying in %gs',
+                                     name,self.poll_interval)
+
+    def start(self):
+        """ Watch the transport and start the scheduler thread.
+        """
+        self.stopped = False
+        self.transport.add_listener(self._listener)
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self,
+             flush=False):
+        """ Stop watching and stop the scheduler thread.
+
+        :params:
+            - flush : boolean, optional (default: False)
+                If True the catalogs with pending changes are built now
+                (unless a build is running).
+
+        :returns:
+            - pending : dict
+                the changes not built, see pending()
+        """
+        self.transport.remove_listener(self._listener)
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        if flush:
+            for name in list(self.pending()):
+                try:
+                    self.build(name)
+                except Exception:
+                    logger.exception('index build of %s failed',name)
+        return self.pending()
@@ -0,0 +1,212 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Latency-aware load balancing across several api gateway urls.
+Requests go to the gateway with the lowest EWMA latency (penalized by its
+EWMA error rate). Gateways that keep failing are taken out of rotation until
+a background health probe (GET /v1/fashion_quote) succeeds again.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["LoadBalancer"]
+
+import time
+import threading
+import requests
+
+try:
+    from urllib.parse import urljoin
+except ImportError:
+    from urlparse import urljoin
+
+def gateway_url(url):
+    """ The api gateway url with a trailing slash, as the load balancer keeps
+    it (urljoin keeps its last path segment and owns() matches it).
+    """
+    return url if url.endswith('/') else url+'/'
+
+class LoadBalancer():
+    """ Latency-aware load balancing across several api gateway urls.
+    """
+    def __init__(self,gateways,
+                 probe_path='v1/fashion_quote',
+                 probe_headers=None,
+                 probe_interval=10.0,
+                 probe_timeout=2.0,
+                 alpha=0.3,
+                 error_penalty=10.0,
+                 max_failures=3):
+        """ Initialization.
+
+        :params:
+            - gateways : list of str
+                the api gateway urls
+            - probe_path : str, optional (default: 'v1/fashion_quote')
+                The health probe endpoint.
+            - probe_headers : dict, optional (default: None)
+                The health probe headers (X-Api-Key).
+            - probe_interval : float, optional (default: 10.0)
+                Seconds between health probes. Set to None to disable the
+                background probes.
+            - probe_timeout : float, optional (default: 2.0)
+                The health probe timeout (seconds).
+            - alpha : float, optional (default: 0.3)
+                The EWMA smoothing factor.
+            - error_penalty : float, optional (default: 10.0)
+                The latency of a gateway is multiplied by
+                (1+error_penalty*error_rate).
+            - max_failures : int, optional (default: 3)
+                A gateway is taken out of rotation after this many
+                consecutive failures.
+        """
+
+        self.probe_path = probe_path
+        self.probe_headers = probe_headers or {}
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.alpha = alpha
+        self.error_penalty = error_penalty
+        self.max_failures = max_failures
+
+        self.gateways = []
+        # gateway -> {'latency','error_rate','failures','down','requests'}
+        self.state = {}
+        self.lock = threading.Lock()
+        self.add(gateways)
+
+        self.session = requests.Session()
+        self.closed = threading.Event()
+        self.thread = None
+        if probe_interval is not None:
+            self.thread = threading.Thread(target=self._prober)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def add(self,gateways):
+        """ Add gateways to the pool.
+        """
+        with self.lock:
+            for gateway in map(gateway_url,gateways):
+                if gateway not in self.state:
+                    self.gateways.append(gateway)
+                    self.state[gateway] = {'latency':None,
+                                           'error_rate':0.0,
+                                           'failures':0,
+                                           'down':False,
+                                           'requests':0}
+
+    def close(self):
+        """ Stop the health probes.
+        """
+        self.closed.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.session.close()
+
+    #--------------------------------------------------------------------------
+    # Routing.
+    #--------------------------------------------------------------------------
+    def _cost(self,state):
+        # gateways never measured are tried first
+        latency = state['latency'] if state['latency'] is not None else 0.0
+        return latency*(1.0+self.error_penalty*state['error_rate'])
+
+    def choose(self,exclude=()):
+        """ The gateway for the next request.
+
+        :params:
+            - exclude : iterable of str
+                gateways not to use (already tried)
+        """
+        with self.lock:
+            candidates = [g for g in self.gateways if g not in exclude]
+            up = [g for g in candidates if not self.state[g]['down']]
+            # if everything is down try anyway
+            candidates = up or candidates or self.gateways
+            return min(candidates,key=lambda g:self._cost(self.state[g]))
+
+    def owns(self,url):
+        """ True if url was built for a gateway of the pool (other urls, e.g.
+        image downloads, are not balanced).
+        """
+        return any(url.startswith(prefix) for prefix in self.gateways)
+
+    def rewrite(self,url,gateway):
+        """ Send a url built for any gateway of the pool to gateway.
+        """
+        for prefix in self.gateways:
+            if url.startswith(prefix):
+                return gateway+url[len(prefix):]
+        return url
+
+    def report(self,gateway,elapsed,ok):
+        """ Record the outcome of a request.
+
+        :params:
+            - gateway : str
+            - elapsed : float
+                the latency (seconds)
+            - ok : boolean
+                False for connection errors and 5xx responses
+        """
+        with self.lock:
+            state = self.state.get(gateway)
+            if state is None:
+                return
+            state['requests'] += 1
+            if ok:
+                if state['latency'] is None:
+                    state['latency'] = elapsed
+                else:
+                    state['latency'] += self.alpha*(elapsed-state['latency'])
+                state['failures'] = 0
+                state['down'] = False
+            else:
+                state['failures'] += 1
+                if state['failures'] >= self.max_failures:
+                    state['down'] = True
+            state['error_rate'] += self.alpha*((0.0 if ok else 1.0)-state['error_rate'])
+
+    #--------------------------------------------------------------------------
+    # Health probes.
+    #--------------------------------------------------------------------------
+    def probe(self):
+        """ Probe all the gateways once. A failed probe counts as a failed
+        request (a gateway is taken out of rotation after max_failures), a
+        successful one puts the gateway back in rotation.
+        """
+        for gateway in list(self.gateways):
+            start = time.time()
+            try:
+                response = self.session.get(urljoin(gateway,self.probe_path),
+                                            headers=self.probe_headers,
+                                            timeout=self.probe_timeout)
+                ok = response.status_code < 500
+            except requests.exceptions.RequestException:
+                ok = False
+            self.report(gateway,time.time()-start,ok)
+
+    def _prober(self):
+        while not self.closed.wait(self.probe_interval):
+            self.probe()
+
+    def stats(self):
+        """ The state of every gateway.
+
+        :returns:
+            - stats : dict
+                gateway -> {'latency','error_rate','failures','down','requests'}
+        """
+        with self.lock:
+            return dict((g,dict(s)) for g,s in self.state.items())
@@ -0,0 +1,288 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Load generator.
+Sends a weighted mix of API requests (the Batch request format, e.g. search
+with sample images, browse, natural_language_search) to an api gateway and
+reports the sustained throughput, the latency percentiles and the errors.
+
+Closed loop: a number of concurrent users, each sending the next request as
+soon as the previous one completes. Open loop: requests arrive at a fixed
+rate whatever the response times, the latency is measured from the scheduled
+arrival time so that queueing shows up in the percentiles.
+
+    mix = [{'op':'browse','catalog_name':'sample_catalog','id':'SKLTS16AMCWSH8SH20','image_id':'1','weight':5},
+           {'op':'search','catalog_name':'sample_catalog','image_filename':'test_image.jpeg','weight':1},
+           {'op':'natural_language_search','catalog_name':'sample_catalog','query_text':'red tees','weight':4}]
+    generator = LoadGenerator(api_gateway_url,api_key,mix)
+    report = generator.run(mode='open',rate=50,duration=60,ramp_up=10)
+
+    python -m cfapisdk load mix.json http://localhost:9080/ your_api_key --mode open --rate 50
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["LoadGenerator"]
+
+import sys
+import json
+import math
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .Batch import Batch
+from .Histogram import Histogram
+
+class LoadGenerator():
+    """ Load generator.
+    """
+    def __init__(self,api_gateway_url,api_key,mix,
+                 version='v1',
+                 max_workers=64,
+                 seed=None,
+                 transport=None):
+        """ Initialization.
+
+        :params:
+            - api_gateway_url : str or list of str
+                The api gateway url (a real one or a local stand-in).
+            - api_key : str
+                The api key.
+            - mix : list of dict
+                The requests, in the Batch format ({'op':..., arguments...}),
+                each with an optional 'weight' (default 1), the relative
+                frequency it is sent with.
+            - version : str, optional (default: 'v1')
+                The api version.
+            - max_workers : int, optional (default: 64)
+                The maximum number of requests in flight (and connections).
+            - seed : int, optional (default: None)
+                The seed of the request mix (and poisson arrivals).
+            - transport : Transport, optional (default: None)
+        """
+
+        self.mix = [dict((k,v) for k,v in request.items() if k != 'weight') for request in mix]
+        self.weights = [request.get('weight',1) for request in mix]
+        self.max_workers = max_workers
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+
+        self.batch = Batch(api_gateway_url,api_key,
+                           version=version,
+                           concurrency=max_workers,
+                           transport=transport)
+
+    def _next_request(self):
+        with self.random_lock:
+            return self.random.choices(self.mix,weights=self.weights)[0]
+
+    @staticmethod
+    def _target(stages,t):
+        """ The target rate (open loop) or concurrency (closed loop) at time
+        t, ramped linearly within every stage. None after the last stage.
+        """
+        previous = 0.0
+        start = 0.0
+        for duration,target in stages:
+            if t < start+duration:
+                if duration <= 0:
+                    return target
+                return previous+(target-previous)*(t-start)/duration
+            previous = target
+            start += duration
+        return None
+
+    @staticmethod
+    def _advance(stages,t,work):
+        """ The time after t at which the target rate (ramped linearly within
+        every stage) integrated from t reaches work, i.e. when work more
+        arrivals are due. None after the last stage.
+        """
+        previous = 0.0
+        start = 0.0
+        for duration,target in stages:
+            end = start+duration
+            if t < end and duration > 0:
+                slope = (target-previous)/duration
+                rate = previous+slope*(t-start)
+                area = (rate+target)/2.0*(end-t)
+                if area >= work:
+                    # rate*x + slope*x^2/2 = work
+                    if abs(slope) < 1e-12:
+                        return t+work/rate
+                    return t+(math.sqrt(max(rate*rate+2.0*slope*work,0.0))-rate)/slope
+                work -= area
+                t = end
+            previous = target
+            start = end
+        return None
+
+    def run(self,
+            mode='closed',
+            concurrency=8,
+            rate=None,
+            duration=60.0,
+            ramp_up=0.0,
+            stages=None,
+            poisson=False):
+        """ Generate the load.
+
+        :params:
+            - mode : str, optional (default: 'closed')
+                'closed' (concurrent users) or 'open' (arrival rate).
+            - concurrency : int, optional (default: 8)
+                The number of concurrent users (closed loop).
+            - rate : float, optional (default: None)
+                The arrival rate in requests per second (open loop).
+            - duration : float, optional (default: 60.0)
+                Seconds at full load (after the ramp up).
+            - ramp_up : float, optional (default: 0.0)
+                Seconds to ramp up linearly from 0 to the full load.
+            - stages : list of (float,float), optional (default: None)
+                A custom schedule of (seconds,target) stages, the target
+                (rate or concurrency) is ramped linearly from the previous
+                one within every stage. Overrides concurrency, rate,
+                duration and ramp_up.
+            - poisson : boolean, optional (default: False)
+                Open loop: poisson arrivals instead of evenly spaced ones.
+
+        :returns:
+            - report : dict
+                report['mode']
+                report['requests'] - the number of requests completed
+                report['duration'] - seconds
+                report['throughput'] - completed requests per second
+                report['status'] - status code (or exception) -> count
+                report['errors'] - the number of errors (status >= 400 or
+                    exceptions)
+                report['latency'] - see Histogram.summary
+                report['endpoints'] - op -> latency summary
+                report['max_lag'] - open loop: the worst delay (seconds)
+                    between the scheduled and the actual send time
+        """
+        if mode not in ('closed','open'):
+            raise ValueError("mode must be 'closed' or 'open'.")
+        if stages is None:
+            if mode == 'open' and rate is None:
+                raise ValueError('the open loop mode needs a rate.')
+            level = rate if mode == 'open' else concurrency
+            stages = ([(ramp_up,level)] if ramp_up else [])+[(duration,level)]
+
+        histogram = Histogram()
+        histograms = dict((request.get('op'),Histogram()) for request in self.mix)
+        status_counts = {}
+        lock = threading.Lock()
+
+        report = {}
+        report['mode'] = mode
+        report['requests'] = 0
+        report['errors'] = 0
+        report['max_lag'] = 0.0
+
+        def call(request,scheduled=None):
+            begin = time.time()
+            result = self.batch.execute(request)
+            elapsed = time.time()-(scheduled if scheduled is not None else begin)
+
+            if 'error' in result:
+                status = result['error'].split(':')[0]
+            else:
+                status = str(result['status'])
+            with lock:
+                report['requests'] += 1
+                status_counts[status] = status_counts.get(status,0)+1
+                if 'error' in result or result['status'] >= 400:
+                    report['errors'] += 1
+            histogram.record(elapsed)
+            histograms[request.get('op')].record(elapsed)
+
+        start = time.time()
+        if mode == 'closed':
+            users = int(max(target for _,target in stages)+0.999)
+
+            def user(index):
+                while True:
+                    target = self._target(stages,time.time()-start)
+                    if target is None:
+                        return
+                    if index >= target:
+                        time.sleep(0.01)
+                        continue
+                    call(self._next_request())
+
+            with ThreadPoolExecutor(max_workers=max(users,1)) as executor:
+                for index in range(users):
+                    executor.submit(user,index)
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                # the arrivals are spaced by integrating the rate, so that a
+                # ramp from 0 gets its share of the requests
+                offset = self._advance(stages,0.0,1.0)
+                while offset is not None:
+                    scheduled = start+offset
+                    delay = scheduled-time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+                    else:
+                        report['max_lag'] = max(report['max_lag'],-delay)
+                    executor.submit(call,self._next_request(),scheduled)
+                    if poisson:
+                        with self.random_lock:
+                            work = self.random.expovariate(1.0)
+                    else:
+                        work = 1.0
+                    offset = self._advance(stages,offset,work)
+
+        report['duration'] = time.time()-start
+        report['throughput'] = report['requests']/report['duration'] if report['duration'] else 0.0
+        report['status'] = status_counts
+        report['latency'] = histogram.summary()
+        report['endpoints'] = dict((op,h.summary()) for op,h in histograms.items())
+
+        return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='cfapisdk load',
+                                     description='Generate load with a mix of cfapisdk requests.')
+    parser.add_argument('mix',help='json file: a list of requests in the batch format, each '
+                                   'with an optional "weight"')
+    parser.add_argument('api_gateway_url',help='the api gateway url')
+    parser.add_argument('api_key',help='the api key')
+    parser.add_argument('--mode',choices=('closed','open'),default='closed',
+                        help='closed loop (concurrent users) or open loop (arrival rate)')
+    parser.add_argument('--concurrency',type=int,default=8,help='concurrent users (closed loop)')
+    parser.add_argument('--rate',type=float,default=None,help='requests per second (open loop)')
+    parser.add_argument('--duration',type=float,default=60.0,help='seconds at full load')
+    parser.add_argument('--ramp-up',type=float,default=0.0,help='seconds to ramp up to full load')
+    parser.add_argument('--poisson',action='store_true',help='poisson arrivals (open loop)')
+    parser.add_argument('--max-workers',type=int,default=64,help='maximum requests in flight')
+    args = parser.parse_args(argv)
+
+    if args.mode == 'open' and args.rate is None:
+        parser.error('--rate is required with --mode open')
+
+    with open(args.mix) as f:
+        mix = json.load(f)
+
+    generator = LoadGenerator(args.api_gateway_url,args.api_key,mix,
+                              max_workers=max(args.max_workers,args.concurrency))
+    report = generator.run(mode=args.mode,
+                           concurrency=args.concurrency,
+                           rate=args.rate,
+                           duration=args.duration,
+                           ramp_up=args.ramp_up,
+                           poisson=args.poisson)
+    json.dump(report,sys.stdout,indent=2,sort_keys=True,default=str)
+    sys.stdout.write('\n')
@@ -10,7 +10,8 @@ __all__ = ["NaturalLanguageSearch"]
 
 import os
 import json
-import requests
+from .Transport import Transport
+from .LoadBalancer import gateway_url
 
 try:
     from urllib.parse import urljoin
@@ -24,29 +25,50 @@ class NaturalLanguageSearch():
                  api_gateway_url,
                  api_key,
                  version='v1',
-                 data_collection_opt_out=False):
+                 data_collection_opt_out=False,
+                 transport=None):
         """ Initialization.
 
         Parameters
         ----------
-        api_gateway_url : str
-            The api gateway url.
+        api_gateway_url : str or list of str
+            The api gateway url. If a list is given the requests are
+            balanced across the gateways (see Transport.balance).
         api_key : str    
             The api key.    
         version : str, optional (default: 'v1')
             The api version.    
         data_collection_opt_out : boolean, optional (default: False)
             https://cognitivefashion.github.io/slate/#data-collection
+        transport : Transport, optional (default: None)
+            The request path (connection pool, rate limits). Pass the
+            same transport to several clients to share it.
         """
 
         self.api_gateway_url = api_gateway_url
         self.version = version
+        self.transport = transport if transport is not None else Transport()
         self.api_key = api_key
 
         self.headers = {}
         self.headers['X-Api-Key'] = self.api_key
         self.headers['X-Data-Collection-Opt-Out'] = str(data_collection_opt_out).lower()
 
+        if isinstance(api_gateway_url,(list,tuple)):
+            self.api_gateway_url = gateway_url(api_gateway_url[0])
+            self.transport.balance(api_gateway_url,
+                                   probe_path='%s/fashion_quote'%(self.version),
+                                   probe_headers=self.headers)
+
+    #--------------------------------------------------------------------------
+    # Close.
+    #--------------------------------------------------------------------------
+    def close(self):
+        """ Close the transport (shared with the other clients using it):
+        stops the load balancer health probes and closes the connections.
+        """
+        self.transport.close()
+
     #--------------------------------------------------------------------------
     # Get a random fashion quote.  
     # GET /v1/fashion_quote
@@ -69,9 +91,9 @@ class NaturalLanguageSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)        
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)        
 
         return response.status_code,response.json()
 
@@ -126,9 +148,9 @@ class NaturalLanguageSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()  
 
@@ -175,9 +197,9 @@ class NaturalLanguageSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()  
 
@@ -222,9 +244,9 @@ class NaturalLanguageSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()         
 
@@ -260,8 +282,8 @@ class NaturalLanguageSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()         
@@ -0,0 +1,424 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Near-duplicate product images, found before the visual index is built.
+The product images are read from a local folder or downloaded concurrently,
+reduced to a 64 bit perceptual hash (difference hash, needs PIL) and put in a
+multi-index hash table. Images within a few bits of each other are clustered, in every
+cluster the image of the first product is kept and the others can be marked
+with 'ignore':'yes' (update_product) so that VisualSearch.index_build skips
+them and browse results are not filled with clones.
+
+    duplicates = NearDuplicates(catalog,catalog_name,filename='hashes.json.gz')
+    failures = duplicates.hash_products(mirror)
+    clusters = duplicates.clusters()
+    duplicates.mark(mirror,clusters)
+    vs.index_build(catalog_name=catalog_name)
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["NearDuplicates"]
+
+import io
+import os
+import gzip
+import json
+import threading
+from itertools import combinations
+from concurrent.futures import ThreadPoolExecutor
+
+from .Backends import RequestsBackend
+from .NeighborTable import NeighborTable
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+def hamming(a,b):
+    return bin(a^b).count('1')
+
+class _MultiIndex():
+    """ Multi-index hashing: the hashes are split in 16 bit segments, two
+    hashes within radius bits agree within radius//segments bits on at least
+    one segment, so the candidates are found with a few exact lookups per
+    segment.
+    """
+    def __init__(self,bits,radius):
+        self.radius = radius
+        count = max(1,bits//16)
+        # (shift,width) of every segment
+        self.segments = []
+        start = 0
+        for i in range(count):
+            width = bits//count+(1 if i < bits%count else 0)
+            self.segments.append((start,width))
+            start += width
+        self.tables = [{} for _ in self.segments]
+        self.hashes = {}
+
+        # the segment values within radius//count bits of 0
+        self.flips = {}
+        for shift,width in self.segments:
+            if width not in self.flips:
+                flips = []
+                for d in range(min(radius//count,width)+1):
+                    for bits in combinations(range(width),d):
+                        flips.append(sum(1 << bit for bit in bits))
+                self.flips[width] = flips
+
+    def add(self,hash,key):
+        self.hashes[key] = hash
+        for table,(shift,width) in zip(self.tables,self.segments):
+            table.setdefault((hash >> shift) & ((1 << width)-1),[]).append(key)
+
+    def search(self,hash):
+        """ The keys of the hashes within radius bits of hash.
+        """
+        candidates = set()
+        for table,(shift,width) in zip(self.tables,self.segments):
+            value = (hash >> shift) & ((1 << width)-1)
+            for flip in self.flips[width]:
+                candidates.update(table.get(value^flip,()))
+        return [key for key in candidates if hamming(hash,self.hashes[key]) <= self.radius]
+
+class NearDuplicates():
+    """ Near-duplicate product images.
+    """
+    def __init__(self,catalog,catalog_name,
+                 threshold=6,
+                 hash_size=8,
+                 max_workers=16,
+                 filename=None,
+                 backend=None):
+        """ Initialization. Loads the hashes if the file exists.
+
+        :params:
+            - catalog : Catalog
+                The catalog client (image downloads and update_product).
+            - catalog_name : str
+                the catalog name
+            - threshold : int, optional (default: 6)
+                Images whose hashes differ in at most this many bits are
+                near-duplicates (out of hash_size*hash_size bits).
+            - hash_size : int, optional (default: 8)
+                The hash is computed on a hash_size x hash_size grid.
+            - max_workers : int, optional (default: 16)
+                The number of images read and hashed concurrently.
+            - filename : str, optional (default: None)
+                The hashes are saved here, images whose url did not change
+                are not hashed again.
+            - backend : optional (default: None)
+                The HTTP backend the image urls are downloaded with (see
+                Backends). The image hosts are not the api gateway, so the
+                downloads are sent directly, not through the Transport. The
+                gateway copies of the images still go through it. Defaults to
+                the backend of the catalog transport or a RequestsBackend.
+        """
+
+        self.catalog = catalog
+        self.catalog_name = catalog_name
+        self.threshold = threshold
+        self.hash_size = hash_size
+        self.max_workers = max_workers
+        self.filename = filename
+        if backend is None:
+            transport = getattr(catalog,'transport',None)
+            backend = (transport.backend if transport is not None
+                       else RequestsBackend(pool_maxsize=max_workers))
+        self.backend = backend
+
+        # (id,image_id) -> (image_url,hash)
+        self.hashes = {}
+        self.lock = threading.Lock()
+
+        if filename is not None and os.path.exists(filename):
+            self.load()
+
+    #--------------------------------------------------------------------------
+    # Hash the images.
+    #--------------------------------------------------------------------------
+    def hash_image(self,content):
+        """ The difference hash of an image: the grayscale image is resized to
+        (hash_size+1) x hash_size and every bit tells whether a pixel is
+        brighter than its right neighbor.
+
+        :params:
+            - content : bytes
+                the encoded image (jpeg, png, ...)
+
+        :returns:
+            - hash : int
+        """
+        if Image is None:
+            raise ImportError('NearDuplicates needs PIL (pip install Pillow).')
+
+        image = Image.open(io.BytesIO(content))
+        image.draft('L',(4*self.hash_size,4*self.hash_size))
+        image = image.convert('L').resize((self.hash_size+1,self.hash_size),Image.BILINEAR)
+        pixels = list(image.getdata())
+
+        hash = 0
+        width = self.hash_size+1
+        for row in range(self.hash_size):
+            for col in range(self.hash_size):
+                hash = (hash << 1) | (pixels[row*width+col] > pixels[row*width+col+1])
+        return hash
+
+    def _read(self,id,image_id,image,image_folder):
+        """ The image bytes, from image_folder, the image url or the gateway
+        copy of the image.
+        """
+        image_filename = image.get('image_filename')
+        if image_folder is not None and image_filename is not None:
+            path = os.path.join(image_folder,image_filename)
+            if os.path.exists(path):
+                with open(path,'rb') as f:
+                    return f.read()
+
+        image_url = image.get('image_url')
+        if image_url is not None and image_url.startswith(('http://','https://')):
+            response = self.backend.request('GET',image_url)
+            if response.status_code < 300:
+                return response.content
+
+        status,response = self.catalog.image_url(catalog_name=self.catalog_name,
+                                                 id=id,
+                                                 image_id=image_id)
+        if status != 202:
+            raise IOError('%d: %s'%(status,response))
+        response = self.catalog.transport.get(response['image_url_local'])
+        if response.status_code >= 300:
+            raise IOError('could not download image %s of %s (%d)'%(image_id,id,response.status_code))
+        return response.content
+
+    def hash_products(self,products,
+                      image_folder=None):
+        """ Read and hash the product images (ignored images are skipped).
+
+        :params:
+            - products : dict or CatalogMirror
+                id -> product data
+            - image_folder : str, optional (default: None)
+                If specified the images are read from this folder (by
+                image_filename) when present, otherwise downloaded.
+
+        :returns:
+            - failures : dict
+                (id,image_id) -> error message for images that could not be
+                read or decoded.
+        """
+        products = getattr(products,'products',products)
+
+        keys = []
+        for key in NeighborTable.images(products):
+            image = products[key[0]]['images'][key[1]]
+            known = self.hashes.get(key)
+            if known is None or known[0] != image.get('image_url'):
+                keys.append(key)
+
+        def fetch(key):
+            image = products[key[0]]['images'][key[1]]
+            try:
+                hash = self.hash_image(self._read(key[0],key[1],image,image_folder))
+            except Exception as e:
+                return key,None,str(e)
+            with self.lock:
+                self.hashes[key] = (image.get('image_url'),hash)
+            return key,hash,None
+
+        failures = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for key,hash,error in executor.map(fetch,keys):
+                if error is not None:
+                    failures[key] = error
+
+        # drop the hashes of deleted products and images
+        current = set(NeighborTable.images(products))
+        with self.lock:
+            for key in [key for key in self.hashes if key not in current]:
+                del self.hashes[key]
+
+        if self.filename is not None:
+            self.save()
+
+        return failures
+
+    #--------------------------------------------------------------------------
+    # Cluster.
+    #--------------------------------------------------------------------------
+    def clusters(self,
+                 threshold=None):
+        """ The clusters of near-duplicate images (transitively, connected
+        components of the images within threshold bits).
+
+        :params:
+            - threshold : int, optional (default: None)
+                Defaults to the threshold of the constructor.
+
+        :returns:
+            - clusters : list of list of (str,str)
+                the (id,image_id) pairs of every cluster of two or more
+                images, sorted by id. The first one is the image to keep.
+        """
+        threshold = self.threshold if threshold is None else threshold
+
+        with self.lock:
+            hashes = sorted((key,value[1]) for key,value in self.hashes.items())
+
+        index = _MultiIndex(self.hash_size*self.hash_size,threshold)
+        for key,hash in hashes:
+            index.add(hash,key)
+
+        parent = {}
+        def find(key):
+            root = key
+            while parent.get(root,root) != root:
+                root = parent[root]
+            while key != root:
+                parent[key],key = root,parent[key]
+            return root
+
+        for key,hash in hashes:
+            for other in index.search(hash):
+                a,b = find(key),find(other)
+                if a != b:
+                    parent[max(a,b)] = min(a,b)
+
+        groups = {}
+        for key,hash in hashes:
+            groups.setdefault(find(key),[]).append(key)
+
+        return sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+    def report(self,
+               threshold=None):
+        """ The near-duplicate summary.
+
+        :returns:
+            - report : dict
+                'images' (hashed), 'clusters', 'duplicate_images' (the
+                images that would be ignored) and 'products' (keep id ->
+                sorted list of the ids with a duplicate of its images)
+        """
+        clusters = self.clusters(threshold=threshold)
+
+        products = {}
+        for cluster in clusters:
+            keep = cluster[0][0]
+            ids = products.setdefault(keep,set())
+            ids.update(id for id,image_id in cluster[1:] if id != keep)
+
+        report = {}
+        report['images'] = len(self.hashes)
+        report['clusters'] = len(clusters)
+        report['duplicate_images'] = sum(len(cluster)-1 for cluster in clusters)
+        report['products'] = dict((keep,sorted(ids)) for keep,ids in products.items() if ids)
+        return report
+
+    def mark(self,products,clusters,
+             dry_run=False):
+        """ Mark the duplicate images (all but the first image of every
+        cluster) with 'ignore':'yes' using Catalog.update_product. Products
+        are updated concurrently, without downloading the images again.
+
+        :params:
+            - products : dict or CatalogMirror
+                id -> product data (the data sent with update_product),
+                updated in place.
+            - clusters : list of list of (str,str)
+                see clusters()
+            - dry_run : boolean, optional (default: False)
+                If True nothing is updated.
+
+        :returns:
+            - updates : dict
+                id -> list of the image ids marked
+            - failures : dict
+                id -> (status_code,response) for failed updates.
+        """
+        products = getattr(products,'products',products)
+
+        updates = {}
+        for cluster in clusters:
+            for id,image_id in cluster[1:]:
+                updates.setdefault(id,[]).append(image_id)
+        for image_ids in updates.values():
+            image_ids.sort()
+
+        if dry_run:
+            return updates,{}
+
+        def update(id):
+            data = dict(products[id])
+            data['images'] = dict((image_id,dict(image)) for image_id,image in data['images'].items())
+            for image_id in updates[id]:
+                data['images'][image_id]['ignore'] = 'yes'
+            try:
+                status,response = self.catalog.update_product(catalog_name=self.catalog_name,
+                                                              id=id,
+                                                              data=data,
+                                                              download_images=False)
+            except Exception as e:
+                status,response = None,str(e)
+            return id,data,status,response
+
+        failures = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for id,data,status,response in executor.map(update,sorted(updates)):
+                if status is None or status >= 300:
+                    failures[id] = (status,response)
+                else:
+                    products[id] = data
+
+        return updates,failures
+
+    #--------------------------------------------------------------------------
+    # Persistence.
+    #--------------------------------------------------------------------------
+    def save(self,filename=None):
+        """ Save the hashes (gzipped json).
+
+        :params:
+            - filename : str, optional (default: None)
+                Defaults to the filename the object was created with.
+        """
+        filename = filename or self.filename
+
+        with self.lock:
+            records = [[id,image_id,image_url,'%x'%(hash)]
+                       for (id,image_id),(image_url,hash) in self.hashes.items()]
+
+        tmp_filename = '%s.tmp'%(filename)
+        with gzip.open(tmp_filename,'wt') as f:
+            json.dump({'hash_size':self.hash_size,'hashes':records},f,separators=(',',':'))
+        os.replace(tmp_filename,filename)
+
+    def load(self,filename=None):
+        """ Load the hashes (hashes of another hash_size are dropped).
+
+        :params:
+            - filename : str, optional (default: None)
+                Defaults to the filename the object was created with.
+        """
+        filename = filename or self.filename
+
+        with gzip.open(filename,'rt') as f:
+            state = json.load(f)
+
+        hashes = {}
+        if state.get('hash_size') == self.hash_size:
+            for id,image_id,image_url,hash in state['hashes']:
+                hashes[(id,image_id)] = (image_url,int(hash,16))
+        with self.lock:
+            self.hashes = hashes
@@ -0,0 +1,311 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Precomputed visual browse neighbors.
+After the visual search index is built, VisualSearch.browse is run once for
+every product image and the top-k neighbors are stored in a memory-mapped
+table (integer coded ids and float32 scores) that serves browse results
+locally.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["NeighborTable"]
+
+import os
+import json
+import mmap
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .Results import result_list, score_field, result_score
+
+# magic, format version, k, number of rows, offset of the json metadata
+_HEADER = struct.Struct('<4sIIIQ')
+_MAGIC = b'CFNT'
+_VERSION = 1
+
+# The browse parameters the table is built with (and must match to serve),
+# with the VisualSearch.browse defaults.
+_BROWSE_PARAMS = {'per_category_index':False,
+                  'category':None,
+                  'sort_option':'visual_similarity',
+                  'unique_products':False}
+
+class _Table():
+    """ An open (memory-mapped) neighbor table file.
+    """
+    def __init__(self,filename):
+        with open(filename,'rb') as f:
+            self.mmap = mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+
+        try:
+            magic,version,k,n,offset = _HEADER.unpack_from(self.mmap,0)
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError('%s is not a neighbor table.'%(filename))
+
+            self.k = k
+            self.row_format = struct.Struct('<%di%di%df'%(k,k,k))
+            self.metadata = json.loads(self.mmap[offset:].decode('utf-8'))
+            self.ids = self.metadata['ids']
+            self.image_ids = self.metadata['image_ids']
+            self.rows = dict(((self.ids[i],self.image_ids[j]),row)
+                             for row,(i,j) in enumerate(self.metadata['rows']))
+        except Exception:
+            self.mmap.close()
+            raise
+
+class NeighborTable():
+    """ Precomputed visual browse neighbors.
+
+    Each row holds k neighbor id codes (int32), k neighbor image id codes
+    (int32) and k scores (float32). The id strings and the row index are kept
+    in a json block at the end of the file.
+    """
+    def __init__(self,visual_search,catalog_name,filename):
+        """ Initialization. Opens the table if the file exists.
+
+        :params:
+            - visual_search : VisualSearch
+                The visual search client (used to build and for misses).
+            - catalog_name : str
+                the catalog name
+            - filename : str
+                the table file
+        """
+
+        self.visual_search = visual_search
+        self.catalog_name = catalog_name
+        self.filename = filename
+
+        # the open _Table, replaced as a whole (under the lock) by build
+        self.table = None
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.exists(filename):
+            self.open()
+
+    #--------------------------------------------------------------------------
+    # Build the table.
+    #--------------------------------------------------------------------------
+    @staticmethod
+    def images(products):
+        """ The (id,image_id) pairs of products, skipping ignored images.
+
+        :params:
+            - products : dict or CatalogMirror
+                id -> product data
+        """
+        products = getattr(products,'products',products)
+        for id,data in products.items():
+            for image_id,image in sorted(data.get('images',{}).items()):
+                if image.get('ignore') != 'yes':
+                    yield id,image_id
+
+    def build(self,images,
+              k=12,
+              max_workers=16,
+              wait=True,
+              poll_interval=10.0,
+              timeout=3600.0,
+              **browse_params):
+        """ Run VisualSearch.browse for every product image and write the table.
+
+        :params:
+            - images : iterable of (str,str)
+                the (id,image_id) pairs, see images()
+            - k : int, optional (default: 12)
+                The number of neighbors stored per image.
+            - max_workers : int, optional (default: 16)
+                The number of concurrent browse requests.
+            - wait : boolean, optional (default: True)
+                If True first waits for the index build to complete
+                (VisualSearch.index_wait).
+            - poll_interval : float, optional (default: 10.0)
+                Seconds between index_status calls.
+            - timeout : float, optional (default: 3600.0)
+                Passed to VisualSearch.index_wait.
+            - browse_params
+                per_category_index, category, sort_option, unique_products
+                passed to VisualSearch.browse. Lookups with other values are
+                sent to the live endpoint.
+
+        :returns:
+            - failures : dict
+                (id,image_id) -> (status_code,response) for failed browses.
+        """
+        if wait:
+            self.visual_search.index_wait(catalog_name=self.catalog_name,
+                                          poll_interval=poll_interval,
+                                          timeout=timeout)
+
+        def browse(key):
+            try:
+                return key,self.visual_search.browse(catalog_name=self.catalog_name,
+                                                     id=key[0],
+                                                     image_id=key[1],
+                                                     max_number_of_results=k,
+                                                     use_cache=False,
+                                                     **browse_params)
+            except Exception as e:
+                return key,(None,str(e))
+
+        id_codes,image_codes = {},{}
+        def code(codes,value):
+            if value not in codes:
+                codes[value] = len(codes)
+            return codes[value]
+
+        rows = []
+        failures = {}
+        results_key,score_key = 'products','score'
+
+        tmp_filename = '%s.tmp'%(self.filename)
+        with open(tmp_filename,'wb') as f:
+            f.write(_HEADER.pack(_MAGIC,_VERSION,k,0,0))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                for key,(status,response) in executor.map(browse,list(images)):
+                    if status != 200:
+                        failures[key] = (status,response)
+                        continue
+                    key_name,results = result_list(response)
+                    if key_name is not None:
+                        results_key = key_name
+                    if results and score_field(results[0]) is not None:
+                        score_key = score_field(results[0])
+
+                    neighbor_ids = [-1]*k
+                    neighbor_images = [-1]*k
+                    scores = [0.0]*k
+                    for i,item in enumerate(results[:k]):
+                        neighbor_ids[i] = code(id_codes,str(item['id']))
+                        if item.get('image_id') is not None:
+                            neighbor_images[i] = code(image_codes,str(item['image_id']))
+                        scores[i] = result_score(item)
+
+                    f.write(struct.pack('<%di%di%df'%(k,k,k),*(neighbor_ids+neighbor_images+scores)))
+                    rows.append([code(id_codes,key[0]),code(image_codes,key[1])])
+
+            metadata = {}
+            metadata['catalog_name'] = self.catalog_name
+            metadata['browse_params'] = browse_params
+            metadata['results_key'] = results_key
+            metadata['score_key'] = score_key
+            metadata['ids'] = sorted(id_codes,key=id_codes.get)
+            metadata['image_ids'] = sorted(image_codes,key=image_codes.get)
+            metadata['rows'] = rows
+
+            offset = f.tell()
+            f.write(json.dumps(metadata,separators=(',',':')).encode('utf-8'))
+            f.seek(0)
+            f.write(_HEADER.pack(_MAGIC,_VERSION,k,len(rows),offset))
+
+        # readers keep using the old table (mapped until the last reference
+        # goes away) until the new one is swapped in
+        os.replace(tmp_filename,self.filename)
+        self.open()
+
+        return failures
+
+    #--------------------------------------------------------------------------
+    # Open / close the table.
+    #--------------------------------------------------------------------------
+    def open(self):
+        """ Memory-map the table.
+        """
+        table = _Table(self.filename)
+        with self.lock:
+            self.table = table
+
+    def close(self):
+        with self.lock:
+            table,self.table = self.table,None
+        if table is not None:
+            table.mmap.close()
+
+    @property
+    def k(self):
+        table = self.table
+        return table.k if table is not None else 0
+
+    @property
+    def metadata(self):
+        table = self.table
+        return table.metadata if table is not None else {}
+
+    #--------------------------------------------------------------------------
+    # Visual Browse (from the table)
+    #--------------------------------------------------------------------------
+    def lookup(self,id,image_id,
+               max_number_of_results=12):
+        """ The stored neighbors of a product image.
+
+        :returns:
+            - results : list of dict or None
+                [{'id','image_id',score_key}], None if not in the table.
+        """
+        return self._lookup(self.table,id,image_id,max_number_of_results)
+
+    @staticmethod
+    def _lookup(table,id,image_id,max_number_of_results):
+        if table is None:
+            return None
+        row = table.rows.get((id,image_id))
+        if row is None or max_number_of_results > table.k:
+            return None
+
+        values = table.row_format.unpack_from(table.mmap,_HEADER.size+row*table.row_format.size)
+        k = table.k
+        score_key = table.metadata['score_key']
+
+        results = []
+        for i in range(min(k,max_number_of_results)):
+            if values[i] < 0:
+                break
+            item = {}
+            item['id'] = table.ids[values[i]]
+            if values[k+i] >= 0:
+                item['image_id'] = table.image_ids[values[k+i]]
+            item[score_key] = values[2*k+i]
+            results.append(item)
+        return results
+
+    def browse(self,catalog_name,id,image_id,
+               max_number_of_results=12,
+               **browse_params):
+        """ Same as VisualSearch.browse but served from the table. Falls back
+        to the live endpoint for misses (other catalog, image not in the
+        table, more results than k or different browse parameters).
+        """
+        browse_params.pop('use_cache',None)
+        table = self.table
+        if table is not None and catalog_name == self.catalog_name:
+            stored_params = table.metadata.get('browse_params',{})
+            matches = all(browse_params.get(name,default) == stored_params.get(name,default)
+                          for name,default in _BROWSE_PARAMS.items())
+            results = self._lookup(table,id,image_id,max_number_of_results) if matches else None
+            if results is not None:
+                self.hits += 1
+                response = {}
+                response[table.metadata['results_key']] = results
+                return 200,response
+
+        self.misses += 1
+        return self.visual_search.browse(catalog_name=catalog_name,
+                                         id=id,
+                                         image_id=image_id,
+                                         max_number_of_results=max_number_of_results,
+                                         **browse_params)
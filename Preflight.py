@@ -0,0 +1,223 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Pre-flight checks for product ingestion.
+Validates the product json and checks that the image urls are reachable
+before the products are sent with Catalog.add_product.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["Preflight","PRODUCT_SCHEMA"]
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .Backends import RequestsBackend
+
+try:
+    string_types = (str,unicode)
+except NameError:
+    string_types = (str,)
+
+# The product json.
+# type - the python type(s), required/optional - field name -> schema,
+# values - the schema of every value of a dict, enum - the allowed values.
+PRODUCT_SCHEMA = {
+    'type':dict,
+    'required':{
+        'id':{'type':string_types},
+    },
+    'optional':{
+        'images':{
+            'type':dict,
+            'values':{
+                'type':dict,
+                'required':{
+                    'image_url':{'type':string_types},
+                },
+                'optional':{
+                    'image_type':{'type':string_types},
+                    'ignore':{'type':string_types,'enum':('yes','no')},
+                },
+            },
+        },
+    },
+}
+
+def _compile(schema):
+    """ Compile a schema into a function validate(value,path) that returns a
+    list of error strings.
+    """
+    types = schema.get('type')
+    enum = schema.get('enum')
+    required = [(name,_compile(s)) for name,s in schema.get('required',{}).items()]
+    optional = [(name,_compile(s)) for name,s in schema.get('optional',{}).items()]
+    values = _compile(schema['values']) if 'values' in schema else None
+
+    def validate(value,path):
+        if types is not None and not isinstance(value,types):
+            return ['%s: expected %s'%(path,getattr(types,'__name__','str'))]
+        if enum is not None and value not in enum:
+            return ['%s: expected one of %s'%(path,', '.join(enum))]
+
+        errors = []
+        for name,validate_field in required:
+            if name not in value:
+                errors.append('%s.%s: missing'%(path,name))
+            else:
+                errors.extend(validate_field(value[name],'%s.%s'%(path,name)))
+        for name,validate_field in optional:
+            if name in value:
+                errors.extend(validate_field(value[name],'%s.%s'%(path,name)))
+        if values is not None:
+            for key,item in value.items():
+                errors.extend(values(item,'%s.%s'%(path,key)))
+        return errors
+
+    return validate
+
+class Preflight():
+    """ Pre-flight checks for product ingestion.
+    """
+    def __init__(self,
+                 schema=PRODUCT_SCHEMA,
+                 check_images=True,
+                 max_workers=16,
+                 timeout=5.0,
+                 transport=None,
+                 backend=None):
+        """ Initialization.
+
+        :params:
+            - schema : dict, optional (default: PRODUCT_SCHEMA)
+                The product json schema.
+            - check_images : boolean, optional (default: True)
+                If True checks that the image urls are reachable (HEAD).
+            - max_workers : int, optional (default: 16)
+                The number of concurrent image url checks.
+            - timeout : float, optional (default: 5.0)
+                The timeout (seconds) for an image url check.
+            - transport : Transport, optional (default: None)
+                If specified the image url checks share its backend (its
+                connection pool), but not its gateway layers.
+            - backend : optional (default: None)
+                The HTTP backend of the image url checks (see Backends).
+                The image hosts are not the api gateway, so the checks are
+                sent directly, without the rate limits, aliases, load
+                balancing, scheduling or listeners of a Transport. Defaults
+                to the backend of transport or a RequestsBackend.
+        """
+
+        self.validator = _compile(schema)
+        self.check_images = check_images
+        self.max_workers = max_workers
+        self.timeout = timeout
+        if backend is None:
+            backend = (transport.backend if transport is not None
+                       else RequestsBackend(pool_maxsize=max_workers))
+        self.backend = backend
+
+        # url -> None if reachable else the reason
+        self.url_cache = {}
+        self.lock = threading.Lock()
+
+    def validate(self,data):
+        """ Validate a product json against the schema.
+
+        :returns:
+            - errors : list of str
+        """
+        return self.validator(data,'data')
+
+    def _check_url(self,url):
+        try:
+            response = self.backend.request('HEAD',url,
+                                            allow_redirects=True,
+                                            timeout=self.timeout)
+            if response.status_code in (403,405):
+                # some servers do not implement HEAD
+                response = self.backend.request('GET',url,
+                                                stream=True,
+                                                timeout=self.timeout)
+                response.close()
+            if response.status_code >= 400:
+                return 'status %d'%(response.status_code)
+            return None
+        except Exception as e:
+            return str(e)
+
+    def check_image_urls(self,urls):
+        """ Check concurrently that the image urls are reachable. Every url
+        is checked only once, the results are cached.
+
+        :params:
+            - urls : iterable of str
+
+        :returns:
+            - errors : dict
+                url -> reason, for the urls that are not reachable.
+        """
+        with self.lock:
+            unchecked = set(url for url in urls if url not in self.url_cache)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = list(executor.map(lambda url:(url,self._check_url(url)),unchecked))
+
+        with self.lock:
+            self.url_cache.update(results)
+            return dict((url,self.url_cache[url]) for url in urls
+                        if self.url_cache.get(url) is not None)
+
+    def run(self,products,
+            check_images=None):
+        """ Run the pre-flight checks.
+
+        :params:
+            - products : list of dict
+                the product json
+            - check_images : boolean, optional (default: None)
+                Overrides the check_images set at initialization.
+
+        :returns:
+            - valid : list of dict
+                the products that passed
+            - rejected : list of (dict,list of str)
+                the products that failed along with the errors
+        """
+        if check_images is None:
+            check_images = self.check_images
+
+        errors = [self.validate(data) for data in products]
+
+        url_errors = {}
+        if check_images:
+            urls = set()
+            for data,product_errors in zip(products,errors):
+                if not product_errors:
+                    for image in data.get('images',{}).values():
+                        urls.add(image['image_url'])
+            url_errors = self.check_image_urls(urls)
+
+        valid,rejected = [],[]
+        for data,product_errors in zip(products,errors):
+            if not product_errors and url_errors:
+                for image_id,image in data.get('images',{}).items():
+                    reason = url_errors.get(image['image_url'])
+                    if reason is not None:
+                        product_errors.append('data.images.%s.image_url: %s'%(image_id,reason))
+            if product_errors:
+                rejected.append((data,product_errors))
+            else:
+                valid.append(data)
+
+        return valid,rejected
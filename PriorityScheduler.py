@@ -0,0 +1,229 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Priority scheduling of the requests of a Transport.
+Interactive traffic (browse, search, ...) and bulk traffic (add_product,
+categories_predict, ...) sharing a transport wait in separate queues for
+the in-flight slots (the connection pool), which are handed out by weighted
+fair sharing, so that bulk jobs cannot crowd out interactive calls. When a
+queue grows past its limit new requests of that class are shed (Overloaded)
+instead of queued. The rate limiter tokens are taken after the slot, so the
+rate budget is shared in the same proportions.
+
+    scheduler = PriorityScheduler(max_in_flight=32,limits={'bulk':24})
+    transport = Transport(pool_maxsize=32,scheduler=scheduler)
+
+    with priority('bulk'):
+        vs.search(...) # a search_many style job
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["PriorityScheduler","Overloaded","priority","default_priority"]
+
+import re
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from .Deadline import DeadlineExceeded
+from .Histogram import Histogram
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+_local = threading.local()
+
+class Overloaded(RuntimeError):
+    """ The request was shed, its priority class queue is full.
+    """
+    pass
+
+@contextmanager
+def priority(name):
+    """ Send the requests made in this block (in this thread) with a
+    priority class.
+    """
+    previous = getattr(_local,'priority',None)
+    _local.priority = name
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+def current_priority():
+    return getattr(_local,'priority',None)
+
+# the query endpoints (and the product reads that back their results)
+_QUERY_PATHS = re.compile(r'(/catalog/[^/]+/visual_browse/[^/]+/[^/]+'
+                          r'|/catalog/[^/]+/text_search'
+                          r'|/catalog/[^/]+/natural_language_search'
+                          r'|/natural_language_search/(parse|spell_correct|elasticsearch_queries)'
+                          r'|/complete_the_look/.*'
+                          r'|/catalog/[^/]+/(products|images)/[^/]+)/?$')
+_VISUAL_SEARCH_PATH = re.compile(r'/catalog/[^/]+/visual_search/?$')
+
+def default_priority(method,url):
+    """ The priority class of a request when none is given: the searches,
+    browses and product reads are 'interactive', the rest (catalog writes,
+    index builds, category predictions, status polls) 'bulk'. The endpoint
+    is matched on whole path segments, whatever the catalog name and ids.
+    """
+    method = method.upper()
+    path = urlparse(url).path
+    if method == 'POST' and _VISUAL_SEARCH_PATH.search(path):
+        # visual search with an uploaded image
+        return 'interactive'
+    if method == 'GET' and _QUERY_PATHS.search(path):
+        return 'interactive'
+    return 'bulk'
+
+class PriorityScheduler():
+    """ Priority scheduling of the requests of a Transport.
+    """
+    def __init__(self,
+                 max_in_flight=32,
+                 weights=None,
+                 limits=None,
+                 max_queue=None):
+        """ Initialization.
+
+        :params:
+            - max_in_flight : int, optional (default: 32)
+                The number of requests in flight, all classes together (use
+                the pool_maxsize of the transport).
+            - weights : dict, optional (default: {'interactive':8,'bulk':1})
+                class -> weight. When several classes are waiting the slots
+                are handed out in proportion to the weights. Unknown classes
+                have weight 1.
+            - limits : dict, optional (default: None)
+                class -> the maximum requests in flight of that class, e.g.
+                {'bulk':24} keeps 8 slots free for the other classes.
+            - max_queue : dict, optional (default: {'bulk':1000})
+                class -> the maximum number of waiting requests, further
+                requests of that class raise Overloaded.
+        """
+
+        self.max_in_flight = max_in_flight
+        self.weights = weights if weights is not None else {'interactive':8,'bulk':1}
+        self.limits = limits or {}
+        self.max_queue = max_queue if max_queue is not None else {'bulk':1000}
+
+        self.lock = threading.Lock()
+        # class -> deque of waiting events
+        self.queues = {}
+        # class -> virtual time (slots handed out / weight)
+        self.virtual = {}
+        self.in_flight = {}
+        self.total_in_flight = 0
+
+        self.counts = {}
+        self.wait_histograms = {}
+
+    def _dispatch(self):
+        """ Hand out the free slots to the waiting requests, the class with
+        the smallest virtual time first.
+        """
+        while self.total_in_flight < self.max_in_flight:
+            names = [name for name,queue in self.queues.items()
+                     if queue and self.in_flight.get(name,0) < self.limits.get(name,self.max_in_flight)]
+            if not names:
+                return
+            name = min(names,key=lambda name:self.virtual.get(name,0.0))
+            waiter = self.queues[name].popleft()
+            self.in_flight[name] = self.in_flight.get(name,0)+1
+            self.total_in_flight += 1
+            self.virtual[name] = self.virtual.get(name,0.0)+1.0/self.weights.get(name,1)
+            waiter.set()
+
+    def acquire(self,name,
+                deadline=None):
+        """ Wait for an in-flight slot.
+
+        :params:
+            - name : str
+                the priority class
+            - deadline : Deadline, optional (default: None)
+                If specified the wait is bounded by the deadline.
+
+        Raises Overloaded if the queue of the class is full and
+        DeadlineExceeded if the deadline expires while waiting.
+        """
+        start = time.time()
+        waiter = threading.Event()
+        with self.lock:
+            counts = self.counts.setdefault(name,{'requests':0,'shed':0,'expired':0})
+            queue = self.queues.setdefault(name,deque())
+            if name in self.max_queue and len(queue) >= self.max_queue[name]:
+                counts['shed'] += 1
+                raise Overloaded('%s queue full (%d requests waiting)'%(name,len(queue)))
+            if not queue:
+                # an idle class does not bank credit: start from the busy ones
+                busy = [self.virtual.get(other,0.0) for other,q in self.queues.items() if q]
+                if busy:
+                    self.virtual[name] = max(self.virtual.get(name,0.0),min(busy))
+            queue.append(waiter)
+            counts['requests'] += 1
+            self._dispatch()
+
+        if not waiter.wait(deadline.remaining() if deadline is not None else None):
+            with self.lock:
+                if not waiter.is_set():
+                    self.queues[name].remove(waiter)
+                    counts['expired'] += 1
+                    raise DeadlineExceeded('deadline of %.3fs exceeded waiting in the %s queue'%(deadline.timeout,
+                                                                                                name))
+
+        with self.lock:
+            if name not in self.wait_histograms:
+                self.wait_histograms[name] = Histogram()
+        self.wait_histograms[name].record(time.time()-start)
+
+    def release(self,name):
+        """ Give back an in-flight slot.
+        """
+        with self.lock:
+            self.in_flight[name] -= 1
+            self.total_in_flight -= 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self,name,
+             deadline=None):
+        self.acquire(name,deadline=deadline)
+        try:
+            yield
+        finally:
+            self.release(name)
+
+    def stats(self):
+        """ The scheduler state per class.
+
+        :returns:
+            - stats : dict
+                class -> {'requests','shed','expired','waiting','in_flight',
+                'wait'} where 'wait' is the queueing time summary (see
+                Histogram.summary)
+        """
+        with self.lock:
+            stats = {}
+            for name,counts in self.counts.items():
+                stats[name] = dict(counts)
+                stats[name]['waiting'] = len(self.queues.get(name,()))
+                stats[name]['in_flight'] = self.in_flight.get(name,0)
+            histograms = dict(self.wait_histograms)
+        for name,histogram in histograms.items():
+            stats[name]['wait'] = histogram.summary()
+        return stats
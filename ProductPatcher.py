@@ -0,0 +1,224 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Field-level diff patches for Catalog.update_product.
+Keeps the last-known state of every product and sends only the fields that
+changed, with download_images turned off unless the images changed.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["ProductPatcher"]
+
+import os
+import copy
+import json
+import gzip
+import threading
+
+class ProductPatcher():
+    """ Field-level diff patches for Catalog.update_product.
+
+    Usage:
+        patcher = ProductPatcher(catalog,filename='products.state.jsonl.gz')
+        patcher.add_product(catalog_name,id,data)
+        data['price'] = 1299
+        patcher.update_product(catalog_name,id,data) # sends {'price':1299}
+        patcher.save()
+    """
+    def __init__(self,catalog,
+                 filename=None):
+        """ Initialization.
+
+        :params:
+            - catalog : Catalog
+                The catalog client.
+            - filename : str, optional (default: None)
+                The file the known product states are saved to / loaded from
+                (gzipped json lines). If the file exists it is loaded. By
+                default the states are only kept in memory.
+        """
+
+        self.catalog = catalog
+        self.filename = filename
+
+        # (catalog_name,id) -> last-known product data
+        self.products = {}
+        self.lock = threading.Lock()
+
+        self.stats = {}
+        self.stats['requests'] = 0
+        self.stats['unchanged'] = 0
+        self.stats['fields_sent'] = 0
+        self.stats['fields_total'] = 0
+        self.stats['image_downloads_skipped'] = 0
+
+        if filename is not None and os.path.exists(filename):
+            self.load()
+
+    @staticmethod
+    def diff(old,new):
+        """ The top level fields of new that differ from old.
+
+        :returns:
+            - patch : dict
+        """
+        return dict((field,value) for field,value in new.items()
+                    if field not in old or old[field] != value)
+
+    def known(self,catalog_name,id):
+        """ The last-known state of a product (None if unknown).
+        """
+        with self.lock:
+            return copy.deepcopy(self.products.get((catalog_name,id)))
+
+    def remember(self,catalog_name,id,data):
+        """ Set the known state of a product, e.g. from Catalog.get_product
+        or from the ingestion source, without sending anything.
+        """
+        with self.lock:
+            self.products[(catalog_name,id)] = copy.deepcopy(data)
+
+    def forget(self,catalog_name,id=None):
+        """ Drop the known state of a product (or of a whole catalog).
+        """
+        with self.lock:
+            if id is not None:
+                self.products.pop((catalog_name,id),None)
+            else:
+                for key in [key for key in self.products if key[0] == catalog_name]:
+                    del self.products[key]
+
+    #--------------------------------------------------------------------------
+    # Catalog.add_product, recording the state.
+    #--------------------------------------------------------------------------
+    def add_product(self,catalog_name,id,data,
+                    download_images=True):
+        """ Catalog.add_product, the product state is recorded on success.
+        """
+        status,response = self.catalog.add_product(catalog_name,id,data,
+                                                   download_images=download_images)
+        if status < 300:
+            self.remember(catalog_name,id,data)
+        return status,response
+
+    #--------------------------------------------------------------------------
+    # Catalog.update_product with a field-level diff.
+    #--------------------------------------------------------------------------
+    def update_product(self,catalog_name,id,data,
+                       download_images=None):
+        """ Update a product, sending only the fields that changed since the
+        last-known state. Fields missing from data are left unchanged (as
+        with Catalog.update_product), to remove a field use
+        Catalog.update_product directly.
+
+        :params:
+            - catalog_name : str
+                the catalog name
+            - id : str
+                the product id
+            - data : dict
+                the product data (full or partial)
+            - download_images : boolean, optional (default: None)
+                By default the images are downloaded only if the 'images'
+                field is part of the patch.
+
+        :returns:
+            - status_code : int
+                the status code of the response, 200 if nothing changed
+                (no request is sent)
+            - response : json
+                the response, {'unchanged':True,'id':id,'message':...} if
+                nothing changed
+        """
+        with self.lock:
+            old = self.products.get((catalog_name,id))
+
+        if old is None:
+            # unknown product, send everything
+            patch = dict(data)
+        else:
+            patch = self.diff(old,data)
+
+        with self.lock:
+            self.stats['fields_total'] += len(data)
+            if not patch:
+                self.stats['unchanged'] += 1
+                return 200,{'unchanged':True,
+                            'id':id,
+                            'message':'product %s unchanged, not sent'%(id)}
+            self.stats['requests'] += 1
+            self.stats['fields_sent'] += len(patch)
+
+        if download_images is None:
+            download_images = 'images' in patch
+            if not download_images and 'images' in data:
+                with self.lock:
+                    self.stats['image_downloads_skipped'] += 1
+
+        status,response = self.catalog.update_product(catalog_name,id,patch,
+                                                      download_images=download_images)
+
+        if status < 300:
+            with self.lock:
+                state = self.products.get((catalog_name,id)) or {}
+                state.update(copy.deepcopy(patch))
+                self.products[(catalog_name,id)] = state
+
+        return status,response
+
+    #--------------------------------------------------------------------------
+    # Catalog.delete_product, forgetting the state.
+    #--------------------------------------------------------------------------
+    def delete_product(self,catalog_name,id,
+                       delete_images=False):
+        """ Catalog.delete_product, the product state is dropped.
+        """
+        status,response = self.catalog.delete_product(catalog_name,id,
+                                                      delete_images=delete_images)
+        if status < 300 or status == 404:
+            self.forget(catalog_name,id)
+        return status,response
+
+    def save(self,filename=None):
+        """ Save the known product states (gzipped json lines).
+
+        :params:
+            - filename : str, optional (default: None)
+                Defaults to the filename the patcher was created with.
+        """
+        filename = filename or self.filename
+
+        tmp_filename = '%s.tmp'%(filename)
+        with self.lock:
+            with gzip.open(tmp_filename,'wt') as f:
+                for (catalog_name,id),data in self.products.items():
+                    f.write(json.dumps({'catalog_name':catalog_name,'id':id,'data':data},
+                                       separators=(',',':')))
+                    f.write('\n')
+        os.replace(tmp_filename,filename)
+
+    def load(self,filename=None):
+        """ Load the known product states.
+
+        :params:
+            - filename : str, optional (default: None)
+                Defaults to the filename the patcher was created with.
+        """
+        filename = filename or self.filename
+
+        with self.lock:
+            self.products = {}
+            with gzip.open(filename,'rt') as f:
+                for line in f:
+                    record = json.loads(line)
+                    self.products[(record['catalog_name'],record['id'])] = record['data']
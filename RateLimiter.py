@@ -0,0 +1,151 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Token bucket rate limiter keyed by api key.
+The buckets are kept in a small state file guarded by a file lock, so all
+the threads and processes on a host using the same api key share them.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["RateLimiter"]
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+class RateLimiter():
+    """ Token bucket rate limiter keyed by api key.
+    """
+    def __init__(self,rates,
+                 directory=None,
+                 shared=True):
+        """ Initialization.
+
+        :params:
+            - rates : dict
+                endpoint class -> requests per second, or a tuple
+                (requests per second,burst). The burst defaults to one second
+                worth of requests. Endpoint classes are 'catalog_read',
+                'catalog_write', 'visual_search', 'natural_language_search'
+                and 'complete_the_look'. Classes not in rates are not limited.
+            - directory : str, optional (default: None)
+                The directory for the state/lock files. Defaults to the
+                system temp directory.
+            - shared : boolean, optional (default: True)
+                If True the buckets are shared with the other processes on
+                the host (needs fcntl). If False (or fcntl is not available)
+                they are shared only across the threads of this process.
+        """
+
+        self.rates = {}
+        for name,rate in rates.items():
+            if isinstance(rate,(tuple,list)):
+                self.rates[name] = (float(rate[0]),float(rate[1]))
+            else:
+                self.rates[name] = (float(rate),max(float(rate),1.0))
+
+        self.directory = directory or tempfile.gettempdir()
+        self.shared = shared and fcntl is not None
+
+        self.lock = threading.Lock()
+        # in process buckets when not shared, key -> [tokens,timestamp]
+        self.buckets = {}
+
+    def _filename(self,api_key):
+        digest = hashlib.sha1((api_key or '').encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.directory,'cfapisdk-ratelimit-%s.json'%(digest))
+
+    def _take(self,state,name,now):
+        """ Refill the bucket and take a token.
+
+        :returns:
+            - wait : float
+                0.0 if a token was taken else the seconds to wait for one.
+        """
+        rate,burst = self.rates[name]
+        tokens,timestamp = state.get(name,(burst,now))
+        tokens = min(burst,tokens+(now-timestamp)*rate)
+        if tokens >= 1.0:
+            state[name] = (tokens-1.0,now)
+            return 0.0
+        state[name] = (tokens,now)
+        return (1.0-tokens)/rate
+
+    def _try_acquire(self,name,api_key):
+        now = time.time()
+
+        if not self.shared:
+            with self.lock:
+                state = self.buckets.setdefault(api_key,{})
+                return self._take(state,name,now)
+
+        with self.lock:
+            fd = os.open(self._filename(api_key),os.O_RDWR | os.O_CREAT,0o600)
+            try:
+                fcntl.flock(fd,fcntl.LOCK_EX)
+                content = b''
+                while True:
+                    chunk = os.read(fd,65536)
+                    if not chunk:
+                        break
+                    content += chunk
+                try:
+                    state = json.loads(content.decode('utf-8')) if content else {}
+                except ValueError:
+                    state = {}
+                wait = self._take(state,name,now)
+                content = json.dumps(state).encode('utf-8')
+                os.lseek(fd,0,os.SEEK_SET)
+                os.ftruncate(fd,0)
+                os.write(fd,content)
+                return wait
+            finally:
+                os.close(fd)
+
+    def acquire(self,name,
+                api_key=None,
+                timeout=None):
+        """ Block until a token is available.
+
+        :params:
+            - name : str
+                the endpoint class
+            - api_key : str, optional (default: None)
+                the api key, every api key has its own buckets
+            - timeout : float, optional (default: None)
+                If specified gives up (without a token) as soon as the wait
+                would take longer than this many seconds.
+
+        :returns:
+            - acquired : boolean
+                False if the wait would exceed timeout.
+        """
+        if name not in self.rates:
+            return True
+
+        start = time.time()
+        while True:
+            wait = self._try_acquire(name,api_key)
+            if wait <= 0.0:
+                return True
+            if timeout is not None and time.time()-start+wait > timeout:
+                return False
+            time.sleep(wait)
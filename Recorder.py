@@ -0,0 +1,312 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Traffic recorder and replay.
+The Recorder captures every request made through a Transport to a gzipped
+json lines log. The Replayer re-issues the recorded traffic against any api
+gateway url at 1x or Nx speed and reports the latency percentiles.
+
+    recorder = Recorder('traffic.jsonl.gz')
+    recorder.attach(catalog.transport)
+    ...
+    recorder.close()
+
+    python -m cfapisdk replay traffic.jsonl.gz http://localhost:9080/ your_api_key --speed 4
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["Recorder","Replayer"]
+
+import os
+import sys
+import json
+import gzip
+import time
+import base64
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .Transport import Transport, endpoint_class
+from .Histogram import Histogram
+
+try:
+    from urllib.parse import urlparse, urljoin
+except ImportError:
+    from urlparse import urlparse, urljoin
+
+# Never written to the log.
+_SECRET_HEADERS = ('x-api-key','authorization')
+
+class Recorder():
+    """ Traffic recorder.
+    """
+    def __init__(self,filename,
+                 record_request_bodies=False,
+                 record_responses=False):
+        """ Initialization.
+
+        :params:
+            - filename : str
+                the log file (gzipped json lines, one request per line)
+            - record_request_bodies : boolean, optional (default: False)
+                If True non-json request bodies (the visual search images)
+                are stored (base64) so they can be replayed. Json bodies are
+                always stored.
+            - record_responses : boolean, optional (default: False)
+                If True the response bodies are stored too.
+        """
+
+        self.filename = filename
+        self.record_request_bodies = record_request_bodies
+        self.record_responses = record_responses
+
+        self.file = gzip.open(filename,'wt')
+        self.lock = threading.Lock()
+        self.t0 = time.time()
+        self.transports = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    def attach(self,transport):
+        """ Record every request made through a transport.
+        """
+        transport.add_listener(self)
+        self.transports.append(transport)
+
+    def close(self):
+        for transport in self.transports:
+            transport.remove_listener(self)
+        self.transports = []
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+    def _data(self,data,record):
+        """ Record the size (and optionally the content) of a non-json body.
+        """
+        if data is None:
+            return
+        if hasattr(data,'fileno'):
+            record['data_size'] = os.fstat(data.fileno()).st_size
+            if self.record_request_bodies and hasattr(data,'name'):
+                with open(data.name,'rb') as f:
+                    record['data'] = base64.b64encode(f.read()).decode('ascii')
+        elif isinstance(data,bytes):
+            record['data_size'] = len(data)
+            if self.record_request_bodies:
+                record['data'] = base64.b64encode(data).decode('ascii')
+
+    def __call__(self,event):
+        kwargs = event['kwargs']
+        response = event['response']
+
+        record = {}
+        record['t'] = round(event['start']-self.t0,6)
+        record['elapsed'] = round(event['elapsed'],6)
+        record['thread'] = threading.current_thread().ident
+        record['method'] = event['method']
+        record['path'] = urlparse(event['url']).path
+        if kwargs.get('params'):
+            record['params'] = kwargs['params']
+        headers = dict((k,v) for k,v in (kwargs.get('headers') or {}).items()
+                       if k.lower() not in _SECRET_HEADERS)
+        if headers:
+            record['headers'] = headers
+        if kwargs.get('json') is not None:
+            record['json'] = kwargs['json']
+        self._data(kwargs.get('data'),record)
+
+        if response is not None:
+            record['status'] = response.status_code
+            if not kwargs.get('stream'):
+                record['response_size'] = len(response.content)
+                if self.record_responses:
+                    record['response'] = response.text
+        else:
+            record['error'] = str(event['error'])
+
+        line = json.dumps(record,separators=(',',':'))
+        with self.lock:
+            if self.file is not None:
+                self.file.write(line)
+                self.file.write('\n')
+
+def _read(filename):
+    with gzip.open(filename,'rt') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _peak_concurrency(records):
+    """ The maximum number of requests in flight in a recording.
+    """
+    events = []
+    for record in records:
+        events.append((record['t'],1))
+        events.append((record['t']+record.get('elapsed',0.0),-1))
+    peak = current = 0
+    for _,delta in sorted(events,key=lambda e:(e[0],e[1])):
+        current += delta
+        peak = max(peak,current)
+    return peak
+
+class Replayer():
+    """ Traffic replay.
+    """
+    def __init__(self,filename,api_gateway_url,api_key,
+                 speed=1.0,
+                 max_workers=None,
+                 data_filename=None,
+                 transport=None):
+        """ Initialization.
+
+        :params:
+            - filename : str
+                the log written by the Recorder
+            - api_gateway_url : str
+                the api gateway url to replay against
+            - api_key : str
+                the api key
+            - speed : float, optional (default: 1.0)
+                The replay speed (2.0 replays the traffic twice as fast).
+            - max_workers : int, optional (default: None)
+                The maximum number of requests in flight. Defaults to the
+                peak concurrency of the recording times the speed.
+            - data_filename : str, optional (default: None)
+                The body sent for requests whose (non-json) body was not
+                recorded, e.g. a sample image for visual search. If None
+                such requests are skipped.
+            - transport : Transport, optional (default: None)
+        """
+
+        self.records = sorted(_read(filename),key=lambda record:record['t'])
+        self.api_gateway_url = api_gateway_url
+        self.api_key = api_key
+        self.speed = speed
+        self.data_filename = data_filename
+        self.transport = transport if transport is not None else Transport()
+
+        if max_workers is None:
+            max_workers = max(int(_peak_concurrency(self.records)*max(speed,1.0)+0.5),1)
+        self.max_workers = max_workers
+
+    def _send(self,record):
+        headers = dict(record.get('headers') or {})
+        headers['X-Api-Key'] = self.api_key
+
+        kwargs = {}
+        kwargs['headers'] = headers
+        kwargs['params'] = record.get('params')
+        if 'json' in record:
+            kwargs['json'] = record['json']
+        if 'data' in record:
+            kwargs['data'] = base64.b64decode(record['data'])
+        elif 'data_size' in record:
+            with open(self.data_filename,'rb') as f:
+                kwargs['data'] = f.read()
+
+        url = urljoin(self.api_gateway_url,record['path'].lstrip('/'))
+
+        start = time.time()
+        try:
+            response = self.transport.request(record['method'],url,**kwargs)
+            status = response.status_code
+        except Exception as e:
+            status = type(e).__name__
+        return status,time.time()-start
+
+    def run(self):
+        """ Replay the traffic.
+
+        :returns:
+            - report : dict
+                report['requests'] - the number of requests sent
+                report['skipped'] - requests skipped (body not recorded)
+                report['duration'] - seconds
+                report['throughput'] - requests per second
+                report['status'] - status code (or exception) -> count
+                report['latency'] - see Histogram.summary
+                report['endpoints'] - endpoint class -> latency summary
+                report['max_lag'] - the worst delay (seconds) between the
+                    scheduled and the actual send time
+        """
+        histogram = Histogram()
+        histograms = {}
+        status_counts = {}
+        lock = threading.Lock()
+
+        report = {}
+        report['requests'] = 0
+        report['skipped'] = 0
+        report['max_lag'] = 0.0
+
+        def call(record):
+            status,elapsed = self._send(record)
+            name = endpoint_class(record['method'],record['path'])
+            with lock:
+                status_counts[str(status)] = status_counts.get(str(status),0)+1
+                if name not in histograms:
+                    histograms[name] = Histogram()
+            histogram.record(elapsed)
+            histograms[name].record(elapsed)
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            t0 = self.records[0]['t'] if self.records else 0.0
+            for record in self.records:
+                if 'data_size' in record and 'data' not in record and self.data_filename is None:
+                    report['skipped'] += 1
+                    continue
+                due = start+(record['t']-t0)/self.speed
+                delay = due-time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                else:
+                    report['max_lag'] = max(report['max_lag'],-delay)
+                executor.submit(call,record)
+                report['requests'] += 1
+
+        report['duration'] = time.time()-start
+        report['throughput'] = report['requests']/report['duration'] if report['duration'] else 0.0
+        report['status'] = status_counts
+        report['latency'] = histogram.summary()
+        report['endpoints'] = dict((name,h.summary()) for name,h in histograms.items())
+
+        return report
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='cfapisdk replay',
+                                     description='Replay traffic recorded with cfapisdk.Recorder.')
+    parser.add_argument('filename',help='the recorded log')
+    parser.add_argument('api_gateway_url',help='the api gateway url to replay against')
+    parser.add_argument('api_key',help='the api key')
+    parser.add_argument('--speed',type=float,default=1.0,help='replay speed (default 1.0)')
+    parser.add_argument('--max-workers',type=int,default=None,help='maximum requests in flight')
+    parser.add_argument('--data-filename',default=None,
+                        help='body for requests whose body was not recorded (e.g. a sample image)')
+    args = parser.parse_args(argv)
+
+    replayer = Replayer(args.filename,args.api_gateway_url,args.api_key,
+                        speed=args.speed,
+                        max_workers=args.max_workers,
+                        data_filename=args.data_filename)
+    report = replayer.run()
+    json.dump(report,sys.stdout,indent=2,sort_keys=True,default=str)
+    sys.stdout.write('\n')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Helpers to read the result lists of the search APIs.
+The text search, natural language search, visual browse and visual search
+responses hold the results in a list of dicts with an 'id' field (for example
+response['products']).
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["result_list","score_field","result_score"]
+
+# The keys tried first for the result list and the score.
+RESULT_KEYS = ('products','results')
+SCORE_FIELDS = ('score','similarity_score','visual_similarity_score')
+
+def _is_result_list(value):
+    return (isinstance(value,list) and
+            all(isinstance(item,dict) and 'id' in item for item in value))
+
+def result_list(response):
+    """ The result list of a response.
+
+    :returns:
+        - key : str
+            the response key of the result list (None if not found)
+        - results : list of dict
+            the results (empty if not found)
+    """
+    if not isinstance(response,dict):
+        return None,[]
+
+    for key in RESULT_KEYS:
+        if _is_result_list(response.get(key)):
+            return key,response[key]
+
+    for key,value in response.items():
+        if value and _is_result_list(value):
+            return key,value
+
+    return None,[]
+
+def score_field(item):
+    """ The name of the score field of a result (None if not found).
+    """
+    for field in SCORE_FIELDS:
+        if field in item:
+            return field
+    for field,value in item.items():
+        if 'score' in field and isinstance(value,(int,float)):
+            return field
+    return None
+
+def result_score(item,
+                 default=0.0):
+    """ The score of a result.
+    """
+    field = score_field(item)
+    if field is None:
+        return default
+    return float(item[field])
@@ -0,0 +1,307 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Client-side catalog sharding.
+A logical catalog is split into N catalogs ({catalog_name}_shard{i}). Product
+writes are routed by a stable hash of the product id, searches are sent to
+all the shards concurrently and the top-k results are merged by score.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["ShardedCatalog"]
+
+import os
+import zlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from .Results import result_list, score_field, result_score
+from .Deadline import carry_deadline
+
+class ShardedCatalog():
+    """ Client-side catalog sharding.
+    """
+    def __init__(self,catalog,catalog_name,number_of_shards,
+                 visual_search=None,
+                 natural_language_search=None,
+                 max_workers=None):
+        """ Initialization.
+
+        :params:
+            - catalog : Catalog
+                The catalog client.
+            - catalog_name : str
+                the logical catalog name
+            - number_of_shards : int
+                The number of shards. Must not change once products are
+                added (the ids would be routed to other shards).
+            - visual_search : VisualSearch, optional (default: None)
+                Needed for the visual search methods.
+            - natural_language_search : NaturalLanguageSearch, optional (default: None)
+                Needed for natural_language_search.
+            - max_workers : int, optional (default: None)
+                The number of concurrent requests. Defaults to twice the
+                number of shards.
+        """
+
+        self.catalog = catalog
+        self.catalog_name = catalog_name
+        self.visual_search = visual_search
+        self.nls = natural_language_search
+
+        self.shards = ['%s_shard%d'%(catalog_name,i) for i in range(number_of_shards)]
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers or 2*number_of_shards)
+
+    def close(self):
+        self.executor.shutdown()
+
+    def shard(self,id):
+        """ The shard (catalog name) of a product id.
+        """
+        return self.shards[zlib.crc32(str(id).encode('utf-8')) % len(self.shards)]
+
+    #--------------------------------------------------------------------------
+    # Scatter / gather.
+    #--------------------------------------------------------------------------
+    def _scatter(self,fn,shards=None):
+        """ Call fn(shard) concurrently for all the shards (under the
+        caller's Deadline, if any: the shards that miss it are reported as
+        failed shards).
+
+        :returns:
+            - results : list of (str,(int,json))
+                (shard,(status_code,response))
+        """
+        def call(shard):
+            try:
+                return shard,fn(shard)
+            except Exception as e:
+                return shard,(None,str(e))
+        return list(self.executor.map(carry_deadline(call),shards or self.shards))
+
+    def _merge(self,results,max_number_of_results):
+        """ Merge the result lists of the shards by score (higher is better),
+        or, if the results have no score field, by interleaving them by rank
+        (the first result of every shard, then the second, ...). Every result
+        is tagged with the shard it came from (result['catalog_name']).
+        """
+        results_key = 'products'
+        merged = []
+        failed = {}
+        for shard,(status,response) in results:
+            if status is None or status >= 300:
+                failed[shard] = (status,response)
+                continue
+            key,items = result_list(response)
+            if key is not None:
+                results_key = key
+            for rank,item in enumerate(items):
+                item = dict(item)
+                item['catalog_name'] = shard
+                merged.append((rank,item))
+
+        if len(failed) == len(results):
+            return results[0][1]
+
+        if all(score_field(item) is not None for rank,item in merged):
+            merged.sort(key=lambda ranked:result_score(ranked[1]),reverse=True)
+        else:
+            # the scores are not comparable, the shards are in order (stable sort)
+            merged.sort(key=lambda ranked:ranked[0])
+        merged = [item for rank,item in merged]
+
+        response = {}
+        response[results_key] = merged[:max_number_of_results]
+        if failed:
+            response['failed_shards'] = failed
+        return 200,response
+
+    #--------------------------------------------------------------------------
+    # Products (routed to one shard).
+    #--------------------------------------------------------------------------
+    def add_product(self,id,data,
+                    download_images=True):
+        """ Catalog.add_product on the shard of the product.
+        """
+        return self.catalog.add_product(catalog_name=self.shard(id),
+                                        id=id,
+                                        data=data,
+                                        download_images=download_images)
+
+    def update_product(self,id,data,
+                       download_images=True):
+        """ Catalog.update_product on the shard of the product.
+        """
+        return self.catalog.update_product(catalog_name=self.shard(id),
+                                           id=id,
+                                           data=data,
+                                           download_images=download_images)
+
+    def delete_product(self,id,
+                       delete_images=False):
+        """ Catalog.delete_product on the shard of the product.
+        """
+        return self.catalog.delete_product(catalog_name=self.shard(id),
+                                           id=id,
+                                           delete_images=delete_images)
+
+    def get_product(self,id):
+        """ Catalog.get_product on the shard of the product.
+        """
+        return self.catalog.get_product(catalog_name=self.shard(id),
+                                        id=id)
+
+    def image_url(self,id,**kwargs):
+        """ Catalog.image_url on the shard of the product.
+        """
+        return self.catalog.image_url(catalog_name=self.shard(id),
+                                      id=id,
+                                      **kwargs)
+
+    #--------------------------------------------------------------------------
+    # Searches (scattered to all the shards).
+    #--------------------------------------------------------------------------
+    def text_search(self,query_text,
+                    max_number_of_results=12):
+        """ Catalog.text_search on all the shards, top-k merged by score.
+        """
+        def fn(shard):
+            return self.catalog.text_search(catalog_name=shard,
+                                            query_text=query_text,
+                                            max_number_of_results=max_number_of_results)
+        return self._merge(self._scatter(fn),max_number_of_results)
+
+    def natural_language_search(self,query_text,
+                                max_number_of_results=12,
+                                **kwargs):
+        """ NaturalLanguageSearch.natural_language_search on all the shards,
+        top-k merged by score.
+        """
+        def fn(shard):
+            return self.nls.natural_language_search(
+                catalog_name=shard,
+                query_text=query_text,
+                max_number_of_results=max_number_of_results,
+                **kwargs)
+        return self._merge(self._scatter(fn),max_number_of_results)
+
+    def search(self,image_filename,
+               max_number_of_results=12,
+               **kwargs):
+        """ VisualSearch.search on all the shards, top-k merged by score.
+        """
+        def fn(shard):
+            return self.visual_search.search(catalog_name=shard,
+                                             image_filename=image_filename,
+                                             max_number_of_results=max_number_of_results,
+                                             **kwargs)
+        return self._merge(self._scatter(fn),max_number_of_results)
+
+    def browse(self,id,image_id,
+               max_number_of_results=12,
+               **kwargs):
+        """ Visual browse across all the shards. The shard of the product is
+        browsed with VisualSearch.browse, the other shards are searched with
+        VisualSearch.search using the product image. Top-k merged by score.
+        """
+        shard = self.shard(id)
+
+        status,response = self.catalog.image_url(catalog_name=shard,
+                                                 id=id,
+                                                 image_id=image_id)
+        if status != 202:
+            return status,response
+
+        image = self.catalog.transport.get(response['image_url_local'])
+        if image.status_code >= 300:
+            return image.status_code,{'error':'could not download %s'%(response['image_url'])}
+
+        search_kwargs = dict(kwargs)
+        search_kwargs.pop('use_cache',None)
+
+        fd,image_filename = tempfile.mkstemp(suffix='.jpeg')
+        try:
+            with os.fdopen(fd,'wb') as f:
+                f.write(image.content)
+
+            def fn(other):
+                if other == shard:
+                    return self.visual_search.browse(catalog_name=shard,
+                                                     id=id,
+                                                     image_id=image_id,
+                                                     max_number_of_results=max_number_of_results,
+                                                     **kwargs)
+                return self.visual_search.search(catalog_name=other,
+                                                 image_filename=image_filename,
+                                                 max_number_of_results=max_number_of_results,
+                                                 **search_kwargs)
+            return self._merge(self._scatter(fn),max_number_of_results)
+        finally:
+            os.remove(image_filename)
+
+    #--------------------------------------------------------------------------
+    # Index builds (all the shards in parallel).
+    #--------------------------------------------------------------------------
+    def index_build(self,**kwargs):
+        """ VisualSearch.index_build on all the shards concurrently.
+
+        :returns:
+            - results : dict
+                shard -> (status_code,response)
+        """
+        def fn(shard):
+            return self.visual_search.index_build(catalog_name=shard,**kwargs)
+        return dict(self._scatter(fn))
+
+    def index_status(self):
+        """ VisualSearch.index_status of all the shards.
+
+        :returns:
+            - results : dict
+                shard -> (status_code,response)
+        """
+        def fn(shard):
+            return self.visual_search.index_status(catalog_name=shard)
+        return dict(self._scatter(fn))
+
+    def index_wait(self,**kwargs):
+        """ VisualSearch.index_wait on all the shards.
+
+        :returns:
+            - results : dict
+                shard -> (status_code,response), (None,error) for the shards
+                that failed or timed out.
+        """
+        def fn(shard):
+            return self.visual_search.index_wait(catalog_name=shard,**kwargs)
+        return dict(self._scatter(fn))
+
+    def categories_predict(self,**kwargs):
+        """ VisualSearch.categories_predict on all the shards concurrently.
+
+        :returns:
+            - results : dict
+                shard -> (status_code,response)
+        """
+        def fn(shard):
+            return self.visual_search.categories_predict(catalog_name=shard,**kwargs)
+        return dict(self._scatter(fn))
+
+    def delete(self,delete_images=True):
+        """ Catalog.delete on all the shards.
+        """
+        def fn(shard):
+            return self.catalog.delete(catalog_name=shard,
+                                       delete_images=delete_images)
+        return dict(self._scatter(fn))
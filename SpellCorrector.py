@@ -0,0 +1,342 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Local spell corrector (symmetric delete).
+The vocabulary (brands, colors, categories, ...) is built from the catalog
+product fields and from NaturalLanguageSearch.parse responses. Every word is
+indexed by all its deletions up to max_edit_distance, so that a lookup only
+generates the deletions of the query token and checks a few candidates:
+no network round trip and no scan of the vocabulary. Tokens that cannot be
+corrected locally are sent to NaturalLanguageSearch.spell_correct.
+
+    corrector = SpellCorrector(nls=nls)
+    corrector.add_products(mirror.products.values())
+    corrector.correct('red addidas snekers') # 'red adidas sneakers'
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["SpellCorrector"]
+
+import os
+import re
+import json
+import gzip
+import threading
+from collections import OrderedDict
+
+# letters only, numbers and sizes (1k, xl2) are never corrected
+_WORD_RE = re.compile(r'[^\W\d_]+',re.UNICODE)
+_TOKEN_RE = re.compile(r'\w+',re.UNICODE)
+
+# where the corrected text is looked for in a spell_correct response
+_REMOTE_KEYS = ('corrected_query_text','query_text_corrected','corrected_query','query_text')
+
+def _distance(a,b,max_distance):
+    """ Optimal string alignment (Damerau-Levenshtein) distance of a and b,
+    max_distance+1 if it is larger than max_distance.
+    """
+    if abs(len(a)-len(b)) > max_distance:
+        return max_distance+1
+    previous2 = None
+    previous = list(range(len(b)+1))
+    for i in range(1,len(a)+1):
+        current = [i]+[0]*len(b)
+        low = i
+        for j in range(1,len(b)+1):
+            cost = 0 if a[i-1] == b[j-1] else 1
+            d = min(previous[j]+1,current[j-1]+1,previous[j-1]+cost)
+            if (previous2 is not None and i > 1 and j > 1 and
+                a[i-1] == b[j-2] and a[i-2] == b[j-1]):
+                d = min(d,previous2[j-2]+1)
+            current[j] = d
+            low = min(low,d)
+        if low > max_distance:
+            return max_distance+1
+        previous2,previous = previous,current
+    return previous[-1]
+
+def _strings(response):
+    """ All the strings in a json response.
+    """
+    if isinstance(response,dict):
+        for value in response.values():
+            for s in _strings(value):
+                yield s
+    elif isinstance(response,list):
+        for value in response:
+            for s in _strings(value):
+                yield s
+    elif isinstance(response,str):
+        yield response
+
+class SpellCorrector():
+    """ Local spell corrector (symmetric delete).
+    """
+    def __init__(self,
+                 nls=None,
+                 max_edit_distance=2,
+                 prefix_length=7,
+                 min_length=3,
+                 filename=None,
+                 cache_size=10000):
+        """ Initialization.
+
+        :params:
+            - nls : NaturalLanguageSearch, optional (default: None)
+                Used for the tokens that cannot be corrected locally. If None
+                they are left as they are.
+            - max_edit_distance : int, optional (default: 2)
+                The maximum edit distance of a local correction.
+            - prefix_length : int, optional (default: 7)
+                Only the first prefix_length characters of the words are
+                indexed (smaller index, same corrections).
+            - min_length : int, optional (default: 3)
+                Shorter tokens are never corrected.
+            - filename : str, optional (default: None)
+                The file the vocabulary is saved to / loaded from (gzipped
+                json). If the file exists it is loaded.
+            - cache_size : int, optional (default: 10000)
+                The number of remote corrections cached.
+        """
+
+        self.nls = nls
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.min_length = min_length
+        self.filename = filename
+        self.cache_size = cache_size
+
+        # word -> count
+        self.words = {}
+        # deletion of a word prefix -> words
+        self.deletes = {}
+        # token -> remote correction
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.stats = {}
+        self.stats['known'] = 0
+        self.stats['local'] = 0
+        self.stats['remote'] = 0
+        self.stats['unknown'] = 0
+
+        if filename is not None and os.path.exists(filename):
+            self.load()
+
+    def __len__(self):
+        return len(self.words)
+
+    def __contains__(self,word):
+        return word.lower() in self.words
+
+    def _deletes(self,word):
+        """ All the deletions of (the prefix of) a word up to
+        max_edit_distance, the word prefix included.
+        """
+        prefix = word[:self.prefix_length]
+        deletes = set([prefix])
+        edits = [prefix]
+        for _ in range(self.max_edit_distance):
+            next_edits = []
+            for edit in edits:
+                for i in range(len(edit)):
+                    delete = edit[:i]+edit[i+1:]
+                    if delete not in deletes:
+                        deletes.add(delete)
+                        next_edits.append(delete)
+            edits = next_edits
+        return deletes
+
+    #--------------------------------------------------------------------------
+    # Vocabulary.
+    #--------------------------------------------------------------------------
+    def add_word(self,word,
+                 count=1):
+        """ Add a word (or count more occurrences of a known word).
+        """
+        word = word.lower()
+        with self.lock:
+            if word not in self.words:
+                for delete in self._deletes(word):
+                    self.deletes.setdefault(delete,[]).append(word)
+            self.words[word] = self.words.get(word,0)+count
+
+    def add_text(self,text,
+                 count=1):
+        """ Add all the words of a text.
+        """
+        for word in _WORD_RE.findall(text):
+            if len(word) >= self.min_length:
+                self.add_word(word,count)
+
+    def add_products(self,products,
+                     fields=None):
+        """ Add the words of products (e.g. CatalogMirror.products.values()
+        or the ingestion source).
+
+        :params:
+            - products : iterable of dict
+                the product data
+            - fields : list of str, optional (default: None)
+                The product fields to use. By default all the string (and
+                list of string) fields of the product except 'images'.
+        """
+        for data in products:
+            keys = fields if fields is not None else [key for key in data if key != 'images']
+            for key in keys:
+                value = data.get(key)
+                if isinstance(value,str):
+                    self.add_text(value)
+                elif isinstance(value,list):
+                    for v in value:
+                        if isinstance(v,str):
+                            self.add_text(v)
+
+    def add_parse_response(self,response):
+        """ Add the words of a NaturalLanguageSearch.parse response (the
+        recognized brands, colors, categories, hyponyms, ...).
+        """
+        for s in _strings(response):
+            self.add_text(s)
+
+    #--------------------------------------------------------------------------
+    # Lookup.
+    #--------------------------------------------------------------------------
+    def lookup(self,token):
+        """ The best local correction of a token.
+
+        :returns:
+            - word : str
+                the known word closest to the token (most frequent on ties),
+                None if there is none within max_edit_distance
+        """
+        token = token.lower()
+        if token in self.words:
+            return token
+
+        best,best_distance,best_count = None,self.max_edit_distance+1,0
+        seen = set()
+        for delete in self._deletes(token):
+            for word in self.deletes.get(delete,()):
+                if word in seen:
+                    continue
+                seen.add(word)
+                distance = _distance(token,word,self.max_edit_distance)
+                count = self.words[word]
+                if distance < best_distance or (distance == best_distance and count > best_count):
+                    best,best_distance,best_count = word,distance,count
+        return best
+
+    def _remote(self,tokens):
+        """ Corrections of tokens by NaturalLanguageSearch.spell_correct.
+        """
+        corrections = {}
+        with self.lock:
+            for token in tokens:
+                if token in self.cache:
+                    corrections[token] = self.cache[token]
+                    self.cache.move_to_end(token)
+        tokens = [token for token in tokens if token not in corrections]
+        if not tokens or self.nls is None:
+            return corrections
+
+        status,response = self.nls.spell_correct(' '.join(tokens))
+        if status != 200 or not isinstance(response,dict):
+            return corrections
+        text = None
+        for key in _REMOTE_KEYS:
+            if isinstance(response.get(key),str):
+                text = response[key]
+                break
+        if text is None:
+            return corrections
+        corrected = _TOKEN_RE.findall(text)
+        if len(corrected) != len(tokens):
+            # cannot align the corrections with the tokens
+            return corrections
+
+        with self.lock:
+            for token,correction in zip(tokens,corrected):
+                corrections[token] = correction
+                self.cache[token] = correction
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return corrections
+
+    def correct(self,query_text):
+        """ Correct the spelling of a query.
+
+        :returns:
+            - query_text : str
+                the corrected query (punctuation and spacing preserved)
+        """
+        corrections = {}
+        unknown = []
+        for token in _WORD_RE.findall(query_text):
+            key = token.lower()
+            if key in corrections or key in unknown:
+                continue
+            if len(key) < self.min_length or key in self.words:
+                self.stats['known'] += 1
+                continue
+            word = self.lookup(key)
+            if word is not None:
+                self.stats['local'] += 1
+                corrections[key] = word
+            else:
+                unknown.append(key)
+
+        if unknown:
+            remote = self._remote(unknown)
+            self.stats['remote'] += len(remote)
+            self.stats['unknown'] += len(unknown)-len(remote)
+            corrections.update(remote)
+
+        if not corrections:
+            return query_text
+        return _WORD_RE.sub(lambda m:corrections.get(m.group(0).lower(),m.group(0)),query_text)
+
+    #--------------------------------------------------------------------------
+    # Persistence.
+    #--------------------------------------------------------------------------
+    def save(self,filename=None):
+        """ Save the vocabulary (gzipped json, word -> count).
+
+        :params:
+            - filename : str, optional (default: None)
+                Defaults to the filename the corrector was created with.
+        """
+        filename = filename or self.filename
+
+        tmp_filename = '%s.tmp'%(filename)
+        with self.lock:
+            with gzip.open(tmp_filename,'wt') as f:
+                json.dump(self.words,f,separators=(',',':'))
+        os.replace(tmp_filename,filename)
+
+    def load(self,filename=None):
+        """ Load the vocabulary and rebuild the deletion index.
+
+        :params:
+            - filename : str, optional (default: None)
+                Defaults to the filename the corrector was created with.
+        """
+        filename = filename or self.filename
+
+        with gzip.open(filename,'rt') as f:
+            words = json.load(f)
+        with self.lock:
+            self.words = {}
+            self.deletes = {}
+        for word,count in words.items():
+            self.add_word(word,count)
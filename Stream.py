@@ -0,0 +1,170 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Incremental parsing of large responses.
+Yields the items of the result list of a response (e.g. response['products'])
+one by one as the bytes arrive, instead of buffering and decoding the whole
+response with response.json().
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["StreamError","iter_results"]
+
+import re
+import json
+
+# the bytes that change the scanner state
+_SPECIAL_RE = re.compile(br'["\\{}\[\]:,]')
+
+class StreamError(RuntimeError):
+    """ The api returned an error for a streamed request.
+    """
+    def __init__(self,status_code,response):
+        RuntimeError.__init__(self,'%s %s'%(status_code,response))
+        self.status_code = status_code
+        self.response = response
+
+class _ArrayScanner():
+    """ Finds the items (objects or arrays) of one array of the top level
+    json object, across chunks. Scalar items are skipped.
+    """
+    def __init__(self,key=None):
+        # the top level key of the array (None for the first array)
+        self.key = key
+        self.depth = 0
+        self.in_string = False
+        # bytes to skip at the start of the next chunk (escape)
+        self.skip = 0
+        self.in_array = False
+        self.finished = False
+        # top level key/value being read, and the current item
+        self.key_start = None
+        self.key_buffer = bytearray()
+        self.last_key = None
+        self.item_start = None
+        self.item_buffer = bytearray()
+
+    def feed(self,chunk):
+        """ Scan a chunk.
+
+        :returns:
+            - items : list of bytes
+                the raw json of the items completed in this chunk
+        """
+        items = []
+        skip_to = self.skip
+        self.skip = 0
+
+        for match in _SPECIAL_RE.finditer(chunk):
+            pos = match.start()
+            if pos < skip_to:
+                continue
+            c = chunk[pos:pos+1]
+
+            if self.in_string:
+                if c == b'\\':
+                    skip_to = pos+2
+                elif c == b'"':
+                    self.in_string = False
+                continue
+
+            if c == b'"':
+                self.in_string = True
+            elif c in (b'{',b'['):
+                if self.in_array and self.depth == 2:
+                    self.item_start = pos
+                    self.item_buffer = bytearray()
+                self.depth += 1
+                if self.depth == 1:
+                    self.key_start = pos+1
+                elif self.depth == 2:
+                    if (c == b'[' and not self.in_array and
+                        (self.key is None or self.last_key == self.key)):
+                        self.in_array = True
+                    self.key_start = None
+            elif c in (b'}',b']'):
+                self.depth -= 1
+                if self.in_array and self.depth == 2 and self.item_start is not None:
+                    self.item_buffer.extend(chunk[self.item_start:pos+1])
+                    items.append(bytes(self.item_buffer))
+                    self.item_start = None
+                elif self.in_array and self.depth == 1:
+                    self.in_array = False
+                    self.finished = True
+                    return items
+            elif c == b':' and self.depth == 1:
+                if self.key_start is not None:
+                    self.key_buffer.extend(chunk[self.key_start:pos])
+                    try:
+                        self.last_key = json.loads(bytes(self.key_buffer).decode('utf-8'))
+                    except ValueError:
+                        self.last_key = None
+                self.key_buffer = bytearray()
+                self.key_start = None
+            elif c == b',' and self.depth == 1:
+                self.key_buffer = bytearray()
+                self.key_start = pos+1
+
+        if skip_to > len(chunk):
+            self.skip = skip_to-len(chunk)
+
+        # carry the partial key / item over to the next chunk
+        if self.key_start is not None:
+            self.key_buffer.extend(chunk[self.key_start:])
+            self.key_start = 0
+        if self.item_start is not None:
+            self.item_buffer.extend(chunk[self.item_start:])
+            self.item_start = 0
+
+        return items
+
+def _project(item,fields):
+    if fields is None or not isinstance(item,dict):
+        return item
+    return dict((field,item[field]) for field in fields if field in item)
+
+def iter_results(response,
+                 key=None,
+                 fields=None,
+                 chunk_size=65536):
+    """ Yield the items of the result list of a streamed response.
+
+    :params:
+        - response : requests.Response
+            a response requested with stream=True
+        - key : str, optional (default: None)
+            The top level key of the result list (e.g. 'products'). By
+            default the first top level list.
+        - fields : list of str, optional (default: None)
+            If specified only these fields of every item are returned.
+        - chunk_size : int, optional (default: 65536)
+
+    Raises StreamError if the response status is an error. Stopping the
+    iteration early closes the connection.
+    """
+    try:
+        if response.status_code >= 300:
+            try:
+                content = response.json()
+            except ValueError:
+                content = response.text
+            raise StreamError(response.status_code,content)
+
+        scanner = _ArrayScanner(key)
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            for raw in scanner.feed(chunk):
+                yield _project(json.loads(raw.decode('utf-8')),fields)
+            if scanner.finished:
+                break
+    finally:
+        response.close()
@@ -0,0 +1,402 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" The HTTP request path shared by all the API clients.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["Transport"]
+
+import json
+import gzip
+import time
+import threading
+import requests
+
+from .Backends import RequestsBackend
+from .LoadBalancer import LoadBalancer
+from .Deadline import Deadline, DeadlineExceeded
+from .PriorityScheduler import current_priority, default_priority
+
+try:
+    from urllib.parse import urlparse
+except ImportError:
+    from urlparse import urlparse
+
+def endpoint_class(method,url):
+    """ The endpoint class of a request, used to configure rate limits.
+
+    :returns:
+        - endpoint_class : str
+            'visual_search', 'natural_language_search', 'complete_the_look',
+            'catalog_write' or 'catalog_read'
+    """
+    path = urlparse(url).path
+
+    if '/visual_search' in path or '/visual_browse' in path:
+        return 'visual_search'
+    if '/natural_language_search' in path:
+        return 'natural_language_search'
+    if '/complete_the_look' in path:
+        return 'complete_the_look'
+    if method.upper() != 'GET':
+        return 'catalog_write'
+    return 'catalog_read'
+
+class Transport():
+    """ The HTTP request path shared by all the API clients.
+
+    One transport can be shared by several clients (and threads) so that
+    they share the connection pool and the rate limits.
+
+        transport = Transport(rate_limiter=RateLimiter(rates={'visual_search':20}))
+        catalog = Catalog(api_gateway_url,api_key,transport=transport)
+        vs = VisualSearch(api_gateway_url,api_key,transport=transport)
+    """
+    def __init__(self,
+                 rate_limiter=None,
+                 pool_maxsize=32,
+                 compress_threshold=None,
+                 compress_level=6,
+                 aliases=None,
+                 load_balancer=None,
+                 scheduler=None,
+                 backend=None):
+        """ Initialization.
+
+        :params:
+            - rate_limiter : RateLimiter, optional (default: None)
+                If specified every request first acquires a token for its
+                endpoint class and api key.
+            - pool_maxsize : int, optional (default: 32)
+                The maximum number of pooled connections per host.
+            - compress_threshold : int, optional (default: None)
+                If specified json request bodies of at least this many bytes
+                are sent gzip compressed (Content-Encoding: gzip). If the
+                gateway rejects a compressed body (415, or a 400 about the
+                Content-Encoding) the request is sent again uncompressed
+                and, if that succeeds, compression is turned off for that
+                host. Responses are always negotiated with
+                Accept-Encoding: gzip.
+            - compress_level : int, optional (default: 6)
+                The gzip compression level.
+            - aliases : CatalogAliases, optional (default: None)
+                If specified the catalog name in every request url is
+                resolved through the aliases.
+            - load_balancer : LoadBalancer, optional (default: None)
+                If specified the requests to its gateways are balanced across
+                them, see balance(). Other urls are sent directly.
+            - scheduler : PriorityScheduler, optional (default: None)
+                If specified every request first waits for an in-flight slot
+                of its priority class (interactive requests are not crowded
+                out by bulk jobs).
+            - backend : optional (default: None)
+                The HTTP backend (see Backends), e.g. HTTPXBackend() for
+                HTTP/2. Defaults to RequestsBackend(pool_maxsize).
+        """
+
+        self.rate_limiter = rate_limiter
+        self.compress_threshold = compress_threshold
+        self.compress_level = compress_level
+        self.aliases = aliases
+        self.load_balancer = load_balancer
+        self.scheduler = scheduler
+        self.listeners = []
+
+        # hosts that do not accept compressed request bodies
+        self.no_compression_hosts = set()
+
+        self.lock = threading.Lock()
+        self.compression_stats = {}
+        self.compression_stats['requests_compressed'] = 0
+        self.compression_stats['request_bytes'] = 0
+        self.compression_stats['request_bytes_sent'] = 0
+        self.compression_stats['responses_compressed'] = 0
+        self.compression_stats['response_bytes'] = 0
+        self.compression_stats['response_bytes_received'] = 0
+        self.compression_stats['fallbacks'] = 0
+
+        self.backend = backend if backend is not None else RequestsBackend(pool_maxsize=pool_maxsize)
+        # the requests session, None with other backends
+        self.session = getattr(self.backend,'session',None)
+
+    def request(self,method,url,**kwargs):
+        """ Send a request.
+
+        :params:
+            - method : str
+                'GET', 'POST', 'PUT', 'DELETE' or 'HEAD'
+            - url : str
+                the full url
+            - kwargs
+                passed to the backend (headers, params, json, data, ...)
+                deadline : Deadline, optional (default: None)
+                    The time budget of the request. Defaults to the current
+                    deadline of the thread (see Deadline).
+                priority : str, optional (default: None)
+                    The priority class (with a scheduler). Defaults to the
+                    current priority of the thread (see priority) or to
+                    default_priority(method,url).
+
+        :returns:
+            - response : requests.Response (or the backend response)
+
+        Raises DeadlineExceeded if the deadline is spent before or while
+        the request is sent (or waiting for the rate limiter), Overloaded if the request is shed by the
+        scheduler.
+        """
+        deadline = kwargs.pop('deadline',None) or Deadline.current()
+        name = kwargs.pop('priority',None)
+
+        if self.aliases is not None:
+            url = self.aliases.resolve_url(url)
+
+        if deadline is not None:
+            deadline.check('%s %s'%(method,url))
+
+        if self.scheduler is None:
+            return self._request(method,url,kwargs,deadline)
+
+        name = name or current_priority() or default_priority(method,url)
+        with self.scheduler.slot(name,deadline=deadline):
+            return self._request(method,url,kwargs,deadline)
+
+    def _request(self,method,url,kwargs,deadline):
+        if self.rate_limiter is not None:
+            headers = kwargs.get('headers') or {}
+            name = endpoint_class(method,url)
+            if not self.rate_limiter.acquire(name,
+                                             api_key=headers.get('X-Api-Key'),
+                                             timeout=deadline.remaining() if deadline is not None else None):
+                raise DeadlineExceeded('deadline of %.3fs exceeded waiting for the %s rate limit'%(deadline.timeout,
+                                                                                                  name))
+
+        start = time.time()
+        try:
+            if self.load_balancer is not None and self.load_balancer.owns(url):
+                response = self._balanced_request(method,url,kwargs,deadline)
+            else:
+                if deadline is not None:
+                    deadline.check('%s %s'%(method,url))
+                    kwargs['timeout'] = deadline.request_timeout(kwargs.get('timeout'))
+                response = self._send(method,url,kwargs)
+        except requests.exceptions.Timeout as e:
+            if deadline is not None and deadline.expired():
+                e = DeadlineExceeded('deadline of %.3fs exceeded during %s %s'%(deadline.timeout,
+                                                                                method,url))
+            self._notify(method,url,kwargs,None,e,start)
+            raise e
+        except Exception as e:
+            self._notify(method,url,kwargs,None,e,start)
+            raise
+
+        self._notify(method,url,kwargs,response,None,start)
+        return response
+
+    def add_listener(self,listener):
+        """ Call listener(event) after every request. The event is a dict
+        with 'method', 'url', 'kwargs', 'response' (None on error), 'error'
+        (the exception or None), 'start' (time.time()) and 'elapsed'
+        (seconds). Exceptions raised by listeners are ignored.
+        """
+        with self.lock:
+            self.listeners = self.listeners+[listener]
+
+    def remove_listener(self,listener):
+        with self.lock:
+            self.listeners = [l for l in self.listeners if l is not listener]
+
+    def _notify(self,method,url,kwargs,response,error,start):
+        if not self.listeners:
+            return
+        event = {}
+        event['method'] = method
+        event['url'] = url
+        event['kwargs'] = kwargs
+        event['response'] = response
+        event['error'] = error
+        event['start'] = start
+        event['elapsed'] = time.time()-start
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception:
+                pass
+
+    def _send(self,method,url,kwargs):
+        host = urlparse(url).netloc
+        if (self.compress_threshold is not None and
+            kwargs.get('json') is not None and
+            host not in self.no_compression_hosts):
+            body = json.dumps(kwargs['json']).encode('utf-8')
+            if len(body) >= self.compress_threshold:
+                return self._compressed_request(method,url,host,body,kwargs)
+
+        response = self.backend.request(method,url,**kwargs)
+        self._response_stats(response,kwargs.get('stream',False))
+        return response
+
+    def _balanced_request(self,method,url,kwargs,deadline=None):
+        """ Send the request to the best gateway, fail over to the next one
+        on connection errors and 502/503/504 (unless the body is a stream
+        that cannot be sent again) while the deadline allows.
+        """
+        timeout = kwargs.get('timeout')
+        data = kwargs.get('data')
+        retryable = not hasattr(data,'read')
+
+        tried = []
+        while True:
+            gateway = self.load_balancer.choose(exclude=tried)
+            tried.append(gateway)
+            last = not retryable or len(tried) >= len(self.load_balancer.gateways)
+
+            if deadline is not None:
+                deadline.check('%s %s'%(method,url))
+                kwargs['timeout'] = deadline.request_timeout(timeout)
+
+            start = time.time()
+            try:
+                response = self._send(method,self.load_balancer.rewrite(url,gateway),kwargs)
+            except (requests.exceptions.ConnectionError,requests.exceptions.Timeout):
+                self.load_balancer.report(gateway,time.time()-start,False)
+                if last:
+                    raise
+                continue
+
+            ok = response.status_code not in (502,503,504)
+            self.load_balancer.report(gateway,time.time()-start,ok)
+            if ok or last:
+                return response
+
+    def balance(self,gateways,**kwargs):
+        """ Balance the requests across several api gateway urls. The clients
+        call this when they are given a list of api gateway urls.
+
+        :params:
+            - gateways : list of str
+                the api gateway urls
+            - kwargs
+                passed to LoadBalancer (probe_path, probe_headers, ...)
+
+        :returns:
+            - load_balancer : LoadBalancer
+        """
+        with self.lock:
+            if self.load_balancer is None:
+                self.load_balancer = LoadBalancer(gateways,**kwargs)
+            else:
+                self.load_balancer.add(gateways)
+        return self.load_balancer
+
+    def close(self):
+        """ Stop the load balancer health probes and close the backend.
+        """
+        if self.load_balancer is not None:
+            self.load_balancer.close()
+        self.backend.close()
+
+    def _compressed_request(self,method,url,host,body,kwargs):
+        """ Send the json body gzip compressed, fall back to an uncompressed
+        body if the gateway rejects it.
+        """
+        compressed = gzip.compress(body,self.compress_level)
+
+        compressed_kwargs = dict(kwargs)
+        del compressed_kwargs['json']
+        compressed_kwargs['data'] = compressed
+        headers = dict(kwargs.get('headers') or {})
+        headers['Content-Type'] = 'application/json'
+        headers['Content-Encoding'] = 'gzip'
+        compressed_kwargs['headers'] = headers
+
+        response = self.backend.request(method,url,**compressed_kwargs)
+
+        if self._rejects_compression(response):
+            fallback = self.backend.request(method,url,**kwargs)
+            with self.lock:
+                self.compression_stats['fallbacks'] += 1
+                if fallback.status_code < 400:
+                    self.no_compression_hosts.add(host)
+            self._response_stats(fallback,kwargs.get('stream',False))
+            return fallback
+
+        with self.lock:
+            self.compression_stats['requests_compressed'] += 1
+            self.compression_stats['request_bytes'] += len(body)
+            self.compression_stats['request_bytes_sent'] += len(compressed)
+        self._response_stats(response,kwargs.get('stream',False))
+        return response
+
+    @staticmethod
+    def _rejects_compression(response):
+        """ True if the gateway rejected the compressed body (415, or a 400
+        about the Content-Encoding) rather than its content.
+        """
+        if response.status_code == 415:
+            return True
+        if response.status_code == 400:
+            try:
+                return 'content-encoding' in response.text.lower()
+            except Exception:
+                return False
+        return False
+
+    def _response_stats(self,response,stream):
+        encoding = response.headers.get('Content-Encoding','')
+        length = response.headers.get('Content-Length')
+        if stream or length is None or encoding not in ('gzip','deflate'):
+            return
+        with self.lock:
+            self.compression_stats['responses_compressed'] += 1
+            self.compression_stats['response_bytes_received'] += int(length)
+            self.compression_stats['response_bytes'] += len(response.content)
+
+    def resolve_catalog(self,catalog_name):
+        """ The catalog name after alias resolution.
+        """
+        if self.aliases is None:
+            return catalog_name
+        return self.aliases.resolve(catalog_name)
+
+    def compression_ratio(self):
+        """ The compression ratios so far.
+
+        :returns:
+            - request_ratio : float
+                uncompressed/sent bytes of the compressed request bodies
+            - response_ratio : float
+                decoded/received bytes of the compressed responses
+        """
+        with self.lock:
+            stats = self.compression_stats
+            request_ratio = (float(stats['request_bytes'])/stats['request_bytes_sent']
+                             if stats['request_bytes_sent'] else 1.0)
+            response_ratio = (float(stats['response_bytes'])/stats['response_bytes_received']
+                              if stats['response_bytes_received'] else 1.0)
+        return request_ratio,response_ratio
+
+    def get(self,url,**kwargs):
+        return self.request('GET',url,**kwargs)
+
+    def post(self,url,**kwargs):
+        return self.request('POST',url,**kwargs)
+
+    def put(self,url,**kwargs):
+        return self.request('PUT',url,**kwargs)
+
+    def delete(self,url,**kwargs):
+        return self.request('DELETE',url,**kwargs)
+
+    def head(self,url,**kwargs):
+        return self.request('HEAD',url,**kwargs)
@@ -22,12 +22,20 @@ __all__ = ["VisualSearch"]
 
 import os
 import json
-import requests
+import time
+from .Transport import Transport
+from .LoadBalancer import gateway_url
+from .Stream import iter_results
 try:
     from urllib.parse import urljoin
 except ImportError:
     from urlparse import urljoin
 
+# The index_status 'status' values of a running / completed / failed index build.
+INDEX_RUNNING_STATES = ('queued','in_progress')
+INDEX_READY_STATES = ('completed',)
+INDEX_FAILED_STATES = ('failed',)
+
 class VisualSearch():
     """ Visual Search APIs.
     """
@@ -35,22 +43,40 @@ class VisualSearch():
                  api_gateway_url,
                  api_key,
                  version='v1',
-                 data_collection_opt_out=False):
+                 data_collection_opt_out=False,
+                 transport=None):
         """ Initialization.
 
         :params:
-            - api_gateway_url : str
+            - api_gateway_url : str or list of str
             - api_key : str    
             - data_collection_opt_out : boolean, optional (default: False)
+            - transport : Transport, optional (default: None)
         """
 
         self.api_gateway_url = api_gateway_url
         self.version = version
+        self.transport = transport if transport is not None else Transport()
 
         self.headers = {}
         self.headers['X-Api-Key'] = api_key
         self.headers['X-Data-Collection-Opt-Out'] = str(data_collection_opt_out).lower()
 
+        if isinstance(api_gateway_url,(list,tuple)):
+            self.api_gateway_url = gateway_url(api_gateway_url[0])
+            self.transport.balance(api_gateway_url,
+                                   probe_path='%s/fashion_quote'%(self.version),
+                                   probe_headers=self.headers)
+
+    #--------------------------------------------------------------------------
+    # Close.
+    #--------------------------------------------------------------------------
+    def close(self):
+        """ Close the transport (shared with the other clients using it):
+        stops the load balancer health probes and closes the connections.
+        """
+        self.transport.close()
+
     #--------------------------------------------------------------------------
     # Get a random fashion quote.  
     # GET /v1/fashion_quote
@@ -64,9 +90,9 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)        
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)        
 
         return response.status_code,response.json()
 
@@ -117,9 +143,9 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.post(url,
-                                 headers=self.headers,
-                                 params=params)
+        response = self.transport.post(url,
+                                       headers=self.headers,
+                                       params=params)
 
         return response.status_code,response.json()
 
@@ -141,9 +167,9 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()
 
@@ -165,12 +191,58 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.delete(url,
-                                   headers=self.headers,
-                                   params=params)
+        response = self.transport.delete(url,
+                                         headers=self.headers,
+                                         params=params)
 
         return response.status_code,response.json()
 
+    #--------------------------------------------------------------------------
+    # Wait for the visual search index build to complete.
+    # GET  /v1/catalog/{catalog_name}/visual_search_index (polled)
+    #--------------------------------------------------------------------------
+    def index_wait(self,catalog_name,
+                   poll_interval=10.0,
+                   timeout=3600.0):
+        """ Wait for the visual search index build to complete.
+
+        :params:
+            - catalog_name : str
+                the catalog name
+            - poll_interval : float, optional (default: 10.0)
+                Seconds between index_status calls.
+            - timeout : float, optional (default: 3600.0)
+                Raises TimeoutError after this many seconds.
+
+        :returns:
+            - status_code : int
+                the status code of the last index_status response
+            - response : json
+                the last index_status response
+
+        Raises RuntimeError if index_status fails (4xx/5xx), the index build
+        failed or the status is not one of the documented values.
+        """
+        start = time.time()
+        while True:
+            status,response = self.index_status(catalog_name=catalog_name)
+            if status >= 400:
+                raise RuntimeError('index_status failed for %s: %d %s'%(catalog_name,
+                                                                       status,response))
+            state = response.get('status') if isinstance(response,dict) else None
+            if state in INDEX_READY_STATES:
+                return status,response
+            if state in INDEX_FAILED_STATES:
+                raise RuntimeError('Visual search index build failed for %s: %s'%(catalog_name,
+                                                                                  response))
+            if state not in INDEX_RUNNING_STATES:
+                raise RuntimeError('Unexpected index_status for %s: %s'%(catalog_name,
+                                                                         response))
+            if timeout is not None and time.time()-start+poll_interval > timeout:
+                raise TimeoutError('Visual search index for %s not ready after %.0fs'%(catalog_name,
+                                                                                       timeout))
+            time.sleep(poll_interval)
+
     #--------------------------------------------------------------------------
     # Visual Browse
     #
@@ -241,12 +313,60 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()
 
+    #--------------------------------------------------------------------------
+    # Visual Browse, streamed
+    # GET /v1/catalog/{catalog_name}/visual_search/{id}/{image_id}
+    #--------------------------------------------------------------------------
+    def browse_iter(self,catalog_name,id,image_id,
+                    max_number_of_results=12,
+                    per_category_index=False,
+                    category=None,
+                    use_cache=True,
+                    sort_option='visual_similarity',
+                    unique_products=False,
+                    key=None,
+                    fields=None):
+        """ Visual browse, yielding the results one by one as the response is
+        received. Stop iterating to drop the rest of the response.
+
+        :params:
+            - see browse
+            - key : str, optional (default: None)
+                The top level key of the result list. By default the first
+                list of the response.
+            - fields : list of str, optional (default: None)
+                If specified only these fields of every result are returned.
+        """
+
+        params = {}
+        params['max_number_of_results'] = max_number_of_results
+        params['per_category_index'] = str(per_category_index).lower()
+        params['use_cache'] = str(use_cache).lower()
+        params['unique_products'] = str(unique_products).lower()
+        params['sort_option'] = sort_option
+        if category is not None:
+            params['category'] = ','.join(category)
+
+        api_endpoint = '%s/catalog/%s/visual_browse/%s/%s'%(self.version,
+                                                             catalog_name,
+                                                             id,
+                                                             image_id)
+
+        url = urljoin(self.api_gateway_url,api_endpoint)
+
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params,
+                                      stream=True)
+
+        return iter_results(response,key=key,fields=fields)
+
     #--------------------------------------------------------------------------
     # Visual Search
     #
@@ -338,10 +458,10 @@ class VisualSearch():
         headers = dict(self.headers)
         headers['Content-Type'] = 'image/jpeg'
 
-        response = requests.post(url,
-                                 headers=headers,
-                                 params=params,
-                                 data=open(image_filename,'rb'))
+        response = self.transport.post(url,
+                                       headers=headers,
+                                       params=params,
+                                       data=open(image_filename,'rb'))
 
         return response.status_code,response.json()
 
@@ -364,9 +484,9 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()
 
@@ -389,9 +509,9 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()
 
@@ -436,9 +556,9 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.post(url,
-                                 headers=self.headers,
-                                 params=params)
+        response = self.transport.post(url,
+                                       headers=self.headers,
+                                       params=params)
 
         return response.status_code,response.json()
 
@@ -460,9 +580,9 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.get(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.get(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()
 
@@ -484,8 +604,8 @@ class VisualSearch():
 
         url = urljoin(self.api_gateway_url,api_endpoint)
 
-        response = requests.delete(url,
-                                headers=self.headers,
-                                params=params)
+        response = self.transport.delete(url,
+                                      headers=self.headers,
+                                      params=params)
 
         return response.status_code,response.json()       
\ No newline at end of file
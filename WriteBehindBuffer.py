@@ -0,0 +1,206 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" Write-behind buffer for Catalog.update_product.
+Successive patches to the same product are merged and sent once.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+__all__ = ["WriteBehindBuffer"]
+
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+class WriteBehindBuffer():
+    """ Write-behind buffer for Catalog.update_product.
+
+    Usage:
+        with WriteBehindBuffer(catalog,window=5.0) as buffer:
+            buffer.update_product(catalog_name,id,{'out_of_stock':'yes'})
+    """
+    def __init__(self,catalog,
+                 window=1.0,
+                 max_workers=4,
+                 max_pending=10000,
+                 on_error=None):
+        """ Initialization.
+
+        :params:
+            - catalog : Catalog
+                The catalog client.
+            - window : float, optional (default: 1.0)
+                Seconds a patch is held (from the first patch to a product)
+                so that later patches to the same product are merged into it.
+            - max_workers : int, optional (default: 4)
+                The number of concurrent update_product requests.
+            - max_pending : int, optional (default: 10000)
+                The maximum number of buffered and in-flight products. When
+                the buffer is full update_product flushes and blocks until
+                there is space (until the gateway catches up).
+            - on_error : callable, optional (default: None)
+                Called as on_error(catalog_name,id,data,status_code,response)
+                for every failed update. An exception is reported with
+                status_code None and the exception as the response.
+        """
+
+        self.catalog = catalog
+        self.window = window
+        self.max_pending = max_pending
+        self.on_error = on_error
+
+        # (catalog_name,id) -> [time of first patch,data,download_images]
+        self.pending = OrderedDict()
+        # keys with an update in flight, not sent again until it completes
+        self.in_flight = set()
+        self.flush_requested = False
+        self.closed = False
+
+        self.stats = {}
+        self.stats['patches'] = 0
+        self.stats['requests'] = 0
+        self.stats['errors'] = 0
+
+        self.condition = threading.Condition()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.thread = threading.Thread(target=self._flusher)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
+
+    #--------------------------------------------------------------------------
+    # Buffer a product update.
+    #--------------------------------------------------------------------------
+    def update_product(self,catalog_name,id,data,
+                       download_images=False):
+        """ Buffer a product update (same arguments as Catalog.update_product).
+        The fields are merged into any pending update for the same product.
+
+        :params:
+            - catalog_name : str
+                the catalog name
+            - id : str
+                the product id
+            - data : dict
+                the product data
+            - download_images : boolean, optional(default: False)
+                Set this to True if the images need to be downloaded. If any
+                of the merged patches sets it the update is sent with True.
+        """
+        key = (catalog_name,id)
+
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('The write-behind buffer is closed.')
+
+            # updates in flight (sent or queued in the executor) count too
+            while key not in self.pending and len(self.pending)+len(self.in_flight) >= self.max_pending:
+                self.flush_requested = True
+                self.condition.notify_all()
+                self.condition.wait()
+
+            self.stats['patches'] += 1
+            if key in self.pending:
+                entry = self.pending[key]
+                entry[1].update(data)
+                entry[2] = entry[2] or download_images
+            else:
+                self.pending[key] = [time.time(),dict(data),download_images]
+                self.condition.notify_all()
+
+    #--------------------------------------------------------------------------
+    # Flush.
+    #--------------------------------------------------------------------------
+    def flush(self):
+        """ Send all the buffered updates now and wait for them to complete.
+        """
+        with self.condition:
+            self.flush_requested = True
+            self.condition.notify_all()
+            while self.pending or self.in_flight:
+                self.condition.wait()
+            self.flush_requested = False
+
+    def close(self):
+        """ Flush and stop the background thread.
+        """
+        if self.closed:
+            return
+        self.flush()
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
+        self.executor.shutdown()
+
+    def _flusher(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.closed:
+                        return
+                    now = time.time()
+                    due = [key for key,entry in self.pending.items()
+                           if key not in self.in_flight and
+                           (self.flush_requested or now-entry[0] >= self.window)]
+                    if due:
+                        break
+                    if not self.pending:
+                        self.flush_requested = False
+                    # keys in flight are woken up by _send
+                    waiting = [entry[0] for key,entry in self.pending.items()
+                               if key not in self.in_flight]
+                    timeout = None
+                    if waiting:
+                        timeout = max(min(waiting)+self.window-now,0.001)
+                    self.condition.wait(timeout)
+
+                batch = []
+                for key in due:
+                    entry = self.pending.pop(key)
+                    self.in_flight.add(key)
+                    batch.append((key,entry[1],entry[2]))
+                self.condition.notify_all()
+
+            for key,data,download_images in batch:
+                self.executor.submit(self._send,key,data,download_images)
+
+    def _send(self,key,data,download_images):
+        catalog_name,id = key
+        try:
+            status,response = self.catalog.update_product(catalog_name=catalog_name,
+                                                          id=id,
+                                                          data=data,
+                                                          download_images=download_images)
+        except Exception as e:
+            status,response = None,e
+
+        failed = status is None or status >= 300
+        if failed and self.on_error is not None:
+            try:
+                self.on_error(catalog_name,id,data,status,response)
+            except Exception:
+                pass
+
+        with self.condition:
+            self.stats['requests'] += 1
+            if failed:
+                self.stats['errors'] += 1
+            self.in_flight.discard(key)
+            self.condition.notify_all()
@@ -1,3 +1,29 @@
 from .Catalog import *
 from .VisualSearch import *
-from .NaturalLanguageSearch import *
\ No newline at end of file
+from .NaturalLanguageSearch import *
+from .CompleteTheLook import *
+from .CatalogMirror import *
+from .Bulk import *
+from .WriteBehindBuffer import *
+from .Transport import *
+from .Backends import *
+from .RateLimiter import *
+from .Preflight import *
+from .NeighborTable import *
+from .CatalogAliases import *
+from .ShardedCatalog import *
+from .LoadBalancer import *
+from .Histogram import *
+from .Recorder import *
+from .Batch import *
+from .Stream import *
+from .Deadline import *
+from .ProductPatcher import *
+from .Hydrator import *
+from .SpellCorrector import *
+from .Autocomplete import *
+from .LoadGenerator import *
+from .PriorityScheduler import *
+from .AdaptiveLimiter import *
+from .NearDuplicates import *
+from .IndexScheduler import *
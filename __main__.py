@@ -0,0 +1,83 @@
+#
+# Licensed Materials - Property of IBM
+#
+# AI For Fashion
+#
+# (C) Copyright IBM Corp. 2018 All Rights Reserved
+#
+# US Government Users Restricted Rights - Use, duplication or
+# disclosure restricted by GSA ADP Schedule Contract with
+# IBM Corp.
+#
+
+""" cfapisdk command line.
+
+    python -m cfapisdk batch --api-gateway-url URL --api-key KEY < requests.jsonl > results.jsonl
+    python -m cfapisdk replay traffic.jsonl.gz URL KEY --speed 4
+    python -m cfapisdk load mix.json URL KEY --mode open --rate 50 --ramp-up 10
+
+With batch the api gateway url and api key default to the
+CFAPISDK_API_GATEWAY_URL and CFAPISDK_API_KEY environment variables, replay
+and load take them as arguments.
+"""
+
+__copyright__   = "IBM India Pvt. Ltd."
+
+import os
+import sys
+import argparse
+
+from .Batch import Batch
+from .Recorder import main as replay
+from .LoadGenerator import main as load
+
+def batch(argv):
+    parser = argparse.ArgumentParser(prog='cfapisdk batch',
+                                     description='Execute json lines requests read on stdin '
+                                                 '(text_search, natural_language_search, parse, '
+                                                 'spell_correct, browse, search) and write json '
+                                                 'lines results to stdout.')
+    parser.add_argument('--api-gateway-url',action='append',
+                        help='the api gateway url (repeat to balance across several)')
+    parser.add_argument('--api-key',default=os.environ.get('CFAPISDK_API_KEY'),
+                        help='the api key')
+    parser.add_argument('--version',default='v1',help='the api version (default v1)')
+    parser.add_argument('--concurrency',type=int,default=8,
+                        help='maximum requests in flight (default 8)')
+    parser.add_argument('--rate',type=float,default=None,
+                        help='maximum requests per second')
+    parser.add_argument('--unordered',action='store_true',
+                        help='write results as they complete instead of in input order')
+    args = parser.parse_args(argv)
+
+    api_gateway_url = args.api_gateway_url or [os.environ.get('CFAPISDK_API_GATEWAY_URL')]
+    if api_gateway_url[0] is None or args.api_key is None:
+        parser.error('--api-gateway-url and --api-key (or CFAPISDK_API_GATEWAY_URL and '
+                     'CFAPISDK_API_KEY) are required')
+    if len(api_gateway_url) == 1:
+        api_gateway_url = api_gateway_url[0]
+
+    runner = Batch(api_gateway_url,args.api_key,
+                   version=args.version,
+                   concurrency=args.concurrency,
+                   rate=args.rate,
+                   ordered=not args.unordered)
+    summary = runner.run(sys.stdin,sys.stdout)
+    sys.stderr.write('%d requests, %d errors\n'%(summary['requests'],summary['errors']))
+    return 1 if summary['errors'] else 0
+
+COMMANDS = {
+    'batch':batch,
+    'replay':replay,
+    'load':load,
+}
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        sys.stderr.write('usage: python -m cfapisdk {%s} ...\n'%(','.join(sorted(COMMANDS))))
+        return 2
+    return COMMANDS[argv[0]](argv[1:]) or 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+""" Benchmark of the transport backends: the same mix of concurrent browse
+and search calls sent with requests (HTTP/1.1) and httpx (HTTP/2, threads and
+asyncio). Needs httpx (pip install httpx[http2]).
+"""
+
+import time
+import asyncio
+from pprint import pprint
+from props import *
+
+from cfapisdk import (VisualSearch, Transport, LoadGenerator,
+                      Histogram, RequestsBackend, HTTPXBackend, AsyncHTTPXBackend)
+
+# Replace with a product of your catalog.
+id = 'SKLTS16AMCWSH8SH20'
+image_id = '1'
+
+concurrency = 200
+duration = 30
+
+mix = [{'op':'browse','catalog_name':props['catalog_name'],'id':id,'image_id':image_id,'weight':5},
+       {'op':'natural_language_search','catalog_name':props['catalog_name'],'query_text':'red tees','weight':3}]
+
+#------------------------------------------------------------------------------
+# THREADS: requests vs httpx
+#------------------------------------------------------------------------------
+backends = {}
+backends['requests'] = RequestsBackend(pool_maxsize=concurrency)
+backends['httpx_http2'] = HTTPXBackend(http2=True,max_connections=concurrency)
+
+reports = {}
+for name,backend in backends.items():
+    generator = LoadGenerator(props['api_gateway_url'],props['api_key'],mix,
+                              version=props['api_version'],
+                              max_workers=concurrency,
+                              transport=Transport(backend=backend))
+    report = generator.run(mode='closed',concurrency=concurrency,duration=duration)
+    reports[name] = {'throughput':report['throughput'],
+                     'errors':report['errors'],
+                     'latency':report['latency']}
+    backend.close()
+
+#------------------------------------------------------------------------------
+# ASYNCIO: httpx
+#------------------------------------------------------------------------------
+# Record the browse request the sdk sends and send it concurrently.
+transport = Transport()
+events = []
+transport.add_listener(events.append)
+vs = VisualSearch(props['api_gateway_url'],props['api_key'],
+                  version=props['api_version'],
+                  transport=transport)
+vs.browse(catalog_name=props['catalog_name'],id=id,image_id=image_id)
+url,kwargs = events[0]['url'],events[0]['kwargs']
+
+async def user(backend,histogram,end,counts):
+    while time.time() < end:
+        start = time.time()
+        response = await backend.request('GET',url,headers=kwargs['headers'],params=kwargs['params'])
+        histogram.record(time.time()-start)
+        counts['requests'] += 1
+        if response.status_code >= 400:
+            counts['errors'] += 1
+
+async def run():
+    backend = AsyncHTTPXBackend(http2=True,max_connections=concurrency)
+    histogram = Histogram()
+    counts = {'requests':0,'errors':0}
+    start = time.time()
+    await asyncio.gather(*[user(backend,histogram,start+duration,counts) for _ in range(concurrency)])
+    await backend.close()
+    elapsed = time.time()-start
+    return {'throughput':counts['requests']/elapsed,
+            'errors':counts['errors'],
+            'latency':histogram.summary()}
+
+reports['httpx_http2_asyncio (browse only)'] = asyncio.run(run())
+
+pprint(reports)
@@ -0,0 +1,47 @@
+""" Example showing how to use Complete The Look APIs via python SDK.
+"""
+
+from pprint import pprint
+from props import *
+
+from cfapisdk import Catalog, CompleteTheLook
+
+#------------------------------------------------------------------------------
+# Initialize. 
+#------------------------------------------------------------------------------
+
+catalog = Catalog(api_gateway_url=props['api_gateway_url'],
+                  api_key=props['api_key'],
+                  version=props['api_version'],
+                  data_collection_opt_out=props['data_collection_opt_out'])
+
+ctl = CompleteTheLook(api_gateway_url=props['api_gateway_url'],
+                      api_key=props['api_key'],
+                      version=props['api_version'],
+                      data_collection_opt_out=props['data_collection_opt_out'],
+                      transport=catalog.transport,
+                      catalog=catalog)
+
+#------------------------------------------------------------------------------
+# GET RECOMMENDATION
+#------------------------------------------------------------------------------
+# Get a style tip and set of recommended items for the text query.
+status,response = ctl.get_recommendation(gender='female',
+                                         query_text='white skinny jeans')
+print(status)
+pprint(response)
+
+# The same call is now served from the cache.
+status,response = ctl.get_recommendation(gender='female',
+                                         query_text='White  skinny jeans')
+print(status)
+
+#------------------------------------------------------------------------------
+# GET RECOMMENDATION (WITH PRODUCT DATA AND IMAGE URLS)
+#------------------------------------------------------------------------------
+status,response = ctl.get_recommendation(gender='female',
+                                         query_text='white skinny jeans',
+                                         catalog_name=props['catalog_name'],
+                                         hydrate=True)
+print(status)
+pprint(response)
@@ -0,0 +1,66 @@
+import unittest
+
+from ..Hydrator import Hydrator
+from ..Transport import Transport
+
+class _Catalog():
+    """ get_product from a dict, counting the calls.
+    """
+    version = 'v1'
+    api_gateway_url = 'http://localhost/'
+    api_key = 'key'
+
+    def __init__(self,products):
+        self.products = products
+        self.transport = Transport()
+        self.calls = []
+
+    def get_product(self,catalog_name,id):
+        self.calls.append((catalog_name,id))
+        if id not in self.products:
+            return 404,{'error':'product not found'}
+        return 202,{'data':self.products[id]}
+
+def _product(*image_ids):
+    return {'name':'x','images':dict((image_id,{'image_url':'http://img/%s'%(image_id),
+                                                'image_filename':'%s.jpg'%(image_id)})
+                                     for image_id in image_ids)}
+
+class TestHydrate(unittest.TestCase):
+
+    def test_one_get_product_per_product(self):
+        catalog = _Catalog({'p1':_product('1','2'),'p2':_product('1')})
+        response = {'products':[{'id':'p1','image_id':'1'},
+                                {'id':'p1','image_id':'2'},
+                                {'id':'p2'}]}
+        missing = Hydrator(catalog).hydrate('c',response)
+
+        self.assertEqual(missing,[])
+        self.assertEqual(sorted(catalog.calls),[('c','p1'),('c','p2')])
+        items = response['products']
+        self.assertEqual(items[0]['image_url'],'http://img/1')
+        self.assertEqual(items[1]['image_url'],'http://img/2')
+        self.assertEqual(items[1]['image_url_local'],
+                         'http://localhost/v1/catalog/c/images/2.jpg?api_key=key')
+        self.assertEqual(items[2]['product_info']['name'],'x')
+
+    def test_only_result_items_are_hydrated(self):
+        catalog = _Catalog({'p1':_product('1')})
+        response = {'id':'request-1',
+                    'products':[{'id':'p1','product_info':{'id':'nested'}}]}
+        missing = Hydrator(catalog).hydrate('c',response)
+
+        self.assertEqual(missing,[])
+        self.assertEqual(catalog.calls,[('c','p1')])
+        self.assertNotIn('image_url',response)
+
+    def test_nested_result_lists(self):
+        catalog = _Catalog({'p1':_product('1')})
+        response = {'recommendations':[{'category':'shoes','items':[{'id':'p1'},{'id':'p9'}]}]}
+        missing = Hydrator(catalog).hydrate('c',response)
+
+        self.assertEqual(missing,['p9'])
+        self.assertEqual(response['recommendations'][0]['items'][0]['image_url'],'http://img/1')
+
+if __name__ == '__main__':
+    unittest.main()
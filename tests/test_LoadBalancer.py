@@ -0,0 +1,85 @@
+import unittest
+
+import requests
+
+from ..Catalog import Catalog
+from ..LoadBalancer import LoadBalancer
+from ..Transport import Transport
+from ..VisualSearch import VisualSearch
+
+class _Response():
+    def __init__(self,status_code=200):
+        self.status_code = status_code
+        self.headers = {}
+        self.content = b'{}'
+
+    def json(self):
+        return {}
+
+class _Backend():
+    """ Records the urls, never sends the requests.
+    """
+    def __init__(self):
+        self.urls = []
+
+    def request(self,method,url,**kwargs):
+        self.urls.append(url)
+        return _Response()
+
+    def close(self):
+        pass
+
+class _Session():
+    """ A probe session that fails while fail is True.
+    """
+    def __init__(self):
+        self.fail = True
+
+    def get(self,url,**kwargs):
+        if self.fail:
+            raise requests.exceptions.ConnectionError('refused')
+        return _Response()
+
+    def close(self):
+        pass
+
+class TestLoadBalancer(unittest.TestCase):
+
+    def test_gateway_url_is_normalized(self):
+        backend = _Backend()
+        load_balancer = LoadBalancer([],probe_interval=None)
+        transport = Transport(load_balancer=load_balancer,backend=backend)
+        vs = VisualSearch(['http://gw1/api','http://gw2/api'],'key',transport=transport)
+        self.addCleanup(vs.close)
+
+        self.assertEqual(vs.api_gateway_url,'http://gw1/api/')
+        vs.fashion_quote()
+        self.assertEqual(len(backend.urls),1)
+        self.assertTrue(load_balancer.owns(backend.urls[0]))
+        self.assertTrue(backend.urls[0].endswith('/api/v1/fashion_quote'))
+
+    def test_probe_respects_max_failures(self):
+        load_balancer = LoadBalancer(['http://gw1/'],probe_interval=None,max_failures=3)
+        self.addCleanup(load_balancer.close)
+        load_balancer.session = _Session()
+
+        load_balancer.probe()
+        load_balancer.probe()
+        self.assertFalse(load_balancer.stats()['http://gw1/']['down'])
+        load_balancer.probe()
+        self.assertTrue(load_balancer.stats()['http://gw1/']['down'])
+
+        load_balancer.session.fail = False
+        load_balancer.probe()
+        self.assertFalse(load_balancer.stats()['http://gw1/']['down'])
+
+    def test_close_stops_the_prober(self):
+        catalog = Catalog(['http://gw1/','http://gw2/'],'key',transport=Transport(backend=_Backend()))
+        thread = catalog.transport.load_balancer.thread
+        self.assertTrue(thread.is_alive())
+
+        catalog.close()
+        self.assertFalse(thread.is_alive())
+
+if __name__ == '__main__':
+    unittest.main()
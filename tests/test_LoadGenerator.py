@@ -0,0 +1,43 @@
+import time
+import threading
+import unittest
+
+from ..LoadGenerator import LoadGenerator
+
+class _Batch():
+    """ Records the send times instead of sending.
+    """
+    def __init__(self):
+        self.times = []
+        self.lock = threading.Lock()
+
+    def execute(self,request):
+        with self.lock:
+            self.times.append(time.time())
+        return {'status':200}
+
+class TestOpenLoop(unittest.TestCase):
+
+    def test_advance_integrates_the_ramp(self):
+        stages = [(10.0,50.0),(60.0,50.0)]
+        arrivals = []
+        t = LoadGenerator._advance(stages,0.0,1.0)
+        while t is not None:
+            arrivals.append(t)
+            t = LoadGenerator._advance(stages,t,1.0)
+        # 10s ramp from 0 to 50/s is 250 arrivals, then 60s at 50/s
+        self.assertEqual(sum(1 for t in arrivals if t < 10.0),250)
+        self.assertAlmostEqual(len(arrivals),3250,delta=1)
+
+    def test_ramp_arrivals(self):
+        generator = LoadGenerator('http://localhost:1/','key',[{'op':'browse'}])
+        generator.batch = _Batch()
+        start = time.time()
+        report = generator.run(mode='open',rate=50,ramp_up=2.0,duration=1.0)
+        ramp = sum(1 for t in generator.batch.times if t-start < 2.0)
+        # 2s ramp from 0 to 50/s: 50 arrivals, then 50 more at full rate
+        self.assertAlmostEqual(ramp,50,delta=5)
+        self.assertAlmostEqual(report['requests'],100,delta=5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+
+from ..PriorityScheduler import default_priority
+
+class TestDefaultPriority(unittest.TestCase):
+
+    def check(self,method,path,expected,catalog_name='c'):
+        url = 'http://gateway/v1/catalog/%s%s'%(catalog_name,path)
+        self.assertEqual(default_priority(method,url),expected,'%s %s'%(method,url))
+
+    def test_queries_are_interactive(self):
+        self.check('GET','/text_search','interactive')
+        self.check('GET','/natural_language_search','interactive')
+        self.check('GET','/visual_browse/p1/1','interactive')
+        self.check('POST','/visual_search','interactive')
+        self.check('GET','/products/p1','interactive')
+
+    def test_batch_jobs_are_bulk(self):
+        self.check('POST','/predict/visual_search_categories','bulk')
+        self.check('GET','/predict/visual_search_categories','bulk')
+        self.check('POST','/visual_search_index','bulk')
+        self.check('GET','/visual_search_index','bulk')
+        self.check('PUT','/products/p1','bulk')
+
+    def test_catalog_names_are_not_endpoints(self):
+        for catalog_name in ('sales_index','predict','visual_search_index'):
+            self.check('GET','/visual_browse/p_index/1','interactive',catalog_name)
+            self.check('GET','/text_search','interactive',catalog_name)
+            self.check('GET','/products/predict','interactive',catalog_name)
+            self.check('POST','/visual_search','interactive',catalog_name)
+            self.check('POST','/visual_search_index','bulk',catalog_name)
+
+if __name__ == '__main__':
+    unittest.main()
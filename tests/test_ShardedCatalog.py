@@ -0,0 +1,25 @@
+import unittest
+
+from ..ShardedCatalog import ShardedCatalog
+
+class TestMerge(unittest.TestCase):
+
+    def setUp(self):
+        self.sharded = ShardedCatalog(None,'c',2)
+        self.addCleanup(self.sharded.close)
+
+    def test_merge_by_score(self):
+        results = [('c_shard0',(200,{'products':[{'id':'a','score':0.9},{'id':'b','score':0.2}]})),
+                   ('c_shard1',(200,{'products':[{'id':'c','score':0.5}]}))]
+        status,response = self.sharded._merge(results,10)
+        self.assertEqual([item['id'] for item in response['products']],['a','c','b'])
+
+    def test_merge_without_score_interleaves_by_rank(self):
+        results = [('c_shard0',(200,{'products':[{'id':'a'},{'id':'b'},{'id':'c'}]})),
+                   ('c_shard1',(200,{'products':[{'id':'d'},{'id':'e'}]}))]
+        status,response = self.sharded._merge(results,4)
+        self.assertEqual([item['id'] for item in response['products']],['a','d','b','e'])
+        self.assertEqual(response['products'][1]['catalog_name'],'c_shard1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import time
+import unittest
+
+from ..Deadline import Deadline, DeadlineExceeded
+from ..RateLimiter import RateLimiter
+from ..Transport import Transport
+
+class _Response():
+    status_code = 200
+    headers = {}
+    content = b'{}'
+
+class _Backend():
+    """ Records the requests, never sends them.
+    """
+    def __init__(self):
+        self.requests = []
+
+    def request(self,method,url,**kwargs):
+        self.requests.append((method,url))
+        return _Response()
+
+    def close(self):
+        pass
+
+class TestRateLimitDeadline(unittest.TestCase):
+
+    def test_saturated_limiter_raises_within_deadline(self):
+        limiter = RateLimiter(rates={'visual_search':(0.1,1)},shared=False)
+        self.assertTrue(limiter.acquire('visual_search',api_key='key'))
+
+        backend = _Backend()
+        transport = Transport(rate_limiter=limiter,backend=backend)
+        url = 'http://localhost/v1/catalog/c/visual_search'
+
+        start = time.time()
+        with Deadline(0.5):
+            self.assertRaises(DeadlineExceeded,transport.get,url,headers={'X-Api-Key':'key'})
+        self.assertLess(time.time()-start,0.5)
+        self.assertEqual(backend.requests,[])
+
+    def test_limiter_wait_within_deadline(self):
+        limiter = RateLimiter(rates={'visual_search':(10.0,1)},shared=False)
+        self.assertTrue(limiter.acquire('visual_search',api_key='key'))
+
+        backend = _Backend()
+        transport = Transport(rate_limiter=limiter,backend=backend)
+        url = 'http://localhost/v1/catalog/c/visual_search'
+
+        with Deadline(1.0):
+            transport.get(url,headers={'X-Api-Key':'key'})
+        self.assertEqual(len(backend.requests),1)
+
+if __name__ == '__main__':
+    unittest.main()
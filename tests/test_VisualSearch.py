@@ -0,0 +1,41 @@
+import unittest
+
+from ..VisualSearch import VisualSearch
+
+class _StatusVisualSearch(VisualSearch):
+    """ index_status returns the given responses in turn.
+    """
+    def __init__(self,responses):
+        VisualSearch.__init__(self,'http://localhost/','key')
+        self.responses = list(responses)
+
+    def index_status(self,catalog_name):
+        return self.responses.pop(0)
+
+class TestIndexWait(unittest.TestCase):
+
+    def test_waits_for_completed(self):
+        vs = _StatusVisualSearch([(200,{'status':'queued'}),
+                                  (200,{'status':'in_progress'}),
+                                  (200,{'status':'completed'})])
+        status,response = vs.index_wait('c',poll_interval=0.0)
+        self.assertEqual(response['status'],'completed')
+
+    def test_error_response_raises(self):
+        vs = _StatusVisualSearch([(404,{'error':'catalog not found'})])
+        self.assertRaises(RuntimeError,vs.index_wait,'c',poll_interval=0.0)
+
+    def test_failed_raises(self):
+        vs = _StatusVisualSearch([(200,{'status':'failed'})])
+        self.assertRaises(RuntimeError,vs.index_wait,'c',poll_interval=0.0)
+
+    def test_unknown_status_raises(self):
+        vs = _StatusVisualSearch([(200,{'status':'done'})])
+        self.assertRaises(RuntimeError,vs.index_wait,'c',poll_interval=0.0)
+
+    def test_timeout(self):
+        vs = _StatusVisualSearch([(200,{'status':'in_progress'})]*3)
+        self.assertRaises(TimeoutError,vs.index_wait,'c',poll_interval=1.0,timeout=0.5)
+
+if __name__ == '__main__':
+    unittest.main()
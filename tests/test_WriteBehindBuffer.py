@@ -0,0 +1,47 @@
+import time
+import threading
+import unittest
+
+from ..WriteBehindBuffer import WriteBehindBuffer
+
+class _SlowCatalog():
+    """ update_product blocks until released.
+    """
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = 0
+
+    def update_product(self,catalog_name,id,data,download_images=False):
+        self.calls += 1
+        self.release.wait()
+        return 200,{}
+
+class TestBackpressure(unittest.TestCase):
+
+    def test_in_flight_updates_count_against_max_pending(self):
+        catalog = _SlowCatalog()
+        self.addCleanup(catalog.release.set)
+        buffer = WriteBehindBuffer(catalog,window=0.0,max_workers=2,max_pending=5)
+
+        added = []
+        def producer():
+            for i in range(20):
+                buffer.update_product('c','p%d'%(i),{'name':'x'})
+                added.append(i)
+        thread = threading.Thread(target=producer)
+        thread.daemon = True
+        thread.start()
+
+        time.sleep(0.5)
+        # the slow gateway blocks the producer once 5 updates are buffered or in flight
+        self.assertEqual(len(added),5)
+        self.assertLessEqual(len(buffer.pending)+len(buffer.in_flight),5)
+
+        catalog.release.set()
+        thread.join(5.0)
+        buffer.close()
+        self.assertEqual(len(added),20)
+        self.assertEqual(buffer.stats['requests'],20)
+
+if __name__ == '__main__':
+    unittest.main()